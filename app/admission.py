@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# -----------------------------------------------------------------------------
+# Admission control: prioritas per route + token bucket per klien + batas
+# konkurensi. Saat alarm, semua klien menyerbu API; route kritis (status
+# darurat, daftar posko) harus tetap cepat, jadi beban prioritas rendah
+# (dashboard dengan fetch upstream, riwayat, shakemap, search) dibuang duluan.
+# -----------------------------------------------------------------------------
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+# check-in/out relawan: tidak pernah dibuang saat lonjakan dan punya rate sendiri yang
+# jauh lebih longgar (satu HP relawan bisa mengirim ratusan check-in per detik di posko ramai)
+FIELD = "field"
+
+# prefix path -> kelas; dicek berurutan, yang pertama cocok dipakai
+ROUTE_CLASSES: List[Tuple[str, str]] = [
+    ("/emergency/status", CRITICAL),
+    # A* di seluruh graf jalan: handler termahal, jangan ikut CRITICAL (tanpa batas, tidak dibuang)
+    ("/evacuation/route", NORMAL),
+    ("/evacuation/", CRITICAL),
+    ("/health", CRITICAL),
+    ("/admin/occupancy/", FIELD),
+    ("/sinabung/dashboard", LOW),
+    ("/sinabung/history", LOW),
+    ("/earthquake/", LOW),
+    ("/search", LOW),
+]
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+
+# token bucket per klien per kelas: (token/detik, kapasitas burst); rate 0 = tanpa rate limit.
+# CRITICAL default tanpa limit: satu IP bisa berarti ribuan HP (CGNAT operator, Wi-Fi posko)
+# yang polling status darurat bersamaan. Lonjakan ditangani dengan membuang LOW/NORMAL.
+RATES: Dict[str, Tuple[float, float]] = {
+    CRITICAL: (_env_float("ADMISSION_RATE_CRITICAL", "0"), _env_float("ADMISSION_BURST_CRITICAL", "20")),
+    NORMAL: (_env_float("ADMISSION_RATE_NORMAL", "2"), _env_float("ADMISSION_BURST_NORMAL", "10")),
+    LOW: (_env_float("ADMISSION_RATE_LOW", "1"), _env_float("ADMISSION_BURST_LOW", "5")),
+    FIELD: (_env_float("ADMISSION_RATE_FIELD", "200"), _env_float("ADMISSION_BURST_FIELD", "1000")),
+}
+# batas request bersamaan per kelas (0 = tanpa batas)
+CONCURRENCY: Dict[str, int] = {
+    CRITICAL: int(os.environ.get("ADMISSION_MAX_CRITICAL", "0")),
+    NORMAL: int(os.environ.get("ADMISSION_MAX_NORMAL", "64")),
+    LOW: int(os.environ.get("ADMISSION_MAX_LOW", "16")),
+    FIELD: int(os.environ.get("ADMISSION_MAX_FIELD", "0")),
+}
+# batas request bersamaan untuk path mahal, di atas batas kelasnya (prefix, maks; 0 = tanpa batas)
+PATH_CONCURRENCY: List[Tuple[str, int]] = [
+    ("/evacuation/route", int(os.environ.get("ADMISSION_MAX_ROUTE", "8"))),
+]
+# total in-flight (semua kelas) di atas ambang ini -> kelas tsb ditolak
+SHED_AT: Dict[str, int] = {
+    LOW: int(os.environ.get("ADMISSION_SHED_LOW_AT", "96")),
+    NORMAL: int(os.environ.get("ADMISSION_SHED_NORMAL_AT", "192")),
+}
+TRUST_PROXY = os.environ.get("ADMISSION_TRUST_PROXY", "0").strip() == "1"
+MAX_CLIENTS = int(os.environ.get("ADMISSION_MAX_CLIENTS", "100000"))
+# Klien dikunci per IP. X-Device-Id (tidak terverifikasi) hanya memecah bucket di bawah
+# IP yang sama (banyak HP di balik satu NAT posko/operator), dan semua device di IP itu
+# tetap berbagi satu bucket IP sebesar rate x faktor ini: ganti-ganti header tidak
+# memberi kuota baru di atas batas IP.
+SHARED_IP_FACTOR = _env_float("ADMISSION_SHARED_IP_FACTOR", "20")
+
+
+def classify(path: str) -> str:
+    for prefix, cls in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return cls
+    return NORMAL
+
+
+def _path_limit(path: str) -> Optional[Tuple[str, int]]:
+    for prefix, cap in PATH_CONCURRENCY:
+        if path.startswith(prefix):
+            return (prefix, cap) if cap > 0 else None
+    return None
+
+
+class _Buckets:
+    def __init__(self) -> None:
+        # urutan = terakhir dipakai (LRU di depan)
+        self._b: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+
+    def _refill(self, client: str, cls: str, now: float, rate: float, burst: float) -> List[float]:
+        key = (client, cls)
+        b = self._b.get(key)
+        if b is None:
+            while len(self._b) >= MAX_CLIENTS:
+                # buang klien yang paling lama tidak aktif (bucket-nya hampir pasti sudah penuh lagi)
+                self._b.popitem(last=False)
+            b = self._b[key] = [burst, now]
+        else:
+            self._b.move_to_end(key)
+        b[0] = min(burst, b[0] + (now - b[1]) * rate)
+        b[1] = now
+        return b
+
+    def take_all(self, clients: List[Tuple[str, float]], cls: str, now: float) -> float:
+        """
+        Ambil 1 token dari tiap bucket (klien, skala) sekaligus: kalau satu saja kurang,
+        tidak ada yang dipakai. Return 0 kalau boleh, atau detik tunggu terlama.
+        """
+        rate, burst = RATES[cls]
+        if rate <= 0:
+            return 0.0
+        taken = [(self._refill(c, cls, now, rate * k, burst * k), rate * k) for c, k in clients]
+        wait = max(((1.0 - b[0]) / r for b, r in taken if b[0] < 1.0), default=0.0)
+        if wait > 0:
+            return wait
+        for b, _ in taken:
+            b[0] -= 1.0
+        return 0.0
+
+    def take(self, client: str, cls: str, now: float, scale: float = 1.0) -> float:
+        """Ambil 1 token. Return 0 kalau boleh, atau detik tunggu sampai token tersedia."""
+        return self.take_all([(client, scale)], cls, now)
+
+    def __len__(self) -> int:
+        return len(self._b)
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI murni (tanpa BaseHTTPMiddleware) supaya overhead per request kecil."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self.buckets = _Buckets()
+        self.inflight: Dict[str, int] = {CRITICAL: 0, NORMAL: 0, LOW: 0, FIELD: 0}
+        self.path_inflight: Dict[str, int] = {prefix: 0 for prefix, _ in PATH_CONCURRENCY}
+        self.stats: Dict[str, Dict[str, int]] = {
+            cls: {"admitted": 0, "rate_limited": 0, "shed": 0} for cls in self.inflight
+        }
+        STATE["middleware"] = self
+
+    @staticmethod
+    def _client_key(scope: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        """(IP, device id atau None). IP dari peer, atau X-Forwarded-For kalau proxy dipercaya."""
+        headers = dict(scope.get("headers") or [])
+        ip = None
+        if TRUST_PROXY:
+            fwd = headers.get(b"x-forwarded-for")
+            if fwd:
+                ip = fwd.decode("latin-1").split(",")[0].strip()
+        if not ip:
+            client = scope.get("client")
+            ip = client[0] if client else "unknown"
+        device = headers.get(b"x-device-id")
+        return ip, device.decode("latin-1")[:128] if device else None
+
+    def _take(self, scope: Dict[str, Any], cls: str) -> float:
+        ip, device = self._client_key(scope)
+        now = time.monotonic()
+        if device is None:
+            return self.buckets.take(ip, cls, now)
+        # bucket device dan bucket bersama IP dicek dulu dua-duanya; ditolak -> tidak ada yang berkurang
+        return self.buckets.take_all([(f"{ip}|dev:{device}", 1.0), (f"{ip}|shared", SHARED_IP_FACTOR)], cls, now)
+
+    def _shed(self, cls: str, limit_path: Optional[Tuple[str, int]] = None) -> bool:
+        if limit_path is not None and self.path_inflight[limit_path[0]] >= limit_path[1]:
+            return True
+        cap = CONCURRENCY.get(cls, 0)
+        if cap and self.inflight[cls] >= cap:
+            return True
+        limit = SHED_AT.get(cls)
+        return bool(limit) and sum(self.inflight.values()) >= limit
+
+    @staticmethod
+    async def _reject(send: Any, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope.get("path", "")
+        cls = classify(path)
+        limit_path = _path_limit(path)
+        stats = self.stats[cls]
+
+        if self._shed(cls, limit_path):
+            stats["shed"] += 1
+            await self._reject(send, "Server sedang sibuk, coba lagi sebentar.", 2 if cls == LOW else 1)
+            return
+
+        wait = self._take(scope, cls)
+        if wait > 0:
+            stats["rate_limited"] += 1
+            await self._reject(send, "Terlalu banyak request, coba lagi sebentar.", wait)
+            return
+
+        stats["admitted"] += 1
+        self.inflight[cls] += 1
+        if limit_path is not None:
+            self.path_inflight[limit_path[0]] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight[cls] -= 1
+            if limit_path is not None:
+                self.path_inflight[limit_path[0]] -= 1
+
+
+STATE: Dict[str, Optional[AdmissionMiddleware]] = {"middleware": None}
+
+
+def snapshot() -> Dict[str, Any]:
+    mw = STATE["middleware"]
+    if mw is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "inflight": dict(mw.inflight),
+        "path_inflight": dict(mw.path_inflight),
+        "stats": {k: dict(v) for k, v in mw.stats.items()},
+        "clients_tracked": len(mw.buckets),
+        "rates": {k: {"per_second": r, "burst": b} for k, (r, b) in RATES.items()},
+        "concurrency": dict(CONCURRENCY),
+        "path_concurrency": dict(PATH_CONCURRENCY),
+        "shed_at": dict(SHED_AT),
+    }
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import changes, geo
+from .hazard import HazardGeometry
+
+try:
+    import numpy as np
+except Exception:  # numpy wajib untuk planner; tanpa numpy endpoint mengembalikan 503
+    np = None
+
+logger = logging.getLogger("sinabung.allocation")
+
+# -----------------------------------------------------------------------------
+# Rencana alokasi pengungsi desa -> posko (berdasarkan kapasitas).
+#
+# Matriks jarak desa x posko dibangun sekali (numpy, satu pass) lalu dijaga
+# inkremental: posko baru = tambah satu kolom, posko dihapus = buang kolom.
+# Radius bahaya tidak mengubah matriks, hanya masking (desa mana yang harus
+# mengungsi, posko mana yang aman). Solver: greedy atas pasangan terurut jarak
+# (K posko terdekat per desa) + perbaikan lokal (pindah ke sisa kapasitas dan
+# tukar alokasi antar dua desa).
+# -----------------------------------------------------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DESA_FILE = Path(os.environ.get("DESA_FILE", str(BASE_DIR / "data" / "desa.json")))
+
+NEAREST_K = max(1, int(os.environ.get("ALLOCATION_NEAREST_K", "20")))
+REFINE_PASSES = max(0, int(os.environ.get("ALLOCATION_REFINE_PASSES", "2")))
+REFINE_TOP = max(1, int(os.environ.get("ALLOCATION_REFINE_TOP", "2000")))
+
+
+def _load_desa() -> List[Dict[str, Any]]:
+    """data/desa.json: [{"kode", "nama", "kecamatan"?, "lat", "lng", "penduduk"}, ...]"""
+    if not DESA_FILE.exists():
+        return []
+    items = json.loads(DESA_FILE.read_text(encoding="utf-8"))
+    return [d for d in items if d.get("lat") is not None and d.get("lng") is not None and int(d.get("penduduk") or 0) > 0]
+
+
+class AllocationPlanner:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.desa: List[Dict[str, Any]] = []
+        self.desa_mtime: Optional[int] = None
+        self.desa_lat = None
+        self.desa_lng = None
+        self.posko_ids: List[str] = []
+        self.posko: Dict[str, Dict[str, Any]] = {}
+        self.matrix = None  # desa x posko (km), kolom mengikuti posko_ids
+        self.version = 0  # naik tiap matriks berubah; bagian dari kunci cache hasil
+        self._cache: Optional[Tuple[Any, Dict[str, Any]]] = None
+
+    # ----------------------------------------------------------------- build
+    def _ensure(self) -> None:
+        if np is None:
+            raise RuntimeError("numpy belum terpasang.")
+        try:
+            mtime = DESA_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise LookupError(f"Dataset desa belum tersedia ({DESA_FILE}).")
+        if self.matrix is not None and mtime == self.desa_mtime:
+            return
+
+        from .posko_store import list_posko
+
+        t0 = time.perf_counter()
+        self.desa = _load_desa()
+        self.desa_mtime = mtime
+        lats = np.array([float(d["lat"]) for d in self.desa])
+        lngs = np.array([float(d["lng"]) for d in self.desa])
+        self.desa_lat, self.desa_lng = lats, lngs
+        posko = [p.__dict__ for p in list_posko()]
+        self.posko = {p["id"]: p for p in posko}
+        self.posko_ids = [p["id"] for p in posko]
+        self.matrix = geo.haversine_km_matrix(lats, lngs, [p["lat"] for p in posko], [p["lng"] for p in posko])
+        self.version += 1
+        logger.info(
+            "Allocation matrix built: %s desa x %s posko in %.0f ms.",
+            len(self.desa), len(posko), (time.perf_counter() - t0) * 1000,
+        )
+
+    def upsert_posko(self, item: Dict[str, Any]) -> None:
+        """Satu kolom baru/diganti; tidak menghitung ulang kolom lain."""
+        with self._lock:
+            if self.matrix is None:
+                return
+            col = geo.haversine_km_batch(self.desa_lat, self.desa_lng, float(item["lat"]), float(item["lng"]))
+            pid = item["id"]
+            if pid in self.posko:
+                self.matrix[:, self.posko_ids.index(pid)] = col
+            else:
+                self.posko_ids.append(pid)
+                self.matrix = np.column_stack([self.matrix, col]) if self.matrix.size else col[:, None]
+            self.posko[pid] = item
+            self.version += 1
+
+    def remove_posko(self, posko_id: str) -> None:
+        with self._lock:
+            if self.matrix is None or posko_id not in self.posko:
+                return
+            j = self.posko_ids.index(posko_id)
+            self.matrix = np.delete(self.matrix, j, axis=1)
+            del self.posko_ids[j]
+            del self.posko[posko_id]
+            self.version += 1
+
+    def on_change(self, collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]]) -> None:
+        if collection != "posko":
+            return
+        if op == "delete" or item is None:
+            self.remove_posko(item_id)
+        else:
+            self.upsert_posko(item)
+
+    # ----------------------------------------------------------------- solve
+    def _capacities(self, use_occupancy: bool) -> "np.ndarray":
+        remaining: Dict[str, Optional[int]] = {}
+        if use_occupancy:
+            from .occupancy import COUNTERS
+
+            remaining = {r["posko_id"]: r["sisa"] for r in COUNTERS.all()}
+        caps = []
+        for pid in self.posko_ids:
+            cap = self.posko[pid].get("kapasitas")
+            if pid in remaining and remaining[pid] is not None:
+                cap = remaining[pid]
+            caps.append(max(0, int(cap or 0)))  # kapasitas tidak diketahui -> tidak dialokasikan
+        return np.array(caps, dtype=np.int64)
+
+    def plan(self, hazard: Optional[HazardGeometry] = None, use_occupancy: bool = True) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure()
+            caps = self._capacities(use_occupancy)
+            key = (self.version, hazard.key if hazard else None, caps.tobytes())
+            if self._cache is not None and self._cache[0] == key:
+                return self._cache[1]
+
+            t0 = time.perf_counter()
+            # masking zona: desa di dalam zona bahaya mengungsi, posko di dalam zona tidak dipakai
+            if hazard:
+                rows = np.nonzero(hazard.contains_many(self.desa_lat, self.desa_lng))[0]
+                posko_inside = hazard.contains_many(
+                    [self.posko[p]["lat"] for p in self.posko_ids], [self.posko[p]["lng"] for p in self.posko_ids]
+                )
+                cols = np.nonzero(~np.asarray(posko_inside, dtype=bool) & (caps > 0))[0]
+            else:
+                rows = np.arange(len(self.desa))
+                cols = np.nonzero(caps > 0)[0]
+
+            demand = np.array([int(self.desa[i]["penduduk"]) for i in rows], dtype=np.int64)
+            sub = self.matrix[np.ix_(rows, cols)] if len(rows) and len(cols) else np.zeros((len(rows), len(cols)))
+            flows, left, cost_greedy, cost = _solve(sub, demand, caps[cols].copy())
+            result = self._result(rows, cols, demand, caps, flows, left, hazard, cost_greedy, cost)
+            result["solve_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            self._cache = (key, result)
+            return result
+
+    def _result(self, rows, cols, demand, caps, flows, left, hazard, cost_greedy, cost) -> Dict[str, Any]:
+        per_desa: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        load: Dict[int, int] = defaultdict(int)
+        max_km = 0.0
+        for (r, c), amount in flows.items():
+            if amount <= 0:
+                continue
+            pid = self.posko_ids[cols[c]]
+            km = float(self.matrix[rows[r], cols[c]])
+            max_km = max(max_km, km)
+            per_desa[r].append({"posko_id": pid, "nama": self.posko[pid].get("nama"), "jumlah": amount, "distance_km": round(km, 2)})
+            load[c] += amount
+
+        def desa_info(r: int) -> Dict[str, Any]:
+            d = self.desa[rows[r]]
+            return {"kode": d.get("kode"), "nama": d.get("nama"), "kecamatan": d.get("kecamatan"), "penduduk": int(demand[r])}
+
+        assigned = int(demand.sum() - left.sum())
+        return {
+            "hazard_radius_km": hazard.max_radius_km if hazard else None,
+            "desa_total": len(self.desa),
+            "desa_mengungsi": len(rows),
+            "posko_dipakai": len(load),
+            "posko_tersedia": len(cols),
+            "penduduk": int(demand.sum()),
+            "teralokasi": assigned,
+            "belum_teralokasi": int(left.sum()),
+            "kapasitas_tersedia": int(caps[cols].sum()) if len(cols) else 0,
+            "rata_jarak_km": round(cost / assigned, 2) if assigned else None,
+            "maks_jarak_km": round(max_km, 2),
+            "perbaikan_persen": round(100 * (cost_greedy - cost) / cost_greedy, 2) if cost_greedy else 0.0,
+            "alokasi": [
+                {**desa_info(r), "posko": sorted(per_desa[r], key=lambda x: x["distance_km"])}
+                for r in sorted(per_desa)
+            ],
+            "desa_belum_teralokasi": [{**desa_info(r), "sisa": int(left[r])} for r in np.nonzero(left > 0)[0].tolist()],
+            "beban_posko": [
+                {
+                    "posko_id": self.posko_ids[cols[c]],
+                    "nama": self.posko[self.posko_ids[cols[c]]].get("nama"),
+                    "kapasitas": int(caps[cols[c]]),
+                    "dialokasikan": n,
+                }
+                for c, n in sorted(load.items(), key=lambda x: -x[1])
+            ],
+        }
+
+
+def _solve(D, demand, cap) -> Tuple[Dict[Tuple[int, int], int], Any, float, float]:
+    """
+    Greedy: pasangan (desa, posko) diurutkan jarak, isi sebanyak mungkin. Pertama
+    hanya K posko terdekat tiap desa; desa yang masih tersisa dapat semua posko.
+    Lalu perbaikan lokal. Return (flows {(baris, kolom): orang}, sisa per desa, biaya greedy, biaya akhir).
+    """
+    nv, npk = D.shape
+    left = demand.copy()
+    flows: Dict[Tuple[int, int], int] = defaultdict(int)
+    if not nv or not npk:
+        return flows, left, 0.0, 0.0
+
+    k = min(NEAREST_K, npk)
+    near = np.argpartition(D, k - 1, axis=1)[:, :k] if k < npk else np.tile(np.arange(npk), (nv, 1))
+    near = np.take_along_axis(near, np.argsort(np.take_along_axis(D, near, axis=1), axis=1), axis=1)
+
+    def greedy(rows, cols) -> None:
+        dist = D[rows, cols]
+        order = np.argsort(dist, kind="stable")
+        need, room = int(left[np.unique(rows)].sum()), int(cap.sum())
+        for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+            if need <= 0 or room <= 0:
+                break
+            if left[r] <= 0 or cap[c] <= 0:
+                continue
+            m = int(min(left[r], cap[c]))
+            flows[(r, c)] += m
+            left[r] -= m
+            cap[c] -= m
+            need -= m
+            room -= m
+
+    greedy(np.repeat(np.arange(nv), k), near.ravel())
+    if k < npk and left.sum() > 0 and cap.sum() > 0:
+        rest = np.nonzero(left > 0)[0]
+        greedy(np.repeat(rest, npk), np.tile(np.arange(npk), len(rest)))
+
+    cost_greedy = float(sum(m * D[r, c] for (r, c), m in flows.items()))
+    _refine(D, flows, cap, near)
+    cost = float(sum(m * D[r, c] for (r, c), m in flows.items() if m > 0))
+    return flows, left, cost_greedy, cost
+
+
+def _refine(D, flows: Dict[Tuple[int, int], int], cap, near) -> None:
+    """Perbaikan lokal atas alokasi terjauh: pindah ke sisa kapasitas yang lebih dekat, atau tukar dengan desa lain."""
+    by_posko: Dict[int, Dict[int, int]] = defaultdict(dict)
+    for (r, c), m in flows.items():
+        by_posko[c][r] = m
+
+    def move(r: int, src: int, dst: int, m: int) -> None:
+        flows[(r, src)] -= m
+        flows[(r, dst)] += m
+        by_posko[src][r] = flows[(r, src)]
+        if not by_posko[src][r]:
+            del by_posko[src][r]
+        by_posko[dst][r] = flows[(r, dst)]
+
+    for _ in range(REFINE_PASSES):
+        improved = 0
+        worst = sorted(((D[r, c], r, c) for (r, c), m in flows.items() if m > 0), reverse=True)[:REFINE_TOP]
+        for d_ap, a, p in worst:
+            for q in near[a].tolist():
+                if flows[(a, p)] <= 0:
+                    break
+                d_aq = D[a, q]
+                if d_aq >= d_ap:
+                    break  # near[a] terurut jarak: tidak ada posko lebih dekat lagi
+                if cap[q] > 0:
+                    m = int(min(cap[q], flows[(a, p)]))
+                    move(a, p, q, m)
+                    cap[q] -= m
+                    cap[p] += m
+                    improved += 1
+                for b, fb in list(by_posko[q].items()):
+                    if flows[(a, p)] <= 0:
+                        break
+                    if b == a or fb <= 0:
+                        continue
+                    if d_ap + D[b, q] - d_aq - D[b, p] > 1e-9:
+                        m = int(min(flows[(a, p)], fb))
+                        move(a, p, q, m)
+                        move(b, q, p, m)
+                        improved += 1
+        if not improved:
+            break
+
+
+PLANNER = AllocationPlanner()
+changes.subscribe(PLANNER.on_change)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from . import allocation, hazard
+from .admin_auth import require_admin
+
+router = APIRouter(tags=["allocation"])
+
+
+@router.get("/admin/evacuation/plan", dependencies=[Depends(require_admin)])
+def evacuation_plan(
+    radius_km: Optional[float] = Query(None, ge=0, le=50, description="Override radius bahaya (default: laporan MAGMA terakhir)"),
+    semua_desa: bool = Query(False, description="Rencanakan semua desa, abaikan radius"),
+    pakai_okupansi: bool = Query(True, description="Pakai sisa kapasitas (okupansi saat ini), bukan kapasitas penuh"),
+) -> Dict[str, Any]:
+    """
+    Rencana desa -> posko: desa di dalam zona bahaya dialokasikan ke posko aman
+    terdekat sesuai kapasitas (satu desa bisa dibagi ke beberapa posko).
+    """
+    zone = None if semua_desa else hazard.resolve(radius_km)
+    try:
+        return allocation.PLANNER.plan(hazard=zone, use_occupancy=pakai_okupansi)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
@@ -1,15 +1,46 @@
 from __future__ import annotations
-import httpx
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .http_client import get_client
 
 BMKG_AUTOGEMPA_URL = "https://data.bmkg.go.id/DataMKG/TEWS/autogempa.json"
+BMKG_GEMPATERKINI_URL = "https://data.bmkg.go.id/DataMKG/TEWS/gempaterkini.json"
+BMKG_GEMPADIRASAKAN_URL = "https://data.bmkg.go.id/DataMKG/TEWS/gempadirasakan.json"
 
-async def fetch_latest_quake(url: str = BMKG_AUTOGEMPA_URL) -> dict:
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(url, headers={"User-Agent": "sinabung-alert-mvp/1.0"})
-        r.raise_for_status()
-        data = r.json()
+_NUM_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
 
-    g = data.get("Infogempa", {}).get("gempa", {}) or {}
+
+def _parse_coordinates(g: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    BMKG menyediakan 'Coordinates' ("lat,lng") dan juga 'Lintang'/'Bujur'
+    ("2.53 LS", "140.70 BT"). Pakai Coordinates kalau ada.
+    """
+    coords = g.get("Coordinates")
+    if coords and "," in coords:
+        a, b = coords.split(",", 1)
+        try:
+            return float(a), float(b)
+        except ValueError:
+            pass
+
+    lintang, bujur = g.get("Lintang") or "", g.get("Bujur") or ""
+    m_lat, m_lng = _NUM_RE.search(lintang), _NUM_RE.search(bujur)
+    if not m_lat or not m_lng:
+        return None, None
+    lat = float(m_lat.group(0).replace(",", "."))
+    lng = float(m_lng.group(0).replace(",", "."))
+    if "LS" in lintang.upper():
+        lat = -abs(lat)
+    if "BB" in bujur.upper():
+        lng = -abs(lng)
+    return lat, lng
+
+
+def _parse_quake(g: Dict[str, Any]) -> Dict[str, Any]:
+    lat, lng = _parse_coordinates(g)
+    shakemap = g.get("Shakemap")
     return {
         "source": "BMKG",
         "date_time": g.get("DateTime"),
@@ -18,5 +49,30 @@ async def fetch_latest_quake(url: str = BMKG_AUTOGEMPA_URL) -> dict:
         "wilayah": g.get("Wilayah"),
         "potensi": g.get("Potensi"),
         "dirasakan": g.get("Dirasakan"),
-        "shakemap": g.get("Shakemap"),
+        "shakemap": shakemap,
+        # lewat proxy cache lokal, bukan langsung ke BMKG
+        "shakemap_url": f"/earthquake/shakemap/{shakemap}" if shakemap else None,
+        "lat": lat,
+        "lng": lng,
     }
+
+
+async def _get_json(url: str) -> Dict[str, Any]:
+    r = await get_client().get(url)
+    r.raise_for_status()
+    return r.json()
+
+
+async def fetch_latest_quake(url: str = BMKG_AUTOGEMPA_URL) -> dict:
+    data = await _get_json(url)
+    g = data.get("Infogempa", {}).get("gempa", {}) or {}
+    return _parse_quake(g)
+
+
+async def fetch_quake_list(url: str) -> List[dict]:
+    """gempaterkini.json / gempadirasakan.json -> list gempa (terbaru dulu)."""
+    data = await _get_json(url)
+    items = data.get("Infogempa", {}).get("gempa", []) or []
+    if isinstance(items, dict):
+        items = [items]
+    return [_parse_quake(g) for g in items]
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("sinabung.changes")
+
+# Listener dipanggil setelah setiap tulis admin yang sukses:
+#   fn(collection, op, item_id, item)
+# collection: "posko" | "education" | "emergency"
+# op: "upsert" | "delete" (item=None untuk delete)
+Listener = Callable[[str, str, str, Optional[Dict[str, Any]]], None]
+
+_listeners: List[Listener] = []
+
+
+def subscribe(fn: Listener) -> Listener:
+    if fn not in _listeners:
+        _listeners.append(fn)
+    return fn
+
+
+def publish(collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]] = None) -> None:
+    # listener (index, export, dst) tidak boleh menggagalkan tulis yang sudah sukses
+    for fn in list(_listeners):
+        try:
+            fn(collection, op, item_id, item)
+        except Exception:
+            logger.exception("Change listener %s failed for %s/%s.", getattr(fn, "__name__", fn), collection, item_id)
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from . import tracing
+from .admin_auth import require_admin
+
+router = APIRouter(prefix="/admin/debug", tags=["debug"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/traces")
+def traces(
+    limit: int = Query(50, ge=1, le=tracing.BUFFER_SIZE),
+    name: Optional[str] = Query(None, description="filter nama root span, mis. check_update"),
+) -> Dict[str, Any]:
+    """Trace terbaru (terbaru dulu) dengan durasi per stage."""
+    items = tracing.recent(limit=limit, name=name)
+    return {"buffer_size": tracing.BUFFER_SIZE, "count": len(items), "traces": items}
+
+
+@router.get("/traces/otlp")
+def traces_otlp(limit: int = Query(tracing.BUFFER_SIZE, ge=1, le=tracing.BUFFER_SIZE)) -> Dict[str, Any]:
+    """Isi buffer dalam format OTLP/JSON (bisa di-POST ke collector /v1/traces)."""
+    return tracing.to_otlp(limit=limit)
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from . import geo
+
+try:
+    import numpy as np
+except Exception:  # numpy opsional; fallback ke loop Python
+    np = None
+
+logger = logging.getLogger("sinabung.devices")
+
+# -----------------------------------------------------------------------------
+# Registry token FCM + lokasi kasar perangkat, untuk alert per wilayah
+# (bukan broadcast topic ke semua pelanggan). Sumber kebenaran di SQLite,
+# salinan di memori berupa array lat/lng paralel supaya seleksi radius untuk
+# 1 juta perangkat cukup satu pass numpy.
+# -----------------------------------------------------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEVICES_DB = Path(os.environ.get("DEVICES_DB", str(BASE_DIR / "data" / "devices.db")))
+
+# ALERT_GEOFENCE=1 -> alert dikirim ke perangkat terdaftar di dalam radius.
+# Default mati sampai versi app yang mendaftarkan perangkat sudah tersebar.
+GEOFENCE_ENABLED = os.environ.get("ALERT_GEOFENCE", "0").strip() == "1"
+# Masa migrasi: app lama tidak pernah mendaftar dan hanya menerima lewat topic, jadi
+# selama ALERT_TOPIC_FALLBACK=1 alert tetap dikirim ke topic juga. App yang sudah
+# mendaftar (POST /devices/register) wajib unsubscribe dari topic supaya tidak dobel.
+# Set 0 setelah app lama tidak dipakai lagi.
+TOPIC_FALLBACK = os.environ.get("ALERT_TOPIC_FALLBACK", "1").strip() == "1"
+# radius alert = radius bahaya MAGMA + buffer (orang di tepi zona juga perlu tahu)
+GEOFENCE_BUFFER_KM = float(os.environ.get("ALERT_GEOFENCE_BUFFER_KM", "15"))
+GEOFENCE_MIN_KM = float(os.environ.get("ALERT_GEOFENCE_MIN_KM", "20"))
+QUAKE_GEOFENCE_KM = float(os.environ.get("QUAKE_GEOFENCE_KM", "50"))
+
+BATCH_SIZE = 500  # batas send_each_for_multicast
+FANOUT_WORKERS = max(1, int(os.environ.get("FCM_FANOUT_WORKERS", "16")))
+# lokasi disimpan kasar (2 desimal ~ 1 km): cukup untuk geofence, tidak melacak orang
+COORD_DECIMALS = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    token      TEXT PRIMARY KEY,
+    lat        REAL NOT NULL,
+    lng        REAL NOT NULL,
+    platform   TEXT,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+class DeviceRegistry:
+    def __init__(self, path: Path = DEVICES_DB) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tokens: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._lat = array("d")
+        self._lng = array("d")
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    # ------------------------------------------------------------------ load
+    def load(self) -> None:
+        with self._lock:
+            rows = self._db().execute("SELECT token, lat, lng FROM devices").fetchall()
+            self._tokens = [r[0] for r in rows]
+            self._index = {t: i for i, t in enumerate(self._tokens)}
+            self._lat = array("d", (r[1] for r in rows))
+            self._lng = array("d", (r[2] for r in rows))
+            self._loaded = True
+        logger.info("Device registry loaded: %s devices.", len(self._tokens))
+
+    def ensure_loaded(self) -> "DeviceRegistry":
+        if not self._loaded:
+            self.load()
+        return self
+
+    # ---------------------------------------------------------------- update
+    def register(self, token: str, lat: float, lng: float, platform: Optional[str] = None) -> Dict[str, Any]:
+        self.ensure_loaded()
+        lat, lng = round(lat, COORD_DECIMALS), round(lng, COORD_DECIMALS)
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT INTO devices (token, lat, lng, platform, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(token) DO UPDATE SET lat = excluded.lat, lng = excluded.lng, "
+                "platform = excluded.platform, updated_at = excluded.updated_at",
+                (token, lat, lng, platform, now),
+            )
+            conn.commit()
+            i = self._index.get(token)
+            if i is None:
+                self._index[token] = len(self._tokens)
+                self._tokens.append(token)
+                self._lat.append(lat)
+                self._lng.append(lng)
+            else:
+                self._lat[i], self._lng[i] = lat, lng
+        return {"lat": lat, "lng": lng, "updated_at": now}
+
+    def remove(self, tokens: List[str]) -> int:
+        """Hapus token (swap dengan elemen terakhir, O(1) per token). Return jumlah yang terhapus."""
+        self.ensure_loaded()
+        removed = 0
+        with self._lock:
+            conn = self._db()
+            conn.executemany("DELETE FROM devices WHERE token = ?", ((t,) for t in tokens))
+            conn.commit()
+            for t in tokens:
+                i = self._index.pop(t, None)
+                if i is None:
+                    continue
+                last = len(self._tokens) - 1
+                if i != last:
+                    moved = self._tokens[last]
+                    self._tokens[i] = moved
+                    self._lat[i], self._lng[i] = self._lat[last], self._lng[last]
+                    self._index[moved] = i
+                self._tokens.pop()
+                self._lat.pop()
+                self._lng.pop()
+                removed += 1
+        return removed
+
+    # ------------------------------------------------------------------ read
+    def within(self, lat: float, lng: float, radius_km: float) -> List[str]:
+        """Token perangkat dalam radius (km) dari titik: bounding box dulu, lalu haversine."""
+        self.ensure_loaded()
+        dlat = radius_km / 110.574
+        dlng = radius_km / (111.320 * max(0.01, math.cos(math.radians(lat))))
+        with self._lock:
+            if np is not None:
+                la = np.frombuffer(self._lat, dtype=np.float64)
+                ln = np.frombuffer(self._lng, dtype=np.float64)
+                idx = np.nonzero((np.abs(la - lat) <= dlat) & (np.abs(ln - lng) <= dlng))[0]
+                d = geo.haversine_km_batch(la[idx], ln[idx], lat, lng)
+                hits = idx[d <= radius_km].tolist()
+                del la, ln  # lepas view buffer supaya array boleh di-resize lagi
+            else:
+                hits = [
+                    i
+                    for i in range(len(self._tokens))
+                    if abs(self._lat[i] - lat) <= dlat
+                    and abs(self._lng[i] - lng) <= dlng
+                    and geo.haversine_km(lat, lng, self._lat[i], self._lng[i]) <= radius_km
+                ]
+            return [self._tokens[i] for i in hits]
+
+
+REGISTRY = DeviceRegistry()
+
+# -----------------------------------------------------------------------------
+# Fan-out
+# -----------------------------------------------------------------------------
+FANOUTS: Deque[Dict[str, Any]] = deque(maxlen=50)
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fcm-fanout")
+        return _pool
+
+
+def fanout(tokens: List[str], title: str, body: str, data: Optional[Dict[str, str]] = None, **kwargs: Any) -> Dict[str, Any]:
+    """Kirim ke semua token dalam batch 500, paralel; catat hasil per batch dan buang token invalid."""
+    from .notifier import send_multicast
+
+    t0 = time.perf_counter()
+    report: Dict[str, Any] = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "title": title,
+        "devices": len(tokens),
+        "batches": [],
+    }
+    batches = [tokens[i : i + BATCH_SIZE] for i in range(0, len(tokens), BATCH_SIZE)]
+    futures = [_executor().submit(send_multicast, b, title, body, data, **kwargs) for b in batches]
+
+    invalid: List[str] = []
+    success = failure = 0
+    for n, (batch, fut) in enumerate(zip(batches, futures)):
+        try:
+            ok, failed, bad = fut.result()
+        except Exception as e:
+            ok, failed, bad = 0, len(batch), []
+            report["batches"].append({"batch": n, "size": len(batch), "error": f"{type(e).__name__}: {e}"})
+            logger.warning("FCM fan-out batch %s failed: %s", n, e)
+        else:
+            report["batches"].append({"batch": n, "size": len(batch), "success": ok, "failure": failed, "invalid": len(bad)})
+        success += ok
+        failure += failed
+        invalid.extend(bad)
+
+    report.update(
+        success=success,
+        failure=failure,
+        pruned=REGISTRY.remove(invalid) if invalid else 0,
+        duration_ms=round((time.perf_counter() - t0) * 1000, 1),
+    )
+    FANOUTS.appendleft(report)
+    logger.info(
+        "FCM fan-out '%s': %s devices, %s ok, %s failed, %s pruned in %.0f ms.",
+        title, len(tokens), success, failure, report["pruned"], report["duration_ms"],
+    )
+    return report
+
+
+def hazard_alert_radius_km() -> float:
+    """Radius geofence untuk alert Sinabung: radius zona bahaya terbesar + buffer."""
+    from . import hazard
+
+    return max(GEOFENCE_MIN_KM, (hazard.current().max_radius_km or 0.0) + GEOFENCE_BUFFER_KM)
+
+
+def geofence_send(
+    lat: float,
+    lng: float,
+    radius_km: float,
+    title: str,
+    body: str,
+    data: Optional[Dict[str, str]] = None,
+    **kwargs: Any,
+) -> Optional[int]:
+    """
+    Alert ke perangkat di dalam radius. Seleksi dilakukan langsung (cepat), pengiriman
+    jalan di background. Return jumlah perangkat sasaran, atau None kalau geofence
+    tidak aktif / registry kosong. Pemanggil lalu cek send_topic_too(): 0 perangkat
+    di radius tidak berarti topic boleh dilewati selama masa migrasi.
+    """
+    if not GEOFENCE_ENABLED or not len(REGISTRY.ensure_loaded()):
+        return None
+    tokens = REGISTRY.within(lat, lng, radius_km)
+    logger.info("Geofenced alert '%s': %s devices within %.1f km.", title, len(tokens), radius_km)
+    if tokens:
+        threading.Thread(
+            target=fanout, args=(tokens, title, body, data), kwargs=kwargs, name="fcm-fanout-coordinator", daemon=True
+        ).start()
+    return len(tokens)
+
+
+def send_topic_too(targeted: Optional[int]) -> bool:
+    """Setelah geofence_send: kirim juga ke topic? (geofence mati, atau masih masa migrasi)."""
+    return targeted is None or TOPIC_FALLBACK
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        "geofence_enabled": GEOFENCE_ENABLED,
+        "topic_fallback": TOPIC_FALLBACK,
+        "devices": len(REGISTRY.ensure_loaded()),
+        "batch_size": BATCH_SIZE,
+        "workers": FANOUT_WORKERS,
+        "recent_fanouts": [{k: v for k, v in r.items() if k != "batches"} for r in FANOUTS],
+    }
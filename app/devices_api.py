@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+
+from . import devices
+from .admin_auth import require_admin
+
+router = APIRouter(tags=["devices"])
+
+
+class DeviceRegisterReq(BaseModel):
+    token: str = Field(..., min_length=20, max_length=4096, description="FCM registration token")
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    platform: Optional[str] = Field(None, max_length=20, description="android/ios/web")
+
+
+class DeviceUnregisterReq(BaseModel):
+    token: str = Field(..., min_length=20, max_length=4096)
+
+
+@router.post("/devices/register")
+def register_device(body: DeviceRegisterReq) -> Dict[str, Any]:
+    """
+    Daftarkan/perbarui token + lokasi kasar (dibulatkan ~1 km) untuk alert per wilayah.
+    Setelah mendaftar, app harus unsubscribe dari topic alert; selama masa migrasi
+    (ALERT_TOPIC_FALLBACK=1) alert tetap dikirim ke topic untuk app versi lama.
+    """
+    saved = devices.REGISTRY.register(body.token, body.lat, body.lng, body.platform)
+    return {"ok": True, **saved}
+
+
+@router.post("/devices/unregister")
+def unregister_device(body: DeviceUnregisterReq) -> Dict[str, Any]:
+    return {"ok": True, "removed": devices.REGISTRY.remove([body.token])}
+
+
+@router.get("/admin/devices", dependencies=[Depends(require_admin)])
+def admin_devices() -> Dict[str, Any]:
+    return devices.snapshot()
+
+
+@router.get("/admin/devices/fanouts", dependencies=[Depends(require_admin)])
+def admin_fanouts() -> List[Dict[str, Any]]:
+    """Hasil fan-out terakhir lengkap dengan hasil per batch."""
+    return list(devices.FANOUTS)
@@ -4,11 +4,12 @@ from datetime import datetime, timezone
 from typing import Optional, List
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field, HttpUrl
 
+from . import changes, precompressed
 from .admin_auth import require_admin
-from .storage import read_json, write_json
+from .storage import read_json, version, write_json
 
 router = APIRouter(tags=["education"])
 
@@ -47,8 +48,9 @@ def _save_all(items: List[dict]) -> None:
 
 # ---------------- PUBLIC ----------------
 @router.get("/education/videos", response_model=list[VideoOut])
-def public_list_videos():
-    return _load_all()
+def public_list_videos(request: Request):
+    v = precompressed.get_or_build("education/videos", version(DB_NAME), _load_all)
+    return precompressed.respond(request, v)
 
 
 # ---------------- ADMIN ----------------
@@ -60,12 +62,13 @@ def admin_list_videos(user: str = require_admin):
 @router.post("/admin/videos", response_model=VideoOut)
 def admin_create_video(body: VideoCreate, user: str = require_admin):
     items = _load_all()
-    item = body.model_dump()
+    item = body.model_dump(mode="json")  # HttpUrl -> str, supaya bisa disimpan sebagai JSON
     item["id"] = uuid4().hex[:10]
     item["created_at"] = _now()
     item["updated_at"] = item["created_at"]
     items.append(item)
     _save_all(items)
+    changes.publish("education", "upsert", item["id"], item)
     return item
 
 
@@ -74,11 +77,12 @@ def admin_update_video(video_id: str, body: VideoUpdate, user: str = require_adm
     items = _load_all()
     for i, it in enumerate(items):
         if it.get("id") == video_id:
-            upd = body.model_dump(exclude_none=True)
+            upd = body.model_dump(mode="json", exclude_none=True)
             it.update(upd)
             it["updated_at"] = _now()
             items[i] = it
             _save_all(items)
+            changes.publish("education", "upsert", video_id, it)
             return it
     raise HTTPException(status_code=404, detail="Video tidak ditemukan")
 
@@ -90,4 +94,5 @@ def admin_delete_video(video_id: str, user: str = require_admin):
     if len(new_items) == len(items):
         raise HTTPException(status_code=404, detail="Video tidak ditemukan")
     _save_all(new_items)
+    changes.publish("education", "delete", video_id)
     return {"ok": True, "deleted_id": video_id}
@@ -8,6 +8,7 @@ from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel, Field
 
+from . import changes, devices, geo
 from .admin_auth import require_admin
 from .storage import read_json, write_json
 
@@ -46,7 +47,31 @@ def _load_state() -> Dict[str, Any]:
 
 
 def _save_state(state: Dict[str, Any]) -> None:
-    write_json(STATE_KEY, state)
+    # status darurat harus sudah di disk sebelum alarm dikirim -> tulis sinkron + fsync
+    write_json(STATE_KEY, state, durable=True)
+
+
+def _send(title: str, body: str, data: Dict[str, str]) -> None:
+    # alarm & "aman" ke wilayah yang sama: perangkat dalam radius bahaya + buffer (kalau geofence aktif)
+    targeted = devices.geofence_send(
+        geo.SINABUNG_LAT,
+        geo.SINABUNG_LNG,
+        devices.hazard_alert_radius_km(),
+        title,
+        body,
+        data,
+        notification=True,
+        sound="default",
+    )
+    if devices.send_topic_too(targeted):
+        send_to_topic(
+            topic=EMERGENCY_TOPIC,
+            title=title,
+            body=body,
+            data=data,
+            notification=True,
+            sound="default",
+        )
 
 class EmergencyTriggerReq(BaseModel):
     level: Optional[str] = Field(None, description="Level bahaya (mis. AWAS/SIAGA)")
@@ -81,6 +106,7 @@ def emergency_trigger(payload: EmergencyTriggerReq) -> Dict[str, Any]:
         }
     )
     _save_state(state)
+    changes.publish("emergency", "upsert", STATE_KEY, state)
 
     if send_to_topic is not None:
         try:
@@ -92,14 +118,7 @@ def emergency_trigger(payload: EmergencyTriggerReq) -> Dict[str, Any]:
                 "message": str(message),
                 "title": str(payload.title or "PERINGATAN DARURAT"),
             }
-            send_to_topic(
-                topic=EMERGENCY_TOPIC,
-                title=payload.title or "PERINGATAN DARURAT",
-                body=message,
-                data=data,
-                notification=True,
-                sound="default",
-            )
+            _send(payload.title or "PERINGATAN DARURAT", message, data)
         except Exception:
             logger.exception("Failed to send emergency alarm notification.")
 
@@ -120,6 +139,7 @@ def emergency_clear(payload: EmergencyClearReq) -> Dict[str, Any]:
         }
     )
     _save_state(state)
+    changes.publish("emergency", "upsert", STATE_KEY, state)
 
     if send_to_topic is not None and NOTIFY_CLEAR:
         try:
@@ -130,14 +150,7 @@ def emergency_clear(payload: EmergencyClearReq) -> Dict[str, Any]:
                 "message": str(message),
                 "title": "Situasi Aman",
             }
-            send_to_topic(
-                topic=EMERGENCY_TOPIC,
-                title="Situasi Aman",
-                body=message,
-                data=data,
-                notification=True,
-                sound="default",
-            )
+            _send("Situasi Aman", message, data)
         except Exception:
             logger.exception("Failed to send emergency clear notification.")
 
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import math
+from typing import Sequence
+
+try:
+    import numpy as np
+except Exception:  # numpy opsional; fallback ke loop Python
+    np = None
+
+# Kawah Gunung Sinabung
+SINABUNG_LAT = 3.170
+SINABUNG_LNG = 98.392
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km_batch(
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    lat0: float = SINABUNG_LAT,
+    lng0: float = SINABUNG_LNG,
+):
+    """
+    Jarak (km) dari satu titik ke banyak titik sekaligus.
+    Dengan numpy hasilnya ndarray (satu pass tervektorisasi), tanpa numpy list float.
+    """
+    if np is None:
+        return [haversine_km(lat0, lng0, la, ln) for la, ln in zip(lats, lngs)]
+
+    la = np.radians(np.asarray(lats, dtype=np.float64))
+    ln = np.radians(np.asarray(lngs, dtype=np.float64))
+    p0, l0 = math.radians(lat0), math.radians(lng0)
+    a = np.sin((la - p0) / 2) ** 2 + math.cos(p0) * np.cos(la) * np.sin((ln - l0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def haversine_km_matrix(
+    lats1: Sequence[float],
+    lngs1: Sequence[float],
+    lats2: Sequence[float],
+    lngs2: Sequence[float],
+):
+    """
+    Matriks jarak (km) len(lats1) x len(lats2) dalam satu pass broadcasting.
+    Dengan numpy hasilnya ndarray 2D, tanpa numpy list of list.
+    """
+    if np is None:
+        return [[haversine_km(a, b, c, d) for c, d in zip(lats2, lngs2)] for a, b in zip(lats1, lngs1)]
+
+    p1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    l1 = np.radians(np.asarray(lngs1, dtype=np.float64))[:, None]
+    p2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    l2 = np.radians(np.asarray(lngs2, dtype=np.float64))[None, :]
+    a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin((l2 - l1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from . import geo
+
+try:
+    import numpy as np
+except Exception:  # numpy opsional; fallback ke loop Python
+    np = None
+
+# -----------------------------------------------------------------------------
+# Geometri zona bahaya dari teks rekomendasi MAGMA:
+#   "radius 3 km dari puncak"                       -> Circle(3)
+#   "radius sektoral 5 km untuk sektor selatan-tenggara" -> Wedge(5, 112.5°, 90°)
+#   "dan 4 km sektor timur-utara"                   -> Wedge(4, 337.5°, 135°)
+# Hasil parse di-memo per report_id (LRU), jadi dashboard, routing, geofence dan
+# planner memakai objek yang sama tanpa parsing ulang teks.
+# -----------------------------------------------------------------------------
+CACHE_SIZE = max(1, int(os.environ.get("HAZARD_CACHE_SIZE", "64")))
+CIRCLE_POINTS = 72
+
+_NUM = r"(\d+(?:[.,]\d+)?)"
+_DIR = r"(?:timur\s*laut|barat\s*daya|barat\s*laut|utara|timur|tenggara|selatan|barat)"
+
+# format lama radius_info (tampilan di app) -- perilaku sama dengan parser lama di main
+_RADIUS_RE = re.compile(rf"radius(?:\s+(radial|sektoral))?\s+{_NUM}\s*km", re.I)
+_DALAM_RE = re.compile(rf"dalam\s+radius\s+{_NUM}\s*km", re.I)
+_AREA_RE = re.compile(r"sektoral\s+([a-z\-–]+(?:\s*[a-z\-–]+)*)", re.I)
+# sektor berarah: "<n> km [untuk|pada|di] sektor <arah>[-<arah>]"
+_SECTOR_RE = re.compile(rf"{_NUM}\s*km\s+(?:untuk\s+|pada\s+|di\s+)?sektor\s+({_DIR}(?:\s*[-–]\s*{_DIR})?)", re.I)
+_DIR_SPLIT_RE = re.compile(r"\s*[-–]\s*")
+_SPACE_RE = re.compile(r"\s+")
+
+BEARINGS: Dict[str, float] = {
+    "utara": 0.0,
+    "timurlaut": 45.0,
+    "timur": 90.0,
+    "tenggara": 135.0,
+    "selatan": 180.0,
+    "baratdaya": 225.0,
+    "barat": 270.0,
+    "baratlaut": 315.0,
+}
+HALF_OCTANT = 22.5
+
+
+def _km(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+def _destination(lat: float, lng: float, bearing_deg: float, km: float) -> Tuple[float, float]:
+    d = km / geo.EARTH_RADIUS_KM
+    b = math.radians(bearing_deg)
+    p1, l1 = math.radians(lat), math.radians(lng)
+    p2 = math.asin(math.sin(p1) * math.cos(d) + math.cos(p1) * math.sin(d) * math.cos(b))
+    l2 = l1 + math.atan2(math.sin(b) * math.sin(d) * math.cos(p1), math.cos(d) - math.sin(p1) * math.sin(p2))
+    return math.degrees(p2), (math.degrees(l2) + 540) % 360 - 180
+
+
+def bearing_deg(lat0: float, lng0: float, lat: float, lng: float) -> float:
+    p1, p2 = math.radians(lat0), math.radians(lat)
+    dl = math.radians(lng - lng0)
+    y = math.sin(dl) * math.cos(p2)
+    x = math.cos(p1) * math.sin(p2) - math.sin(p1) * math.cos(p2) * math.cos(dl)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def _bearing_batch(lats, lngs, lat0: float, lng0: float):
+    p1 = math.radians(lat0)
+    p2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dl = np.radians(np.asarray(lngs, dtype=np.float64) - lng0)
+    y = np.sin(dl) * np.cos(p2)
+    x = math.cos(p1) * np.sin(p2) - math.sin(p1) * np.cos(p2) * np.cos(dl)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+# -----------------------------------------------------------------------------
+# Geometri
+# -----------------------------------------------------------------------------
+@dataclass(frozen=True)
+class Circle:
+    radius_km: float
+
+    def contains_at(self, dist_km: float, bearing: float) -> bool:
+        return dist_km <= self.radius_km
+
+    def ring(self, lat0: float, lng0: float) -> List[List[float]]:
+        pts = [_destination(lat0, lng0, 360 * i / CIRCLE_POINTS, self.radius_km) for i in range(CIRCLE_POINTS)]
+        ring = [[round(lng, 5), round(lat, 5)] for lat, lng in pts]
+        return ring + [ring[0]]
+
+    def properties(self) -> Dict[str, Any]:
+        return {"type": "circle", "radius_km": self.radius_km}
+
+
+@dataclass(frozen=True)
+class Wedge:
+    """Sektor lingkaran: dari start_deg searah jarum jam sejauh sweep_deg (0° = utara)."""
+
+    radius_km: float
+    start_deg: float
+    sweep_deg: float
+    sector: str
+
+    def contains_at(self, dist_km: float, bearing: float) -> bool:
+        return dist_km <= self.radius_km and (bearing - self.start_deg) % 360 <= self.sweep_deg
+
+    def ring(self, lat0: float, lng0: float) -> List[List[float]]:
+        steps = max(2, int(self.sweep_deg / 5))
+        arc = [
+            _destination(lat0, lng0, self.start_deg + self.sweep_deg * i / steps, self.radius_km) for i in range(steps + 1)
+        ]
+        center = [round(lng0, 5), round(lat0, 5)]
+        return [center] + [[round(lng, 5), round(lat, 5)] for lat, lng in arc] + [center]
+
+    def properties(self) -> Dict[str, Any]:
+        return {
+            "type": "wedge",
+            "sector": self.sector,
+            "radius_km": self.radius_km,
+            "start_deg": self.start_deg,
+            "sweep_deg": self.sweep_deg,
+        }
+
+
+Zone = Union[Circle, Wedge]
+
+
+def _wedge(km: float, sector: str) -> Optional[Wedge]:
+    names = [_SPACE_RE.sub("", n.lower()) for n in _DIR_SPLIT_RE.split(sector.strip())]
+    bearings = [BEARINGS[n] for n in names if n in BEARINGS]
+    if not bearings:
+        return None
+    if len(bearings) == 1:
+        start, sweep = bearings[0], 0.0
+    else:
+        a, b = bearings[0], bearings[-1]
+        # ambil busur yang lebih pendek di antara dua arah
+        start, sweep = (a, (b - a) % 360) if (b - a) % 360 <= 180 else (b, (a - b) % 360)
+    # tiap arah mata angin mewakili satu oktan (±22.5°)
+    return Wedge(km, (start - HALF_OCTANT) % 360, sweep + 2 * HALF_OCTANT, "-".join(names))
+
+
+@dataclass(frozen=True)
+class HazardGeometry:
+    zones: Tuple[Zone, ...]
+    radius_info: Tuple[str, ...] = ()
+    report_id: Optional[str] = None
+    lat: float = geo.SINABUNG_LAT
+    lng: float = geo.SINABUNG_LNG
+
+    @classmethod
+    def circle(cls, radius_km: float) -> "HazardGeometry":
+        """Zona lingkaran tunggal (override radius dari query)."""
+        return cls(zones=(Circle(radius_km),) if radius_km > 0 else (), radius_info=(f"Radius {radius_km:g} km",))
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        return (self.lat, self.lng, self.zones)
+
+    @property
+    def max_radius_km(self) -> Optional[float]:
+        return max((z.radius_km for z in self.zones), default=None)
+
+    def __bool__(self) -> bool:
+        return bool(self.zones)
+
+    def contains(self, lat: float, lng: float) -> bool:
+        d = geo.haversine_km(self.lat, self.lng, lat, lng)
+        if self.max_radius_km is None or d > self.max_radius_km:
+            return False
+        b = bearing_deg(self.lat, self.lng, lat, lng)
+        return any(z.contains_at(d, b) for z in self.zones)
+
+    def contains_many(self, lats: Sequence[float], lngs: Sequence[float]):
+        """Mask boolean untuk banyak titik (ndarray dengan numpy, list tanpa numpy)."""
+        if np is None:
+            return [self.contains(la, ln) for la, ln in zip(lats, lngs)]
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        mask = np.zeros(len(lats), dtype=bool)
+        if not self.zones or not len(lats):
+            return mask
+        dist = geo.haversine_km_batch(lats, lngs, self.lat, self.lng)
+        bearing = _bearing_batch(lats, lngs, self.lat, self.lng)
+        for z in self.zones:
+            inside = dist <= z.radius_km
+            if isinstance(z, Wedge):
+                inside &= (bearing - z.start_deg) % 360 <= z.sweep_deg
+            mask |= inside
+        return mask
+
+    def to_geojson(self) -> Dict[str, Any]:
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": z.properties(),
+                    "geometry": {"type": "Polygon", "coordinates": [z.ring(self.lat, self.lng)]},
+                }
+                for z in self.zones
+            ],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"report_id": self.report_id, "max_radius_km": self.max_radius_km, "geojson": self.to_geojson()}
+
+
+# -----------------------------------------------------------------------------
+# Parser
+# -----------------------------------------------------------------------------
+def _legacy_radius_info(rekomendasi: Sequence[str]) -> List[str]:
+    """String tampilan lama, mis. 'Radius 5 km (sektoral) (area: ...)'."""
+    results: List[str] = []
+    for line in rekomendasi or []:
+        for m in _RADIUS_RE.finditer(line):
+            tipe = (m.group(1) or "").lower()
+            km = m.group(2).replace(",", ".")
+            results.append(f"Radius {km} km ({tipe})" if tipe else f"Radius {km} km")
+
+        for m in _DALAM_RE.finditer(line):
+            results.append(f"Radius {m.group(1).replace(',', '.')} km")
+
+        area = _AREA_RE.search(line)
+        if area and results:
+            last = results[-1]
+            if "sektoral" in last and "area:" not in last:
+                results[-1] = f"{last} (area: {area.group(1).strip()})"
+    return list(dict.fromkeys(results))
+
+
+def parse(rekomendasi: Sequence[str], report_id: Optional[str] = None) -> HazardGeometry:
+    zones: List[Zone] = []
+    for line in rekomendasi or []:
+        sector_spans = []
+        for m in _SECTOR_RE.finditer(line):
+            w = _wedge(_km(m.group(1)), m.group(2))
+            if w is not None:
+                zones.append(w)
+                sector_spans.append(m.span(1))
+        for m in _RADIUS_RE.finditer(line):
+            # angka radius sektoral yang sudah jadi wedge tidak dihitung lagi sebagai lingkaran
+            if any(a <= m.start(2) < b for a, b in sector_spans):
+                continue
+            zones.append(Circle(_km(m.group(2))))
+        for m in _DALAM_RE.finditer(line):
+            if any(a <= m.start(1) < b for a, b in sector_spans):
+                continue
+            zones.append(Circle(_km(m.group(1))))
+
+    # zona yang tertutup lingkaran terbesar tidak perlu disimpan
+    max_circle = max((z.radius_km for z in zones if isinstance(z, Circle)), default=0.0)
+    kept = tuple(
+        dict.fromkeys(
+            z for z in zones if (z.radius_km == max_circle if isinstance(z, Circle) else z.radius_km > max_circle)
+        )
+    )
+    return HazardGeometry(zones=kept, radius_info=tuple(_legacy_radius_info(rekomendasi)), report_id=report_id)
+
+
+_lock = threading.Lock()
+_memo: "OrderedDict[Any, HazardGeometry]" = OrderedDict()
+
+
+def for_report(report_id: Optional[str], rekomendasi: Sequence[str]) -> HazardGeometry:
+    """Parse sekali per laporan (LRU CACHE_SIZE). Tanpa report_id, kunci = isi teks."""
+    key = report_id or tuple(rekomendasi or ())
+    with _lock:
+        geom = _memo.get(key)
+        if geom is not None:
+            _memo.move_to_end(key)
+            return geom
+    geom = parse(rekomendasi, report_id)
+    with _lock:
+        _memo[key] = geom
+        while len(_memo) > CACHE_SIZE:
+            _memo.popitem(last=False)
+    return geom
+
+
+def current() -> HazardGeometry:
+    """Zona bahaya dari laporan MAGMA terakhir (snapshot volcano); kosong kalau belum ada."""
+    from . import snapshot
+
+    volcano = snapshot.get("volcano", stale=True) or {}
+    return for_report(volcano.get("report_id"), volcano.get("rekomendasi") or [])
+
+
+def resolve(radius_km: Optional[float] = None) -> HazardGeometry:
+    """Override radius dari query kalau ada, selain itu zona laporan terakhir."""
+    return HazardGeometry.circle(radius_km) if radius_km is not None else current()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from . import history_store
+
+router = APIRouter(tags=["history"])
+
+MAX_LIMIT = 100_000
+
+
+def _parse_range(start: Optional[str], end: Optional[str]) -> tuple[Optional[float], Optional[float]]:
+    try:
+        return history_store.parse_time(start), history_store.parse_time(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end harus format ISO-8601 (mis. 2026-01-31 atau 2026-01-31T10:00:00+07:00)")
+
+
+def _stream_array(items: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    # JSON array yang ditulis bertahap, supaya range besar tidak dimuat sekaligus ke memori
+    yield b"["
+    first = True
+    for it in items:
+        chunk = json.dumps(it, ensure_ascii=False).encode("utf-8")
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+@router.get("/sinabung/history")
+def history(
+    kind: Literal["reports", "quakes"] = "reports",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    format: Literal["json", "ndjson"] = "json",
+):
+    """
+    Riwayat laporan MAGMA (`kind=reports`) atau gempa BMKG (`kind=quakes`)
+    dalam rentang [start, end), urut waktu, dikirim secara streaming.
+    """
+    t0, t1 = _parse_range(start, end)
+    items = history_store.iter_range(kind, t0, t1, limit=limit)
+
+    if format == "ndjson":
+        body = (json.dumps(it, ensure_ascii=False).encode("utf-8") + b"\n" for it in items)
+        return StreamingResponse(body, media_type="application/x-ndjson")
+    return StreamingResponse(_stream_array(items), media_type="application/json")
+
+
+@router.get("/sinabung/history/daily")
+def history_daily(start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """Agregat per hari: jumlah gempa, magnitudo maks, jumlah laporan, level terakhir."""
+    t0, t1 = _parse_range(start, end)
+    return {"bucket": "day", "items": history_store.daily_aggregates(t0, t1)}
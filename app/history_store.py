@@ -0,0 +1,282 @@
+# app/history_store.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("sinabung.history")
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+HISTORY_DB = Path(os.environ.get("HISTORY_DB", str(BASE_DIR / "data" / "history.db")))
+
+# Append-only: baris tidak pernah di-update/dihapus. Dedup lewat PRIMARY KEY
+# (report_id untuk laporan MAGMA, DateTime untuk gempa BMKG) + INSERT OR IGNORE.
+# `ts` = waktu kejadian (periode laporan MAGMA / DateTime gempa), dipakai untuk range dan
+# bucket harian; `fetched_at` = kapan diambil. Laporan tanpa waktu di judul memakai fetched_at.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS magma_reports (
+    report_id   TEXT PRIMARY KEY,
+    ts          REAL NOT NULL,
+    fetched_at  TEXT NOT NULL,
+    reported_at TEXT,
+    level       TEXT,
+    title       TEXT,
+    report_url  TEXT,
+    rekomendasi TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_magma_reports_ts ON magma_reports(ts);
+
+CREATE TABLE IF NOT EXISTS bmkg_quakes (
+    date_time  TEXT PRIMARY KEY,
+    ts         REAL NOT NULL,
+    fetched_at TEXT NOT NULL,
+    magnitude  REAL,
+    kedalaman  TEXT,
+    wilayah    TEXT,
+    potensi    TEXT,
+    dirasakan  TEXT,
+    shakemap   TEXT,
+    lat        REAL,
+    lng        REAL
+);
+CREATE INDEX IF NOT EXISTS idx_bmkg_quakes_ts ON bmkg_quakes(ts);
+"""
+
+KINDS = {
+    "reports": (
+        "magma_reports",
+        "report_id, reported_at, fetched_at, level, title, report_url, rekomendasi",
+    ),
+    "quakes": (
+        "bmkg_quakes",
+        "date_time, fetched_at, magnitude, kedalaman, wilayah, potensi, dirasakan, shakemap, lat, lng",
+    ),
+}
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _connect() -> sqlite3.Connection:
+    HISTORY_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(HISTORY_DB), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _writer() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = _connect()
+        _conn.executescript(_SCHEMA)
+        _migrate(_conn)
+    return _conn
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    # DB lama: belum ada reported_at (ts baris lama tetap waktu fetch)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(magma_reports)")}
+    if "reported_at" not in cols:
+        conn.execute("ALTER TABLE magma_reports ADD COLUMN reported_at TEXT")
+        conn.commit()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _to_float(v: Any) -> Optional[float]:
+    try:
+        return float(str(v).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """ISO-8601 (tanggal saja juga boleh) -> epoch detik. Tanpa zona dianggap UTC."""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# -----------------------------------------------------------------------------
+# Write
+# -----------------------------------------------------------------------------
+def record_report(detail: Dict[str, Any]) -> bool:
+    """Simpan laporan MAGMA. Return True kalau report_id baru."""
+    report_id = detail.get("report_id")
+    if not report_id:
+        return False
+    fetched_at = _now()
+    reported_at = detail.get("reported_at")
+    try:
+        ts = parse_time(reported_at)
+    except ValueError:
+        logger.warning("Bad reported_at for report %s: %r", report_id, reported_at)
+        reported_at, ts = None, None
+    with _lock:
+        conn = _writer()
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO magma_reports "
+            "(report_id, ts, fetched_at, reported_at, level, title, report_url, rekomendasi) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(report_id),
+                ts if ts is not None else parse_time(fetched_at),
+                fetched_at,
+                reported_at,
+                detail.get("level"),
+                detail.get("title"),
+                detail.get("report_url"),
+                json.dumps(detail.get("rekomendasi") or [], ensure_ascii=False),
+            ),
+        )
+        conn.commit()
+    return cur.rowcount > 0
+
+
+def insert_quakes(quakes: List[Dict[str, Any]]) -> List[str]:
+    """Simpan gempa BMKG (format hasil bmkg.py). Return DateTime yang benar-benar baru (belum ada di DB)."""
+    rows = []
+    fetched_at = _now()
+    for q in quakes:
+        dt = q.get("date_time")
+        if not dt:
+            continue
+        try:
+            ts = parse_time(dt)
+        except ValueError:
+            logger.warning("Skipping quake with bad DateTime: %r", dt)
+            continue
+        rows.append(
+            (
+                dt,
+                ts,
+                fetched_at,
+                _to_float(q.get("magnitude")),
+                q.get("kedalaman"),
+                q.get("wilayah"),
+                q.get("potensi"),
+                q.get("dirasakan"),
+                q.get("shakemap"),
+                q.get("lat"),
+                q.get("lng"),
+            )
+        )
+    if not rows:
+        return []
+    inserted: List[str] = []
+    with _lock:
+        conn = _writer()
+        # per baris supaya rowcount INSERT OR IGNORE menunjukkan mana yang baru; satu transaksi
+        for row in rows:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO bmkg_quakes "
+                "(date_time, ts, fetched_at, magnitude, kedalaman, wilayah, potensi, dirasakan, shakemap, lat, lng) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            if cur.rowcount > 0:
+                inserted.append(row[0])
+        conn.commit()
+    return inserted
+
+
+def record_quakes(quakes: List[Dict[str, Any]]) -> int:
+    """Simpan gempa BMKG. Return jumlah gempa baru."""
+    return len(insert_quakes(quakes))
+
+
+def record_quake(quake: Dict[str, Any]) -> bool:
+    return record_quakes([quake]) > 0
+
+
+# -----------------------------------------------------------------------------
+# Read
+# -----------------------------------------------------------------------------
+def _range_sql(start: Optional[float], end: Optional[float]) -> tuple[str, list]:
+    where, args = [], []
+    if start is not None:
+        where.append("ts >= ?")
+        args.append(start)
+    if end is not None:
+        where.append("ts < ?")
+        args.append(end)
+    return (" WHERE " + " AND ".join(where)) if where else "", args
+
+
+def iter_range(
+    kind: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: Optional[int] = None,
+    batch_size: int = 500,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterasi baris urut waktu. Pakai koneksi baca sendiri (WAL) supaya
+    streaming range besar tidak menahan lock penulis.
+    """
+    table, cols = KINDS[kind]
+    with _lock:
+        _writer()  # pastikan skema ada
+    where, args = _range_sql(start, end)
+    sql = f"SELECT {cols} FROM {table}{where} ORDER BY ts"
+    if limit:
+        sql += " LIMIT ?"
+        args.append(int(limit))
+
+    conn = _connect()
+    try:
+        cur = conn.execute(sql, args)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for r in rows:
+                item = dict(r)
+                if "rekomendasi" in item:
+                    item["rekomendasi"] = json.loads(item["rekomendasi"] or "[]")
+                yield item
+    finally:
+        conn.close()
+
+
+def daily_aggregates(start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Ringkasan per hari (UTC): jumlah gempa, magnitudo maks, jumlah laporan & level terakhir."""
+    with _lock:
+        conn = _writer()
+        where, args = _range_sql(start, end)
+        quakes = conn.execute(
+            "SELECT date(ts, 'unixepoch') AS day, COUNT(*) AS quakes, MAX(magnitude) AS magnitude_max "
+            f"FROM bmkg_quakes{where} GROUP BY day",
+            args,
+        ).fetchall()
+        # level terakhir per hari lewat window function: satu scan, bukan subquery per baris
+        reports = conn.execute(
+            "SELECT day, COUNT(*) AS reports, MAX(CASE WHEN rn = 1 THEN level END) AS level FROM ("
+            " SELECT date(ts, 'unixepoch') AS day, level,"
+            " ROW_NUMBER() OVER (PARTITION BY date(ts, 'unixepoch') ORDER BY ts DESC) AS rn"
+            f" FROM magma_reports{where}"
+            ") GROUP BY day",
+            args,
+        ).fetchall()
+
+    days: Dict[str, Dict[str, Any]] = {}
+    for r in quakes:
+        days.setdefault(r["day"], {"day": r["day"], "quakes": 0, "magnitude_max": None, "reports": 0, "level": None})
+        days[r["day"]].update(quakes=r["quakes"], magnitude_max=r["magnitude_max"])
+    for r in reports:
+        days.setdefault(r["day"], {"day": r["day"], "quakes": 0, "magnitude_max": None, "reports": 0, "level": None})
+        days[r["day"]].update(reports=r["reports"], level=r["level"])
+    return [days[k] for k in sorted(days)]
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+
+USER_AGENT = "sinabung-alert-mvp/1.0"
+
+# Satu AsyncClient bersama untuk semua fetch upstream (MAGMA, BMKG) supaya
+# koneksi keep-alive/TLS dipakai ulang antar polling, bukan handshake tiap request.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=20,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            follow_redirects=True,
+        )
+    return _client
+
+
+def set_client(client: Optional[httpx.AsyncClient]) -> None:
+    """Ganti client bersama (mis. transport rekaman untuk replay)."""
+    global _client
+    _client = client
+
+
+async def aclose() -> None:
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
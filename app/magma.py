@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 import re
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urljoin
 
-import httpx
 from bs4 import BeautifulSoup
 
+from . import tracing
+from .http_client import get_client
+
+
+async def _fetch_html(url: str, stage: str) -> str:
+    with tracing.span(stage, **{"http.url": url}) as sp:
+        resp = await get_client().get(url, extensions=tracing.http_extensions())
+        sp.set("http.status_code", resp.status_code).set("bytes", len(resp.content))
+        resp.raise_for_status()
+        return resp.text
+
 
 def _extract_report_id(report_url: str) -> str | None:
     m = re.search(r"/laporan/(\d+)", report_url)
@@ -21,26 +32,22 @@ async def get_latest_sinabung_report_url(tingkat_url: str) -> str:
     if not tingkat_url:
         raise ValueError("tingkat_url kosong")
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        resp = await client.get(
-            tingkat_url,
-            headers={"User-Agent": "sinabung-alert-mvp/1.0"},
-        )
-        resp.raise_for_status()
+    html = await _fetch_html(tingkat_url, "magma.fetch_tingkat")
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    with tracing.span("magma.parse_tingkat"):
+        soup = BeautifulSoup(html, "html.parser")
 
-    # Cari node teks yang mengandung "Sinabung", lalu cari link laporan di container terdekat.
-    candidates = soup.find_all(string=re.compile(r"\bSinabung\b", re.IGNORECASE))
-    for text_node in candidates:
-        parent = getattr(text_node, "parent", None)
-        if parent is None:
-            continue
+        # Cari node teks yang mengandung "Sinabung", lalu cari link laporan di container terdekat.
+        candidates = soup.find_all(string=re.compile(r"\bSinabung\b", re.IGNORECASE))
+        for text_node in candidates:
+            parent = getattr(text_node, "parent", None)
+            if parent is None:
+                continue
 
-        container = parent.find_parent(["li", "tr", "div", "p"]) or parent
-        a = container.find("a", href=re.compile(r"/v1/gunung-api/laporan/"))
-        if a and a.get("href"):
-            return urljoin(tingkat_url, a["href"])
+            container = parent.find_parent(["li", "tr", "div", "p"]) or parent
+            a = container.find("a", href=re.compile(r"/v1/gunung-api/laporan/"))
+            if a and a.get("href"):
+                return urljoin(tingkat_url, a["href"])
 
     raise RuntimeError("Tidak menemukan link laporan Sinabung di halaman Tingkat Aktivitas.")
 
@@ -51,19 +58,73 @@ async def fetch_report_detail(report_url: str) -> dict:
     - report_id
     - level (contoh: 'Level II (Waspada)')
     - title (baris ringkas)
+    - reported_at (akhir periode dari judul, ISO; None kalau tidak ada)
     - rekomendasi (list beberapa baris)
     """
     if not report_url:
         raise ValueError("report_url kosong")
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        resp = await client.get(
-            report_url,
-            headers={"User-Agent": "sinabung-alert-mvp/1.0"},
-        )
-        resp.raise_for_status()
+    html = await _fetch_html(report_url, "magma.fetch_report")
+    with tracing.span("magma.parse_report"):
+        return parse_report(html, report_url)
+
+
+_BULAN = {
+    b: i
+    for i, b in enumerate(
+        ["januari", "februari", "maret", "april", "mei", "juni", "juli",
+         "agustus", "september", "oktober", "november", "desember"],
+        start=1,
+    )
+}
+_ZONES = {"wib": 7, "wita": 8, "wit": 9}
+_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?")
+_TANGGAL_RE = re.compile(r"(\d{1,2})\s+(" + "|".join(_BULAN) + r")\s+(\d{4})", re.I)
+# "00:00-06:00 WIB" -> akhir periode; atau satu jam "pukul 06:00 WIB"
+_JAM_RE = re.compile(r"(?:\d{1,2}[:.]\d{2}\s*[-–]\s*)?(\d{1,2})[:.](\d{2})\s*(WIB|WITA|WIT)?", re.I)
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+
+def parse_reported_at(title: str | None) -> str | None:
+    """
+    Waktu laporan (akhir periode pengamatan) dari judul, ISO-8601 dengan zona.
+    None kalau judul tidak memuat tanggal; pemanggil lalu pakai waktu fetch.
+    """
+    if not title:
+        return None
+    m = _ISO_RE.search(title)
+    if m:
+        try:
+            dt = datetime.fromisoformat(m.group(0).replace("Z", "+00:00"))
+        except ValueError:
+            dt = None
+        if dt is not None:
+            if len(m.group(0)) == 10:
+                dt += timedelta(hours=12)  # tanggal saja (lihat di bawah)
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone(timedelta(hours=7)))
+            return dt.isoformat()
+
+    m = _TANGGAL_RE.search(title)
+    if not m:
+        return None
+    try:
+        day = datetime(int(m.group(3)), _BULAN[m.group(2).lower()], int(m.group(1)))
+    except ValueError:
+        return None
+    jam = _JAM_RE.search(title)
+    hours = 7  # Sinabung: WIB
+    if jam:
+        if jam.group(3):
+            hours = _ZONES[jam.group(3).lower()]
+        # "24:00" = tengah malam di akhir hari itu
+        day += timedelta(hours=int(jam.group(1)), minutes=int(jam.group(2)))
+    else:
+        day += timedelta(hours=12)  # tanpa jam: tengah hari, supaya bucket harian (UTC) tetap di tanggal itu
+    return day.replace(tzinfo=timezone(timedelta(hours=hours))).isoformat()
+
+
+def parse_report(html: str, report_url: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
     text = soup.get_text("\n", strip=True)
 
     # Heuristik level
@@ -96,5 +157,6 @@ async def fetch_report_detail(report_url: str) -> dict:
         "report_id": _extract_report_id(report_url),
         "level": level,
         "title": title_line,
+        "reported_at": parse_reported_at(title_line),
         "rekomendasi": rekomendasi,
     }
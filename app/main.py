@@ -1,13 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
-import re
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 
 # -----------------------------------------------------------------------------
 # Logging
@@ -20,6 +21,14 @@ logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 # -----------------------------------------------------------------------------
 app = FastAPI(title="Sinabung Early Warning MVP")
 
+# -----------------------------------------------------------------------------
+# Admission control (prioritas route + rate limit per klien), lihat app/admission.py
+# -----------------------------------------------------------------------------
+from . import admission
+
+if os.environ.get("ADMISSION_ENABLED", "1").strip() != "0":
+    app.add_middleware(admission.AdmissionMiddleware)
+
 # -----------------------------------------------------------------------------
 # Include routers (posko + education + emergency + admin auth)
 # Pastikan file-file ini ada di folder app/
@@ -31,6 +40,38 @@ try:
 except Exception as e:
     logger.warning("Posko routes not enabled: %s: %s", type(e).__name__, e)
 
+try:
+    from .occupancy_api import router as occupancy_router
+    from .occupancy import COUNTERS as occupancy_counters
+    app.include_router(occupancy_router)
+    logger.info("Occupancy routes enabled.")
+except Exception as e:
+    occupancy_counters = None
+    logger.warning("Occupancy routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .routing_api import router as routing_router
+    from . import routing
+    app.include_router(routing_router)
+    logger.info("Routing routes enabled.")
+except Exception as e:
+    routing = None
+    logger.warning("Routing routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .devices_api import router as devices_router
+    app.include_router(devices_router)
+    logger.info("Device routes enabled.")
+except Exception as e:
+    logger.warning("Device routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .allocation_api import router as allocation_router
+    app.include_router(allocation_router)
+    logger.info("Allocation routes enabled.")
+except Exception as e:
+    logger.warning("Allocation routes not enabled: %s: %s", type(e).__name__, e)
+
 try:
     from .education_api import router as edu_router
     app.include_router(edu_router)
@@ -45,6 +86,43 @@ try:
 except Exception as e:
     logger.warning("Emergency routes not enabled: %s: %s", type(e).__name__, e)
 
+try:
+    from .history_api import router as history_router
+    app.include_router(history_router)
+    logger.info("History routes enabled.")
+except Exception as e:
+    logger.warning("History routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .shakemap_api import router as shakemap_router
+    app.include_router(shakemap_router)
+    logger.info("Shakemap routes enabled.")
+except Exception as e:
+    logger.warning("Shakemap routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .search_api import router as search_router
+    app.include_router(search_router)
+    logger.info("Search routes enabled.")
+except Exception as e:
+    logger.warning("Search routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .sync_api import router as sync_router
+    from . import sync_log
+    app.include_router(sync_router)
+    logger.info("Sync routes enabled.")
+except Exception as e:
+    sync_log = None
+    logger.warning("Sync routes not enabled: %s: %s", type(e).__name__, e)
+
+try:
+    from .debug_api import router as debug_router
+    app.include_router(debug_router)
+    logger.info("Debug routes enabled.")
+except Exception as e:
+    logger.warning("Debug routes not enabled: %s: %s", type(e).__name__, e)
+
 # INI PENTING: file-nya HARUS bernama "admin_auth_api.py"
 # (bukan admin_auth.py)
 try:
@@ -66,6 +144,14 @@ send_to_topic = None
 load_state = None
 save_state = None
 
+from . import devices, geo, hazard, history_store, http_client, polling, precompressed, quake_ingest, snapshot, storage, tracing
+
+try:
+    from . import static_export
+except Exception as e:
+    static_export = None
+    logger.warning("Static export not enabled: %s: %s", type(e).__name__, e)
+
 try:
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
     from .magma import get_latest_sinabung_report_url, fetch_report_detail
@@ -80,39 +166,29 @@ except Exception as e:
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
-def _extract_radius_km(rekomendasi: list[str]) -> list[str]:
-    results: list[str] = []
-
-    for line in rekomendasi or []:
-        for m in re.finditer(
-            r"radius(?:\s+(radial|sektoral))?\s+(\d+(?:[.,]\d+)?)\s*km",
-            line,
-            flags=re.I,
-        ):
-            tipe = (m.group(1) or "").lower()
-            km = m.group(2).replace(",", ".")
-            if tipe:
-                results.append(f"Radius {km} km ({tipe})")
-            else:
-                results.append(f"Radius {km} km")
-
-        for m in re.finditer(r"dalam\s+radius\s+(\d+(?:[.,]\d+)?)\s*km", line, flags=re.I):
-            km = m.group(1).replace(",", ".")
-            results.append(f"Radius {km} km")
-
-        area = re.search(r"sektoral\s+([a-z\-–]+(?:\s*[a-z\-–]+)*)", line, flags=re.I)
-        if area and results:
-            last = results[-1]
-            if "sektoral" in last and "area:" not in last:
-                results[-1] = f"{last} (area: {area.group(1).strip()})"
-
-    uniq: list[str] = []
-    seen: set[str] = set()
-    for r in results:
-        if r not in seen:
-            seen.add(r)
-            uniq.append(r)
-    return uniq
+def _record_history(detail: Dict[str, Any]) -> None:
+    # riwayat hanya pelengkap; jangan sampai gagal simpan mengganggu dashboard/notifikasi
+    # (gempa BMKG dicatat oleh quake_ingest)
+    try:
+        history_store.record_report(detail)
+    except Exception:
+        logger.exception("Failed to record history.")
+
+
+def _volcano_payload(detail: Dict[str, Any]) -> Dict[str, Any]:
+    rekom = detail.get("rekomendasi") or []
+    zone = hazard.for_report(detail.get("report_id"), rekom)
+    return {
+        "name": "Sinabung",
+        "source": "MAGMA/PVMBG",
+        "level": detail.get("level"),
+        "report_id": detail.get("report_id"),
+        "report_url": detail.get("report_url"),
+        "title": detail.get("title"),
+        "rekomendasi": rekom,
+        "radius_info": list(zone.radius_info),
+        "hazard": zone.to_dict(),
+    }
 
 
 def _ensure_magma_ready() -> None:
@@ -132,16 +208,31 @@ def root() -> Dict[str, Any]:
         # public:
         "posko_public": "/evacuation/posts",
         "education_public": "/education/videos",
+        "search": "/search?q=",
+        "sync": "/sync?since=<seq>",
         # admin auth:
         "admin_login": "/admin/login",
         "admin_me": "/admin/me",
         # admin CRUD:
         "posko_admin": "/admin/posts (GET/POST)",
         "posko_admin_by_id": "/admin/posts/{posko_id} (PUT/DELETE)",
+        "occupancy_public": "/evacuation/occupancy",
+        "evacuation_route": "/evacuation/route?lat=&lng=&orang=1",
+        "device_register": "/devices/register (POST)",
+        "admin_devices": "/admin/devices (+ /fanouts)",
+        "admin_evacuation_plan": "/admin/evacuation/plan?radius_km=",
+        "occupancy_admin": "/admin/occupancy/{posko_id}/checkin|checkout (POST), /admin/occupancy/batch (POST)",
         "education_admin": "/admin/videos (GET/POST)",
         "education_admin_by_id": "/admin/videos/{video_id} (PUT/DELETE)",
         # scheduler manual:
         "admin_check_now": "/admin/check-now (POST)",
+        "admin_scheduler": "/admin/scheduler",
+        "admin_admission": "/admin/admission",
+        "admin_traces": "/admin/debug/traces (+ /otlp)",
+        # riwayat:
+        "history": "/sinabung/history?kind=reports|quakes&start=&end=",
+        "history_daily": "/sinabung/history/daily",
+        "shakemap": "/earthquake/shakemap/{name}?w=480",
     }
 
 
@@ -167,24 +258,35 @@ def sinabung_last() -> Dict[str, Any]:
 
 
 @app.get("/sinabung/dashboard")
-async def dashboard() -> Dict[str, Any]:
+async def dashboard(request: Request) -> Response:
     """
     Dashboard gabungan:
-    - MAGMA/PVMBG: level + laporan + rekomendasi + radius_info
-    - BMKG: gempa terbaru (autogempa)
+    - MAGMA/PVMBG: level + laporan + rekomendasi + radius_info + hazard (GeoJSON zona bahaya)
+    - BMKG: gempa terbaru (autogempa) + gempa dekat Sinabung, dari ingester background
 
     IMPORTANT:
     - Jika MAGMA gagal (DNS/timeout), endpoint tetap balikin BMKG + info error MAGMA.
+    - Kalau data live tidak ada, pakai snapshot last-known-good (stale=true + age_seconds).
+    - Snapshot MAGMA yang masih segar (< DASHBOARD_MAX_AGE_SECONDS) langsung dipakai
+      tanpa fetch ulang. Snapshot yang lebih tua juga langsung dikirim (stale=true)
+      dan MAGMA di-refresh di background, jadi setelah restart dashboard langsung berisi.
+    - Body gzip/brotli dibangun sekali per isi yang sama (lihat precompressed).
     """
-    # BMKG dulu (biar tetap ada output walau MAGMA error)
-    try:
-        from .bmkg import fetch_latest_quake
-        bmkg = await fetch_latest_quake()
-    except Exception as e:
-        bmkg = {"source": "BMKG", "error": f"{type(e).__name__}: {e}"}
+    data = await _dashboard_data()
+    # hash + kompresi di thread pool: body bisa berubah tiap request, jangan blok event loop
+    v = await run_in_threadpool(precompressed.for_body, "sinabung/dashboard", precompressed.encode_json(data))
+    return precompressed.respond(request, v)
+
 
-    # MAGMA
+_volcano_refresh: Optional[asyncio.Task] = None
+_volcano_error: Optional[str] = None  # error refresh background terakhir (None = sukses)
+
+
+async def _fetch_volcano() -> Dict[str, Any]:
+    """Fetch MAGMA inline; sukses -> simpan snapshot. Error ditaruh di payload["error"]."""
+    global _volcano_error
     volcano_payload: Dict[str, Any] = {"name": "Sinabung", "source": "MAGMA/PVMBG"}
+    magma_breaker = polling.breaker("magma")
 
     try:
         _ensure_magma_ready()
@@ -193,24 +295,25 @@ async def dashboard() -> Dict[str, Any]:
         if not tingkat_url:
             raise HTTPException(status_code=500, detail="MAGMA_TINGKAT_URL belum diset")
 
-        report_url = await get_latest_sinabung_report_url(tingkat_url)
-        logger.info("Report URL: %s", report_url)
+        if not magma_breaker.allow():
+            raise HTTPException(
+                status_code=503,
+                detail=f"MAGMA sedang tidak tersedia (coba lagi {int(magma_breaker.retry_after())} detik)",
+            )
 
-        detail = await fetch_report_detail(report_url)
+        try:
+            report_url = await get_latest_sinabung_report_url(tingkat_url)
+            logger.info("Report URL: %s", report_url)
 
-        rekom = detail.get("rekomendasi") or []
-        radius = _extract_radius_km(rekom)
-
-        volcano_payload.update(
-            {
-                "level": detail.get("level"),
-                "report_id": detail.get("report_id"),
-                "report_url": detail.get("report_url"),
-                "title": detail.get("title"),
-                "rekomendasi": rekom,
-                "radius_info": radius,
-            }
-        )
+            detail = await fetch_report_detail(report_url)
+        except Exception as e:
+            magma_breaker.record_failure(e)
+            raise
+        magma_breaker.record_success()
+        _record_history(detail)
+
+        volcano_payload = _volcano_payload(detail)
+        snapshot.save("volcano", volcano_payload)
 
     except HTTPException as e:
         volcano_payload["error"] = e.detail
@@ -219,12 +322,82 @@ async def dashboard() -> Dict[str, Any]:
     except Exception as e:
         volcano_payload["error"] = f"Gagal proses MAGMA: {type(e).__name__}: {e}"
 
+    _volcano_error = volcano_payload.get("error")
+    return volcano_payload
+
+
+def _refresh_volcano_in_background() -> None:
+    """Satu refresh MAGMA di background sekaligus; request tidak menunggu."""
+    global _volcano_refresh
+    if _volcano_refresh is None or _volcano_refresh.done():
+        _volcano_refresh = asyncio.get_running_loop().create_task(_fetch_volcano())
+
+
+async def _dashboard_data() -> Dict[str, Any]:
+    # BMKG: hasil ingester background (tidak memanggil BMKG inline)
+    bmkg = quake_ingest.INGESTER.payload()
+    if bmkg.get("error"):
+        cached = snapshot.get("earthquake", stale=True)
+        if cached is not None:
+            bmkg = {**cached, "error": bmkg["error"]}
+
+    # MAGMA: snapshot segar dipakai langsung; snapshot lama juga langsung dikirim
+    # (stale=true) sementara refresh jalan di background. Fetch inline hanya kalau
+    # belum ada snapshot sama sekali.
+    max_age = float(os.environ.get("DASHBOARD_MAX_AGE_SECONDS", "60"))
+    age = snapshot.age_seconds("volcano")
+    if age is not None:
+        stale = age > max_age
+        if stale:
+            _refresh_volcano_in_background()
+        volcano = snapshot.get("volcano", stale=stale)
+        if stale and _volcano_error:
+            volcano["error"] = _volcano_error
+        return {"volcano": volcano, "earthquake": bmkg}
+
+    volcano_payload = await _fetch_volcano()
+    if volcano_payload.get("error"):
+        cached = snapshot.get("volcano", stale=True)
+        if cached is not None:
+            volcano_payload = {**cached, "error": volcano_payload["error"]}
+
     return {"volcano": volcano_payload, "earthquake": bmkg}
 
 # -----------------------------------------------------------------------------
 # Core job: check MAGMA -> compare state -> send notification -> save state
 # -----------------------------------------------------------------------------
 async def check_update() -> None:
+    with tracing.trace("check_update") as root:
+        try:
+            root.set("outcome", await _check_update_once())
+        finally:
+            with tracing.span("scheduler.reschedule") as sp:
+                sp.set("interval_seconds", _reschedule_check())
+
+
+def _reschedule_check() -> int:
+    """Hitung ulang interval dari level terakhir + frekuensi perubahan, lalu jadwalkan ulang job."""
+    level = None
+    if load_state is not None:
+        try:
+            level = getattr(load_state(), "last_level", None)
+        except Exception:
+            logger.exception("Failed to load state for scheduling.")
+
+    interval = polling.plan_next(level)
+    if scheduler is None or not getattr(scheduler, "running", False):
+        return interval
+    try:
+        scheduler.reschedule_job("sinabung_check", trigger="interval", seconds=interval)
+    except Exception:
+        logger.exception("Failed to reschedule sinabung_check.")
+        return interval
+    logger.debug("Next check in %s seconds (level=%s).", interval, level)
+    return interval
+
+
+async def _check_update_once() -> str:
+    """Return outcome singkat (untuk trace): skipped / circuit_open / fetch_failed / no_change / changed."""
     if (
         FEATURES_ERROR
         or get_latest_sinabung_report_url is None
@@ -233,22 +406,34 @@ async def check_update() -> None:
         or save_state is None
     ):
         logger.debug("check_update skipped; features not ready: %s", FEATURES_ERROR)
-        return
+        return "skipped"
 
     tingkat_url = os.environ.get("MAGMA_TINGKAT_URL", "").strip()
     if not tingkat_url:
         logger.warning("MAGMA_TINGKAT_URL is empty; skipping check_update.")
-        return
+        return "skipped"
 
     topic = os.environ.get("FCM_TOPIC", "sinabung").strip() or "sinabung"
-    st = load_state()
+    with tracing.span("state.load"):
+        st = load_state()
+
+    magma_breaker = polling.breaker("magma")
+    if not magma_breaker.allow():
+        logger.info("MAGMA circuit open; skipping (retry in %.0fs).", magma_breaker.retry_after())
+        return "circuit_open"
 
     try:
         report_url = await get_latest_sinabung_report_url(tingkat_url)
         detail = await fetch_report_detail(report_url)
-    except Exception:
+    except Exception as e:
+        magma_breaker.record_failure(e)
         logger.exception("Failed to fetch/parse MAGMA data.")
-        return
+        return "fetch_failed"
+    magma_breaker.record_success()
+    with tracing.span("history.record"):
+        _record_history(detail)
+    with tracing.span("snapshot.save"):
+        snapshot.save("volcano", _volcano_payload(detail))
 
     new_id = detail.get("report_id")
     new_level = detail.get("level")
@@ -265,7 +450,9 @@ async def check_update() -> None:
             getattr(st, "last_report_id", None),
             getattr(st, "last_level", None),
         )
-        return
+        return "no_change"
+
+    polling.record_change()
 
     title = "Update Gunung Sinabung"
     body_parts = []
@@ -279,26 +466,34 @@ async def check_update() -> None:
         body = body[:177] + "..."
 
     if send_to_topic is not None:
-        try:
-            msg_id = send_to_topic(
-                topic=topic,
-                title=title,
-                body=body,
-                data={
+        with tracing.span("fcm.send", topic=topic, report_id=str(new_id or "")) as sp:
+            try:
+                data = {
                     "report_url": str(detail.get("report_url", "")),
                     "level": str(new_level or ""),
                     "report_id": str(new_id or ""),
-                },
-            )
-            logger.info("FCM sent msg_id=%s", msg_id)
-        except Exception:
-            logger.exception("Failed to send FCM (cek GOOGLE_APPLICATION_CREDENTIALS).")
+                }
+                targeted = devices.geofence_send(
+                    geo.SINABUNG_LAT, geo.SINABUNG_LNG, devices.hazard_alert_radius_km(), title, body, data
+                )
+                if targeted is not None:
+                    sp.set("outcome", "geofenced").set("devices", targeted)
+                if devices.send_topic_too(targeted):
+                    msg_id = send_to_topic(topic=topic, title=title, body=body, data=data)
+                    if targeted is None:
+                        sp.set("outcome", "sent")
+                    logger.info("FCM sent msg_id=%s", msg_id)
+            except Exception as e:
+                sp.set("outcome", "failed").set("error", f"{type(e).__name__}: {e}")
+                logger.exception("Failed to send FCM (cek GOOGLE_APPLICATION_CREDENTIALS).")
 
     if new_id:
         st.last_report_id = new_id
     if new_level:
         st.last_level = new_level
-    save_state(st)
+    with tracing.span("state.save"):
+        save_state(st)
+    return "changed"
 
 
 @app.post("/admin/check-now")
@@ -306,29 +501,91 @@ async def admin_check_now() -> Dict[str, Any]:
     await check_update()
     return {"ok": True}
 
+
+try:
+    from .admin_auth import require_admin
+except Exception as e:
+    _ADMIN_AUTH_ERROR = f"{type(e).__name__}: {e}"
+
+    def require_admin() -> str:
+        # tanpa modul auth, endpoint admin ditutup (bukan dibuka)
+        raise HTTPException(status_code=503, detail=f"Admin auth not ready: {_ADMIN_AUTH_ERROR}")
+
+
+@app.get("/admin/admission", dependencies=[Depends(require_admin)])
+def admin_admission() -> Dict[str, Any]:
+    return admission.snapshot()
+
+
+@app.get("/admin/scheduler", dependencies=[Depends(require_admin)])
+def admin_scheduler() -> Dict[str, Any]:
+    data = polling.snapshot()
+    data["running"] = bool(scheduler is not None and getattr(scheduler, "running", False))
+    if data["running"]:
+        job = scheduler.get_job("sinabung_check")
+        if job is not None and job.next_run_time is not None:
+            data["next_run_utc"] = job.next_run_time.astimezone(timezone.utc).isoformat()
+    return data
+
 # -----------------------------------------------------------------------------
 # Startup/shutdown: scheduler
 # -----------------------------------------------------------------------------
 @app.on_event("startup")
 async def on_startup() -> None:
+    # snapshot last-known-good dimuat sebelum request pertama (warm start)
+    snapshot.load()
+
+    if static_export is not None:
+        try:
+            static_export.export_all()
+        except Exception:
+            logger.exception("Initial static export failed.")
+
+    if sync_log is not None:
+        try:
+            sync_log.ensure_seeded()
+            sync_log.compact()
+        except Exception:
+            logger.exception("Sync log startup failed.")
+
+    if occupancy_counters is not None:
+        try:
+            occupancy_counters.load()
+        except Exception:
+            logger.exception("Failed to load occupancy counters.")
+
+    if routing is not None:
+        routing.warm_up()
+
+    try:
+        devices.REGISTRY.load()
+    except Exception:
+        logger.exception("Failed to load device registry.")
+
+    # ingester BMKG jalan sendiri (asyncio task), tidak butuh apscheduler/firebase
+    quake_ingest.INGESTER.start()
+    logger.info("BMKG ingester started (every %s seconds).", quake_ingest.POLL_SECONDS)
+
     if FEATURES_ERROR or scheduler is None:
         logger.warning("Scheduler not started: %s", FEATURES_ERROR)
         return
 
-    interval_minutes = int(os.environ.get("CHECK_INTERVAL_MINUTES", "5"))
-    interval_minutes = max(1, interval_minutes)
+    # Interval awal dari level terakhir yang tersimpan; setelah tiap check_update
+    # interval dihitung ulang (lihat _reschedule_check).
+    st = load_state() if load_state is not None else None
+    interval_seconds = polling.plan_next(getattr(st, "last_level", None), ran=False)
 
     scheduler.add_job(
         check_update,
         trigger="interval",
-        minutes=interval_minutes,
+        seconds=interval_seconds,
         id="sinabung_check",
         replace_existing=True,
         max_instances=1,
         coalesce=True,
     )
     scheduler.start()
-    logger.info("Scheduler started (interval=%s minutes).", interval_minutes)
+    logger.info("Scheduler started (interval=%s seconds, adaptive).", interval_seconds)
 
 
 @app.on_event("shutdown")
@@ -336,3 +593,9 @@ async def on_shutdown() -> None:
     if scheduler is not None and getattr(scheduler, "running", False):
         scheduler.shutdown(wait=False)
         logger.info("Scheduler stopped.")
+
+    await quake_ingest.INGESTER.stop()
+    await http_client.aclose()
+    if occupancy_counters is not None:
+        occupancy_counters.shutdown()
+    storage.shutdown()
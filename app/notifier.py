@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import os
+from typing import List, Tuple
 
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, exceptions, messaging
+
+# token yang pasti tidak akan pernah valid lagi -> dihapus dari registry
+_INVALID_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
 
 
 def init_firebase() -> None:
@@ -48,13 +52,52 @@ def send_to_topic(
         topic=topic,
         notification=notif,
         data=data or {},
-        android=messaging.AndroidConfig(
-            priority=android_priority,
-            notification=messaging.AndroidNotification(
-                sound=sound,
-            )
-            if sound
-            else None,
-        ),
+        android=_android(android_priority, sound),
     )
     return messaging.send(msg)
+
+
+def _android(android_priority: str, sound: str | None) -> messaging.AndroidConfig:
+    return messaging.AndroidConfig(
+        priority=android_priority,
+        notification=messaging.AndroidNotification(
+            sound=sound,
+        )
+        if sound
+        else None,
+    )
+
+
+def send_multicast(
+    tokens: List[str],
+    title: str,
+    body: str,
+    data: dict[str, str] | None = None,
+    notification: bool = True,
+    android_priority: str = "high",
+    sound: str | None = None,
+) -> Tuple[int, int, List[str]]:
+    """
+    Kirim ke maksimal 500 token sekaligus (send_each_for_multicast).
+    Return (jumlah sukses, jumlah gagal, token yang tidak valid lagi).
+
+    INVALID_ARGUMENT juga dipakai FCM untuk payload yang salah (data terlalu besar,
+    field tidak valid). Token dengan error itu hanya dianggap invalid kalau ada token
+    lain di batch yang sama sukses (berarti payload-nya benar).
+    """
+    init_firebase()
+
+    msg = messaging.MulticastMessage(
+        tokens=tokens,
+        notification=messaging.Notification(title=title, body=body) if notification else None,
+        data=data or {},
+        android=_android(android_priority, sound),
+    )
+    resp = messaging.send_each_for_multicast(msg)
+    errors = _INVALID_TOKEN_ERRORS + ((exceptions.InvalidArgumentError,) if resp.success_count else ())
+    invalid = [
+        tok
+        for tok, r in zip(tokens, resp.responses)
+        if not r.success and isinstance(r.exception, errors)
+    ]
+    return resp.success_count, resp.failure_count, invalid
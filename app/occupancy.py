@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import changes
+from .storage import read_json, write_json
+
+logger = logging.getLogger("sinabung.occupancy")
+
+# Hitungan pengungsi per posko disimpan di memori (update O(1) di bawah satu lock),
+# lalu di-flush ke data/occupancy.json paling sering sekali per FLUSH_SECONDS.
+DB_NAME = "occupancy"
+FLUSH_SECONDS = float(os.environ.get("OCCUPANCY_FLUSH_SECONDS", "2.0"))
+
+
+class OccupancyCounters:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # load pertama dari beberapa request bersamaan cukup sekali
+        self._counts: Dict[str, int] = {}
+        self._capacity: Dict[str, Optional[int]] = {}
+        self._names: Dict[str, str] = {}
+        # agregat dijaga inkremental, tidak pernah dihitung ulang dengan scan
+        self.total_occupied = 0
+        self.total_capacity = 0
+        self._dirty = False
+        self._loaded = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ setup
+    def load(self) -> None:
+        with self._load_lock:
+            self._load()
+
+    def _load(self) -> None:
+        from .posko_store import list_posko
+
+        saved = read_json(DB_NAME, default={})
+        with self._lock:
+            self._counts.clear()
+            self._capacity.clear()
+            self._names.clear()
+            self.total_occupied = self.total_capacity = 0
+            for p in list_posko():
+                self._add_posko(p.id, p.nama, p.kapasitas)
+                n = int(saved.get(p.id, 0)) if isinstance(saved, dict) else 0
+                self._counts[p.id] = max(0, n)
+                self.total_occupied += self._counts[p.id]
+            self._loaded = True
+
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name="occupancy-flusher", daemon=True)
+            self._thread.start()
+
+    def ensure_loaded(self) -> "OccupancyCounters":
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load()
+        return self
+
+    def _add_posko(self, posko_id: str, nama: str, kapasitas: Optional[int]) -> None:
+        old = self._capacity.get(posko_id)
+        self.total_capacity += (kapasitas or 0) - (old or 0)
+        self._capacity[posko_id] = kapasitas
+        self._names[posko_id] = nama
+        self._counts.setdefault(posko_id, 0)
+
+    def _drop_posko(self, posko_id: str) -> None:
+        self.total_capacity -= self._capacity.pop(posko_id, None) or 0
+        self.total_occupied -= self._counts.pop(posko_id, 0)
+        self._names.pop(posko_id, None)
+        self._dirty = True
+
+    # ---------------------------------------------------------------- update
+    def _apply(self, posko_id: str, delta: int) -> Dict[str, Any]:
+        if posko_id not in self._counts:
+            raise KeyError(posko_id)
+        old = self._counts[posko_id]
+        new = max(0, old + delta)  # checkout berlebih tidak membuat angka negatif
+        self._counts[posko_id] = new
+        self.total_occupied += new - old
+        self._dirty = True
+        return self._row(posko_id)
+
+    def apply(self, posko_id: str, delta: int) -> Dict[str, Any]:
+        self.ensure_loaded()
+        with self._lock:
+            return self._apply(posko_id, delta)
+
+    def apply_batch(self, updates: Iterable[Tuple[str, int]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Banyak update sekaligus di bawah satu lock. Return (hasil per posko, id yang tidak dikenal)."""
+        self.ensure_loaded()
+        touched: Dict[str, Dict[str, Any]] = {}
+        unknown: List[str] = []
+        with self._lock:
+            for posko_id, delta in updates:
+                try:
+                    touched[posko_id] = self._apply(posko_id, delta)
+                except KeyError:
+                    unknown.append(posko_id)
+        return list(touched.values()), unknown
+
+    # ------------------------------------------------------------------ read
+    def _row(self, posko_id: str) -> Dict[str, Any]:
+        cap = self._capacity.get(posko_id)
+        n = self._counts.get(posko_id, 0)
+        return {
+            "posko_id": posko_id,
+            "nama": self._names.get(posko_id),
+            "kapasitas": cap,
+            "terisi": n,
+            "sisa": max(0, cap - n) if cap is not None else None,
+            "penuh": cap is not None and n >= cap,
+        }
+
+    def get(self, posko_id: str) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        with self._lock:
+            return self._row(posko_id) if posko_id in self._counts else None
+
+    def totals(self) -> Dict[str, Any]:
+        self.ensure_loaded()
+        with self._lock:
+            return {
+                "posko": len(self._counts),
+                "terisi": self.total_occupied,
+                "kapasitas": self.total_capacity,
+                "sisa": max(0, self.total_capacity - self.total_occupied),
+            }
+
+    def all(self) -> List[Dict[str, Any]]:
+        self.ensure_loaded()
+        with self._lock:
+            return [self._row(pid) for pid in self._counts]
+
+    def remaining(self, posko_id: str) -> Optional[int]:
+        """Sisa kapasitas (None kalau kapasitas posko tidak diketahui)."""
+        row = self.get(posko_id)
+        return row["sisa"] if row else None
+
+    # ----------------------------------------------------------------- flush
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._counts)
+            self._dirty = False
+        write_json(DB_NAME, data)
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(FLUSH_SECONDS):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush occupancy counters.")
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    # --------------------------------------------------------------- changes
+    def on_change(self, collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]]) -> None:
+        if collection != "posko" or not self._loaded:
+            return
+        with self._lock:
+            if op == "delete" or item is None:
+                self._drop_posko(item_id)
+            else:
+                self._add_posko(item_id, item.get("nama"), item.get("kapasitas"))
+
+
+COUNTERS = OccupancyCounters()
+changes.subscribe(COUNTERS.on_change)
+# didaftarkan setelah storage -> atexit (LIFO) flush counter dulu, baru storage
+atexit.register(COUNTERS.shutdown)
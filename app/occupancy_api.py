@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+
+from .admin_auth import require_admin
+from .occupancy import COUNTERS
+
+router = APIRouter(tags=["occupancy"])
+
+
+class CheckReq(BaseModel):
+    jumlah: int = Field(1, ge=1, le=10_000, description="Jumlah orang")
+
+
+class OccupancyDelta(BaseModel):
+    posko_id: str
+    delta: int = Field(..., ge=-10_000, le=10_000, description="+ check-in, - check-out")
+
+
+class BatchReq(BaseModel):
+    updates: List[OccupancyDelta] = Field(..., max_length=5000)
+
+
+# ---------------------------------------------------------------- PUBLIC
+@router.get("/evacuation/occupancy")
+def public_occupancy() -> Dict[str, Any]:
+    return {"totals": COUNTERS.totals(), "items": COUNTERS.all()}
+
+
+@router.get("/evacuation/occupancy/{posko_id}")
+def public_occupancy_posko(posko_id: str) -> Dict[str, Any]:
+    row = COUNTERS.get(posko_id)
+    if row is None:
+        raise HTTPException(404, "posko not found")
+    return row
+
+
+# ---------------------------------------------------------------- RELAWAN
+@router.post("/admin/occupancy/{posko_id}/checkin")
+def admin_checkin(posko_id: str, body: CheckReq = CheckReq(), _=Depends(require_admin)):
+    try:
+        return COUNTERS.apply(posko_id, body.jumlah)
+    except KeyError:
+        raise HTTPException(404, "posko not found")
+
+
+@router.post("/admin/occupancy/{posko_id}/checkout")
+def admin_checkout(posko_id: str, body: CheckReq = CheckReq(), _=Depends(require_admin)):
+    try:
+        return COUNTERS.apply(posko_id, -body.jumlah)
+    except KeyError:
+        raise HTTPException(404, "posko not found")
+
+
+@router.post("/admin/occupancy/batch")
+def admin_occupancy_batch(body: BatchReq, _=Depends(require_admin)) -> Dict[str, Any]:
+    """Gabungan banyak check-in/out (mis. antrian offline dari HP relawan) dalam satu request."""
+    items, unknown = COUNTERS.apply_batch((u.posko_id, u.delta) for u in body.updates)
+    return {"ok": not unknown, "items": items, "unknown_posko": unknown, "totals": COUNTERS.totals()}
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import os
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional
+
+# -----------------------------------------------------------------------------
+# Interval polling per level (detik). Bisa dioverride lewat env:
+#   POLL_SECONDS_NORMAL / POLL_SECONDS_WASPADA / POLL_SECONDS_SIAGA / POLL_SECONDS_AWAS
+# Kalau level belum diketahui, pakai CHECK_INTERVAL_MINUTES (default lama).
+# -----------------------------------------------------------------------------
+LEVEL_INTERVALS: Dict[str, int] = {
+    "I": int(os.environ.get("POLL_SECONDS_NORMAL", "900")),
+    "II": int(os.environ.get("POLL_SECONDS_WASPADA", "300")),
+    "III": int(os.environ.get("POLL_SECONDS_SIAGA", "60")),
+    "IV": int(os.environ.get("POLL_SECONDS_AWAS", "15")),
+}
+MIN_INTERVAL_SECONDS = max(1, int(os.environ.get("POLL_MIN_SECONDS", "10")))
+CHANGE_WINDOW_SECONDS = int(os.environ.get("POLL_CHANGE_WINDOW_SECONDS", "3600"))
+
+_LEVEL_RE = re.compile(r"Level\s+([IV]+)", re.I)
+
+
+def _default_interval_seconds() -> int:
+    minutes = int(os.environ.get("CHECK_INTERVAL_MINUTES", "5"))
+    return max(1, minutes) * 60
+
+
+def level_code(level: Optional[str]) -> Optional[str]:
+    """'Level IV (Awas)' -> 'IV'."""
+    if not level:
+        return None
+    m = _LEVEL_RE.search(level)
+    return m.group(1).upper() if m else None
+
+
+def _now_iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+# -----------------------------------------------------------------------------
+# Circuit breaker per sumber upstream (MAGMA, BMKG)
+# -----------------------------------------------------------------------------
+@dataclass
+class CircuitBreaker:
+    """
+    Breaker sederhana: setelah `threshold` kegagalan berturut-turut, sumber
+    dianggap down dan tidak dihubungi sampai `open_until`. Jeda naik
+    eksponensial (base * 2^n, maks `max_backoff`) dengan jitter supaya
+    banyak instance tidak retry serentak.
+    """
+
+    name: str
+    threshold: int = 2
+    base_backoff: float = 30.0
+    max_backoff: float = 1800.0
+    failures: int = 0
+    open_until: Optional[float] = None
+    last_error: Optional[str] = None
+    last_success: Optional[float] = None
+    last_failure: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until is not None and time.time() < self.open_until
+
+    def allow(self) -> bool:
+        # setelah open_until lewat, satu percobaan (half-open) diizinkan
+        return not self.is_open
+
+    def retry_after(self) -> float:
+        if not self.is_open:
+            return 0.0
+        return max(0.0, self.open_until - time.time())
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.open_until = None
+        self.last_error = None
+        self.last_success = time.time()
+
+    def record_failure(self, error: BaseException | str) -> None:
+        now = time.time()
+        self.failures += 1
+        self.last_failure = now
+        self.last_error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+        if self.failures < self.threshold:
+            return
+        exp = self.failures - self.threshold
+        backoff = min(self.max_backoff, self.base_backoff * (2 ** exp))
+        # full jitter di paruh atas: [backoff/2, backoff]
+        backoff = backoff / 2 + random.uniform(0, backoff / 2)
+        self.open_until = now + backoff
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": "open" if self.is_open else ("half_open" if self.open_until else "closed"),
+            "failures": self.failures,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            "open_until_utc": _now_iso(self.open_until),
+            "last_error": self.last_error,
+            "last_success_utc": _now_iso(self.last_success),
+            "last_failure_utc": _now_iso(self.last_failure),
+        }
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    "magma": CircuitBreaker("magma"),
+    "bmkg": CircuitBreaker("bmkg"),
+}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    if name not in BREAKERS:
+        BREAKERS[name] = CircuitBreaker(name)
+    return BREAKERS[name]
+
+
+# -----------------------------------------------------------------------------
+# Adaptive cadence
+# -----------------------------------------------------------------------------
+@dataclass
+class PollState:
+    level: Optional[str] = None
+    interval_seconds: int = field(default_factory=_default_interval_seconds)
+    last_run: Optional[float] = None
+    next_run: Optional[float] = None
+    changes: Deque[float] = field(default_factory=lambda: deque(maxlen=32))
+
+
+POLL = PollState()
+
+
+def record_change(ts: Optional[float] = None) -> None:
+    POLL.changes.append(ts if ts is not None else time.time())
+
+
+def recent_changes(now: Optional[float] = None) -> int:
+    now = now if now is not None else time.time()
+    return sum(1 for t in POLL.changes if now - t <= CHANGE_WINDOW_SECONDS)
+
+
+def compute_interval(level: Optional[str], now: Optional[float] = None) -> int:
+    """
+    Interval polling berikutnya (detik):
+    - dasar dari level (Awas = detik, Normal = menit)
+    - setiap perubahan dalam CHANGE_WINDOW_SECONDS terakhir memangkas interval setengahnya
+    - kalau breaker MAGMA terbuka, tunggu sampai breaker boleh dicoba lagi
+    """
+    code = level_code(level)
+    base = LEVEL_INTERVALS.get(code or "", _default_interval_seconds())
+
+    n = recent_changes(now)
+    if n:
+        base = base // (2 ** min(n, 4))
+    interval = max(MIN_INTERVAL_SECONDS, int(base))
+
+    retry = BREAKERS["magma"].retry_after()
+    if retry > interval:
+        interval = int(retry) + 1
+    return interval
+
+
+def plan_next(level: Optional[str], ran: bool = True) -> int:
+    now = time.time()
+    POLL.level = level
+    if ran:
+        POLL.last_run = now
+    POLL.interval_seconds = compute_interval(level, now)
+    POLL.next_run = now + POLL.interval_seconds
+    return POLL.interval_seconds
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        "level": POLL.level,
+        "level_code": level_code(POLL.level),
+        "interval_seconds": POLL.interval_seconds,
+        "last_run_utc": _now_iso(POLL.last_run),
+        "next_run_utc": _now_iso(POLL.next_run),
+        "recent_changes": recent_changes(),
+        "change_window_seconds": CHANGE_WINDOW_SECONDS,
+        "breakers": {name: b.snapshot() for name, b in BREAKERS.items()},
+    }
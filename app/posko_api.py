@@ -1,10 +1,11 @@
 # app/posko_api.py
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import Optional, List
 
-from .posko_store import list_posko, create_posko, delete_posko
+from . import precompressed
+from .posko_store import list_posko, create_posko, delete_posko, data_version
 from .admin_auth import require_admin  # sesuaikan nama dependencymu
 
 router = APIRouter(tags=["posko"])
@@ -19,8 +20,11 @@ class PoskoCreate(BaseModel):
     keterangan: Optional[str] = None
 
 @router.get("/evacuation/posts")
-def public_list_posko():
-    return [p.__dict__ for p in list_posko()]
+def public_list_posko(request: Request):
+    v = precompressed.get_or_build(
+        "evacuation/posts", data_version(), lambda: [p.__dict__ for p in list_posko()]
+    )
+    return precompressed.respond(request, v)
 
 @router.get("/admin/posts")
 def admin_list_posko(_=Depends(require_admin)):
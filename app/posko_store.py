@@ -7,11 +7,15 @@ import json
 import uuid
 from typing import List, Optional, Dict, Any
 
+from . import changes
+
 DATA_DIR = Path(__file__).resolve().parent / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 POSKO_FILE = DATA_DIR / "posko.json"
 
+_writes = 0  # naik tiap _save_all, jaga-jaga kalau mtime tidak berubah (resolusi fs)
+
 def _now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
@@ -34,7 +38,17 @@ def _load_all() -> List[Dict[str, Any]]:
     return json.loads(POSKO_FILE.read_text(encoding="utf-8"))
 
 def _save_all(items: List[Dict[str, Any]]) -> None:
+    global _writes
     POSKO_FILE.write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    _writes += 1
+
+def data_version() -> tuple:
+    """Berubah setiap posko.json ditulis; dipakai sebagai kunci cache response."""
+    try:
+        st = POSKO_FILE.stat()
+    except FileNotFoundError:
+        return (_writes, 0, 0)
+    return (_writes, st.st_mtime_ns, st.st_size)
 
 def list_posko() -> List[Posko]:
     return [Posko(**x) for x in _load_all()]
@@ -58,6 +72,7 @@ def create_posko(nama: str, alamat: str, lat: float, lng: float,
     )
     items.append(asdict(p))
     _save_all(items)
+    changes.publish("posko", "upsert", p.id, asdict(p))
     return p
 
 def delete_posko(posko_id: str) -> bool:
@@ -65,4 +80,6 @@ def delete_posko(posko_id: str) -> bool:
     before = len(items)
     items = [x for x in items if x.get("id") != posko_id]
     _save_all(items)
+    if len(items) != before:
+        changes.publish("posko", "delete", posko_id)
     return len(items) != before
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except Exception:  # brotli opsional; tanpa brotli hanya gzip
+    brotli = None
+
+# Body di bawah ukuran ini tidak dikompres (header + overhead lebih besar dari hematnya)
+MIN_COMPRESS_BYTES = 512
+# Level untuk varian yang dibangun di jalur request (mis. dashboard berubah tiap ~30 detik):
+# gzip-6/brotli-5 jauh lebih murah dan ukurannya hanya sedikit lebih besar.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Level maksimum hanya untuk file statis (dibangun sekali per perubahan data, di luar request)
+GZIP_LEVEL_MAX = 9
+BROTLI_QUALITY_MAX = 11
+
+
+@dataclass
+class Variants:
+    """Body JSON + varian terkompresinya, dibangun sekali per versi data."""
+
+    version: Hashable
+    etag: str
+    identity: bytes
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+
+_cache: Dict[str, Variants] = {}
+_lock = threading.Lock()
+
+
+def encode_json(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def build(
+    version: Hashable, body: bytes, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY
+) -> Variants:
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    v = Variants(version=version, etag=etag, identity=body)
+    if len(body) >= MIN_COMPRESS_BYTES:
+        v.gzip = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+        if brotli is not None:
+            v.br = brotli.compress(body, quality=brotli_quality)
+    return v
+
+
+def get_or_build(key: str, version: Hashable, producer: Callable[[], Any]) -> Variants:
+    """
+    Varian untuk `key` pada `version`. `producer` (load + serialisasi) hanya
+    dipanggil kalau versi berubah; request berikutnya tidak mengompres ulang.
+    """
+    v = _cache.get(key)
+    if v is not None and v.version == version:
+        return v
+    with _lock:
+        v = _cache.get(key)
+        if v is None or v.version != version:
+            v = build(version, encode_json(producer()))
+            _cache[key] = v
+    return v
+
+
+def for_body(key: str, body: bytes) -> Variants:
+    """
+    Untuk payload tanpa nomor versi (mis. dashboard): versinya = hash body.
+    Kompresi bisa makan waktu; dari endpoint async panggil lewat run_in_threadpool.
+    """
+    digest = hashlib.blake2b(body, digest_size=16).digest()
+    v = _cache.get(key)
+    if v is not None and v.version == digest:
+        return v
+    v = build(digest, body)
+    with _lock:
+        _cache[key] = v
+    return v
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[token] = q
+    return out
+
+
+def choose_encoding(accept_encoding: str, v: Variants) -> Optional[str]:
+    acc = _accepted(accept_encoding or "")
+    wildcard = acc.get("*", 0.0)
+    for enc in ("br", "gzip"):
+        if getattr(v, enc) is not None and acc.get(enc, wildcard) > 0:
+            return enc
+    return None
+
+
+def respond(request: Request, v: Variants, headers: Optional[Dict[str, str]] = None) -> Response:
+    base = {"ETag": v.etag, "Vary": "Accept-Encoding", **(headers or {})}
+    if request.headers.get("if-none-match") == v.etag:
+        return Response(status_code=304, headers=base)
+
+    enc = choose_encoding(request.headers.get("accept-encoding", ""), v)
+    if enc is None:
+        return Response(v.identity, media_type="application/json", headers=base)
+    return Response(
+        getattr(v, enc),
+        media_type="application/json",
+        headers={**base, "Content-Encoding": enc},
+    )
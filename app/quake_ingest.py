@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from . import bmkg, devices, geo, history_store, polling, snapshot
+
+logger = logging.getLogger("sinabung.quake")
+
+try:
+    from .notifier import send_to_topic
+except Exception:
+    send_to_topic = None
+
+POLL_SECONDS = max(10, int(os.environ.get("QUAKE_POLL_SECONDS", "60")))
+ALERT_MIN_MAGNITUDE = float(os.environ.get("QUAKE_ALERT_MIN_MAG", "4.0"))
+ALERT_RADIUS_KM = float(os.environ.get("QUAKE_ALERT_RADIUS_KM", "100"))
+# gempa lebih tua dari ini tidak memicu alert (mis. saat start pertama kali)
+ALERT_MAX_AGE_MINUTES = float(os.environ.get("QUAKE_ALERT_MAX_AGE_MINUTES", "30"))
+ALERT_TOPIC = os.environ.get("FCM_TOPIC", "sinabung").strip() or "sinabung"
+
+FEEDS = {
+    "latest": bmkg.BMKG_AUTOGEMPA_URL,
+    "recent": bmkg.BMKG_GEMPATERKINI_URL,
+    "felt": bmkg.BMKG_GEMPADIRASAKAN_URL,
+}
+
+MAX_SEEN = 2000
+MAX_NEARBY = 50
+
+
+def _to_float(v: Any) -> Optional[float]:
+    try:
+        return float(str(v).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def _age_minutes(date_time: Optional[str]) -> Optional[float]:
+    try:
+        ts = history_store.parse_time(date_time)
+    except ValueError:
+        return None
+    if ts is None:
+        return None
+    return (time.time() - ts) / 60
+
+
+class QuakeIngester:
+    """
+    Polling feed BMKG (autogempa, gempaterkini, gempadirasakan), diff terhadap
+    DateTime yang sudah pernah dilihat, hitung jarak ke kawah Sinabung per batch,
+    dan simpan hasilnya untuk dibaca dashboard (tanpa panggil BMKG inline).
+    """
+
+    def __init__(self) -> None:
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        self.latest: Optional[Dict[str, Any]] = None
+        self.nearby: Deque[Dict[str, Any]] = deque(maxlen=MAX_NEARBY)
+        self.alerts: Deque[Dict[str, Any]] = deque(maxlen=MAX_NEARBY)
+        self.last_run: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------ diff
+    def _diff(self, quakes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        new = []
+        for q in quakes:
+            key = q.get("date_time")
+            if not key or key in self.seen:
+                continue
+            self.seen[key] = None
+            new.append(q)
+        while len(self.seen) > MAX_SEEN:
+            self.seen.popitem(last=False)
+        return new
+
+    @staticmethod
+    def _annotate(quakes: List[Dict[str, Any]]) -> None:
+        """Tambah distance_km ke semua gempa yang punya koordinat, sekali hitung per batch."""
+        located = [q for q in quakes if q.get("lat") is not None and q.get("lng") is not None]
+        if not located:
+            return
+        dists = geo.haversine_km_batch([q["lat"] for q in located], [q["lng"] for q in located])
+        for q, d in zip(located, dists):
+            q["distance_km"] = round(float(d), 1)
+
+    # --------------------------------------------------------------- alerting
+    def _should_alert(self, q: Dict[str, Any]) -> bool:
+        mag = _to_float(q.get("magnitude"))
+        dist = q.get("distance_km")
+        if mag is None or dist is None:
+            return False
+        if mag < ALERT_MIN_MAGNITUDE or dist > ALERT_RADIUS_KM:
+            return False
+        # DateTime yang tidak bisa dibaca: umur tidak diketahui -> jangan alert
+        age = _age_minutes(q.get("date_time"))
+        return age is not None and age <= ALERT_MAX_AGE_MINUTES
+
+    def _alert(self, q: Dict[str, Any]) -> None:
+        body = f"M{q.get('magnitude')} {q.get('distance_km')} km dari Sinabung - {q.get('wilayah') or ''}".strip()
+        record = {**q, "alerted_at": datetime.now(timezone.utc).isoformat()}
+        self.alerts.appendleft(record)
+        logger.warning("Quake alert: %s", body)
+
+        if send_to_topic is None:
+            return
+        title = "Gempa di sekitar Sinabung"
+        data = {
+            "type": "QUAKE",
+            "date_time": str(q.get("date_time") or ""),
+            "magnitude": str(q.get("magnitude") or ""),
+            "distance_km": str(q.get("distance_km")),
+        }
+        try:
+            # geofence di sekitar episenter; topic tetap dikirim selama masa migrasi
+            targeted = None
+            if q.get("lat") is not None and q.get("lng") is not None:
+                targeted = devices.geofence_send(q["lat"], q["lng"], devices.QUAKE_GEOFENCE_KM, title, body[:180], data)
+            if devices.send_topic_too(targeted):
+                send_to_topic(topic=ALERT_TOPIC, title=title, body=body[:180], data=data)
+        except Exception:
+            logger.exception("Failed to send quake alert.")
+
+    # ---------------------------------------------------------------- polling
+    async def ingest_once(self) -> int:
+        breaker = polling.breaker("bmkg")
+        if not breaker.allow():
+            return 0
+
+        results = await asyncio.gather(
+            *(
+                bmkg.fetch_latest_quake(url) if name == "latest" else bmkg.fetch_quake_list(url)
+                for name, url in FEEDS.items()
+            ),
+            return_exceptions=True,
+        )
+
+        batch: List[Dict[str, Any]] = []
+        errors = []
+        for name, res in zip(FEEDS, results):
+            if isinstance(res, Exception):
+                errors.append(f"{name}: {type(res).__name__}: {res}")
+                continue
+            if name == "latest":
+                batch.insert(0, res)
+            else:
+                batch.extend(res)
+
+        if errors and not batch:
+            self.last_error = "; ".join(errors)
+            breaker.record_failure(self.last_error)
+            return 0
+        breaker.record_success()
+        self.last_error = "; ".join(errors) or None
+        self.last_run = datetime.now(timezone.utc).isoformat()
+
+        new = self._diff(batch)
+        self._annotate(new)
+
+        latest = results[0]
+        if not isinstance(latest, Exception):
+            if "distance_km" not in latest:
+                self._annotate([latest])
+            self.latest = latest
+
+        # `seen` hanya di memori; yang menentukan "baru" untuk alert adalah baris baru di
+        # history DB, supaya restart/crash-loop tidak mengirim ulang gempa 30 menit terakhir.
+        persisted: Optional[Set[str]] = None
+        if new:
+            try:
+                persisted = set(history_store.insert_quakes(new))
+            except Exception:
+                # DB tidak bisa ditulis: lebih baik alert dobel daripada gempa terlewat
+                logger.exception("Failed to record quake history.")
+
+        nearby = sorted(
+            (q for q in new if q.get("distance_km") is not None and q["distance_km"] <= ALERT_RADIUS_KM),
+            key=lambda q: q.get("date_time") or "",
+        )
+        for q in nearby:
+            self.nearby.appendleft(q)
+            if (persisted is None or q.get("date_time") in persisted) and self._should_alert(q):
+                self._alert(q)
+
+        if new and self.latest is not None:
+            snapshot.save("earthquake", self.payload())
+        return len(new)
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                n = await self.ingest_once()
+                if n:
+                    logger.info("BMKG ingest: %s new quakes.", n)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("BMKG ingest failed.")
+            delay = max(POLL_SECONDS, polling.breaker("bmkg").retry_after())
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------------------------------------------------------------------ read
+    def payload(self) -> Dict[str, Any]:
+        if self.latest is None:
+            return {"source": "BMKG", "error": self.last_error or "Data gempa belum tersedia"}
+        return {
+            **self.latest,
+            "nearby": list(self.nearby),
+            "alerts": list(self.alerts)[:5],
+            "alert_radius_km": ALERT_RADIUS_KM,
+            "alert_min_magnitude": ALERT_MIN_MAGNITUDE,
+            "ingested_at": self.last_run,
+            "ingest_error": self.last_error,
+        }
+
+
+INGESTER = QuakeIngester()
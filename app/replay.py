@@ -0,0 +1,492 @@
+"""
+Replay skenario rekaman lewat pipeline alert yang asli (fetch -> parse -> diff -> notify)
+dengan waktu dipercepat.
+
+    python -m app.replay bench/scenarios/erupsi_eskalasi.json [--speed 600] [--json hasil.json]
+
+- Halaman MAGMA dan JSON BMKG disajikan dari skenario lewat httpx.MockTransport
+  (client bersama di http_client diganti), sesuai waktu virtual saat request.
+- check_update, QuakeIngester.ingest_once dan emergency_trigger dipanggil apa adanya;
+  jadwalnya mengikuti interval adaptif polling (level, perubahan, breaker).
+- send_to_topic (FCM) diganti perekam; state.json, data/ dan database riwayat/sync
+  diarahkan ke direktori sementara, jadi data asli tidak tersentuh.
+- Di akhir dicetak: latensi deteksi->push (detik virtual + ms wall pemrosesan),
+  alert yang terlewat / dobel / tak terduga, dan throughput.
+
+Format skenario (t = detik virtual sejak mulai; t <= 0 = kondisi awal, tidak diharapkan alert):
+
+    {
+      "name": "...",
+      "duration": 7200,
+      "events": [
+        {"t": 0, "kind": "magma", "report_id": "1001", "level": "Level II (Waspada)",
+         "rekomendasi": ["..."]},
+        {"t": 300, "kind": "quake", "magnitude": "4.8", "lat": 3.21, "lng": 98.41},
+        {"t": 900, "kind": "outage", "source": "magma", "duration": 240},
+        {"t": 1500, "kind": "emergency", "level": "AWAS", "message": "Segera evakuasi!"},
+        {"t": 2000, "kind": "emergency_clear"}
+      ]
+    }
+
+Event magma boleh membawa rekaman asli: "report_html" / "tingkat_html" (path relatif
+terhadap file skenario). Setiap event boleh memaksa ekspektasi dengan "alert": true/false.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_TINGKAT_URL = "https://magma.esdm.go.id/v1/gunung-api/tingkat-aktivitas"
+
+_REPORT_RE = re.compile(r"/laporan/(\d+)")
+
+AlertKey = Tuple[str, str]
+
+
+class VirtualClock:
+    """Pengganti modul `time` di modul pipeline: time() = waktu virtual, sisanya diteruskan."""
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return self.start + self.offset
+
+    def iso(self, offset: Optional[float] = None) -> str:
+        ts = self.start + (self.offset if offset is None else offset)
+        return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(time, name)
+
+
+def _percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    s = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(s[min(len(s) - 1, max(0, int(round(q * len(s) + 0.5)) - 1))], 3)
+
+    return {"count": len(s), "p50": pick(0.5), "p95": pick(0.95), "max": round(s[-1], 3)}
+
+
+# -----------------------------------------------------------------------------
+# Upstream rekaman (MAGMA + BMKG)
+# -----------------------------------------------------------------------------
+class Upstream:
+    """Isi MAGMA/BMKG pada waktu virtual tertentu; dilayani oleh MockTransport."""
+
+    def __init__(self, clock: VirtualClock, tingkat_url: str, base_dir: Path) -> None:
+        self.clock = clock
+        self.tingkat_url = tingkat_url
+        self.base_dir = base_dir
+        self.report: Optional[Dict[str, Any]] = None  # laporan Sinabung terbaru yang tampil
+        self.reports: Dict[str, Dict[str, Any]] = {}
+        self.quakes: List[Dict[str, Any]] = []  # gempa BMKG, terbaru dulu
+        self.outages: Dict[str, float] = {}  # sumber -> down sampai offset virtual
+        self.requests: Counter = Counter()
+
+    # ------------------------------------------------------------- publish
+    def _read(self, path: Optional[str]) -> Optional[str]:
+        if not path:
+            return None
+        return (self.base_dir / path).read_text(encoding="utf-8")
+
+    def publish_report(self, ev: Dict[str, Any]) -> None:
+        rid = str(ev["report_id"])
+        level = ev.get("level")
+        title = ev.get("title") or f"Laporan Aktivitas Gunung Sinabung periode {self.clock.iso()} (replay)"
+        rekom = ev.get("rekomendasi") or []
+        html = self._read(ev.get("report_html")) or (
+            "<html><body>"
+            f"<h1>{title}</h1>"
+            f"<p>Tingkat Aktivitas: {level or '-'}</p>"
+            "<h2>Rekomendasi</h2>"
+            + "".join(f"<p>{line}</p>" for line in rekom)
+            + "<footer>Copyright PVMBG</footer></body></html>"
+        )
+        self.report = {"report_id": rid, "level": level, "html": html, "tingkat_html": self._read(ev.get("tingkat_html"))}
+        self.reports[rid] = self.report
+
+    def publish_quake(self, ev: Dict[str, Any], offset: float) -> Dict[str, Any]:
+        lat, lng = float(ev["lat"]), float(ev["lng"])
+        dt = self.clock.iso(offset)
+        g = {
+            "Tanggal": dt[:10],
+            "Jam": dt[11:19] + " UTC",
+            "DateTime": dt,
+            "Coordinates": f"{lat},{lng}",
+            "Lintang": f"{abs(lat)} {'LS' if lat < 0 else 'LU'}",
+            "Bujur": f"{abs(lng)} {'BB' if lng < 0 else 'BT'}",
+            "Magnitude": str(ev.get("magnitude", "3.0")),
+            "Kedalaman": str(ev.get("kedalaman", "10 km")),
+            "Wilayah": ev.get("wilayah") or "Replay",
+            "Potensi": ev.get("potensi") or "Tidak berpotensi tsunami",
+            "Dirasakan": ev.get("dirasakan") or "",
+            "_felt": bool(ev.get("felt", True)),
+        }
+        self.quakes.insert(0, g)
+        return g
+
+    # -------------------------------------------------------------- serving
+    def _down(self, source: str) -> bool:
+        return self.clock.offset < self.outages.get(source, float("-inf"))
+
+    def handle(self, request: Any) -> Any:
+        import httpx
+
+        url = str(request.url)
+        host = request.url.host
+        source = "bmkg" if "bmkg" in host else "magma"
+        self.requests[source] += 1
+        if self._down(source):
+            return httpx.Response(503, text="replay outage")
+
+        if source == "bmkg":
+            return self._bmkg(url)
+
+        if url.rstrip("/") == self.tingkat_url.rstrip("/"):
+            if self.report is None:
+                return httpx.Response(200, html="<html><body><p>Belum ada laporan</p></body></html>")
+            html = self.report["tingkat_html"] or (
+                "<html><body><ul><li><span>Sinabung</span> "
+                f'<a href="/v1/gunung-api/laporan/{self.report["report_id"]}">Laporan terbaru</a>'
+                "</li></ul></body></html>"
+            )
+            return httpx.Response(200, html=html)
+
+        m = _REPORT_RE.search(url)
+        if m and m.group(1) in self.reports:
+            return httpx.Response(200, html=self.reports[m.group(1)]["html"])
+        return httpx.Response(404, text="not found")
+
+    def _bmkg(self, url: str) -> Any:
+        import httpx
+
+        public = [{k: v for k, v in g.items() if not k.startswith("_")} for g in self.quakes]
+        if url.endswith("autogempa.json"):
+            if not public:
+                return httpx.Response(404, text="not found")
+            return httpx.Response(200, json={"Infogempa": {"gempa": public[0]}})
+        if url.endswith("gempaterkini.json"):
+            # feed asli: 15 gempa M5+ terbaru
+            items = [p for p, g in zip(public, self.quakes) if float(g["Magnitude"]) >= 5.0][:15]
+        else:
+            items = [p for p, g in zip(public, self.quakes) if g["_felt"]][:15]
+        return httpx.Response(200, json={"Infogempa": {"gempa": items}})
+
+
+# -----------------------------------------------------------------------------
+# Perekam FCM
+# -----------------------------------------------------------------------------
+class PushRecorder:
+    def __init__(self, clock: VirtualClock) -> None:
+        self.clock = clock
+        self.pushes: List[Dict[str, Any]] = []
+        self.tick_started: float = time.perf_counter()
+        self.current_admin_event: Optional[str] = None
+
+    def key(self, data: Dict[str, str]) -> Optional[AlertKey]:
+        kind = data.get("type")
+        if kind == "QUAKE":
+            return ("quake", data.get("date_time") or "")
+        if kind == "EMERGENCY_ALARM":
+            return ("emergency", self.current_admin_event or "")
+        if kind == "EMERGENCY_STOP":
+            return ("emergency_clear", self.current_admin_event or "")
+        if data.get("report_id"):
+            return ("magma", data["report_id"])
+        return None
+
+    def send_to_topic(self, topic: str, title: str, body: str, data: Optional[Dict[str, str]] = None, **_: Any) -> str:
+        data = data or {}
+        self.pushes.append(
+            {
+                "key": self.key(data),
+                "topic": topic,
+                "title": title,
+                "offset": self.clock.offset,
+                "processing_ms": (time.perf_counter() - self.tick_started) * 1000,
+            }
+        )
+        return f"replay-{len(self.pushes)}"
+
+
+# -----------------------------------------------------------------------------
+# Runner
+# -----------------------------------------------------------------------------
+class Replay:
+    def __init__(self, scenario: Dict[str, Any], base_dir: Path, speed: float, workdir: Path) -> None:
+        self.scenario = scenario
+        self.speed = speed
+        self.workdir = workdir
+        self.tingkat_url = scenario.get("tingkat_url") or DEFAULT_TINGKAT_URL
+        self.events = sorted(scenario.get("events") or [], key=lambda e: float(e.get("t", 0)))
+        last_t = float(self.events[-1]["t"]) if self.events else 0.0
+        self.duration = float(scenario.get("duration") or last_t + 1800)
+
+        start = scenario.get("start")
+        self.clock = VirtualClock(
+            datetime.fromisoformat(start.replace("Z", "+00:00")).timestamp() if start else float(int(time.time()))
+        )
+        self.upstream = Upstream(self.clock, self.tingkat_url, base_dir)
+        self.recorder = PushRecorder(self.clock)
+        self.expected: Dict[AlertKey, float] = {}  # key -> offset saat muncul di upstream
+        self.outcomes: Counter = Counter()
+        self.stage_ms: Dict[str, List[float]] = defaultdict(list)
+
+    # ------------------------------------------------------------ wiring
+    def _setup(self) -> None:
+        # path data harus diset sebelum modul app diimport (dibaca saat import)
+        os.environ["HISTORY_DB"] = str(self.workdir / "history.db")
+        os.environ["SYNC_DB"] = str(self.workdir / "sync.db")
+        os.environ["DEVICES_DB"] = str(self.workdir / "devices.db")
+        os.environ["STATIC_EXPORT"] = "0"
+        os.environ["ADMISSION_ENABLED"] = "0"
+        os.environ["MAGMA_TINGKAT_URL"] = self.tingkat_url
+
+        import httpx
+
+        from . import emergency_api, http_client, magma, main, polling, quake_ingest, snapshot, state, storage
+
+        storage.DATA_DIR = self.workdir
+        state.STATE_FILE = self.workdir / "state.json"
+        for mod in (polling, quake_ingest, snapshot):
+            mod.time = self.clock
+
+        # fetch/parse MAGMA asli; scheduler dijalankan oleh replay, bukan apscheduler
+        main.get_latest_sinabung_report_url = magma.get_latest_sinabung_report_url
+        main.fetch_report_detail = magma.fetch_report_detail
+        main.load_state, main.save_state = state.load_state, state.save_state
+        main.scheduler = None
+        main.FEATURES_ERROR = None
+        for mod in (main, quake_ingest, emergency_api):
+            mod.send_to_topic = self.recorder.send_to_topic
+
+        http_client.set_client(
+            httpx.AsyncClient(transport=httpx.MockTransport(self.upstream.handle), follow_redirects=True)
+        )
+        self.main, self.polling, self.quake_ingest = main, polling, quake_ingest
+        self.emergency_api, self.http_client, self.storage, self.state = (
+            emergency_api,
+            http_client,
+            storage,
+            state,
+        )
+
+    # ------------------------------------------------------------- events
+    def _expect(self, ev: Dict[str, Any], key: AlertKey, default: bool, offset: float) -> None:
+        if ev.get("alert", default) and offset > 0:
+            self.expected.setdefault(key, offset)
+
+    def _apply(self, ev: Dict[str, Any], idx: int) -> None:
+        t = float(ev.get("t", 0))
+        kind = ev.get("kind")
+        if kind == "magma":
+            prev = self.upstream.report
+            self.upstream.publish_report(ev)
+            changed = prev is None or prev["report_id"] != str(ev["report_id"]) or prev["level"] != ev.get("level")
+            self._expect(ev, ("magma", str(ev["report_id"])), changed, t)
+            if t <= 0:
+                # kondisi awal = sudah pernah dinotifikasi sebelum replay
+                self.state.save_state(self.state.State(str(ev["report_id"]), ev.get("level")))
+        elif kind == "quake":
+            from .geo import SINABUNG_LAT, SINABUNG_LNG, haversine_km
+
+            g = self.upstream.publish_quake(ev, t)
+            dist = haversine_km(SINABUNG_LAT, SINABUNG_LNG, float(ev["lat"]), float(ev["lng"]))
+            alert = (
+                float(g["Magnitude"]) >= self.quake_ingest.ALERT_MIN_MAGNITUDE
+                and dist <= self.quake_ingest.ALERT_RADIUS_KM
+            )
+            self._expect(ev, ("quake", g["DateTime"]), alert, t)
+        elif kind == "outage":
+            self.upstream.outages[ev.get("source", "magma")] = t + float(ev.get("duration", 300))
+        elif kind in ("emergency", "emergency_clear"):
+            name = ev.get("id") or f"{kind}#{idx}"
+            default = kind == "emergency" or self.emergency_api.NOTIFY_CLEAR
+            self._expect(ev, (kind, name), default, max(t, 1e-9))
+            self.recorder.current_admin_event = name
+            self.recorder.tick_started = time.perf_counter()
+            t0 = time.perf_counter()
+            if kind == "emergency":
+                self.emergency_api.emergency_trigger(
+                    self.emergency_api.EmergencyTriggerReq(level=ev.get("level"), message=ev.get("message"))
+                )
+            else:
+                self.emergency_api.emergency_clear(self.emergency_api.EmergencyClearReq(message=ev.get("message")))
+            self.stage_ms["emergency"].append((time.perf_counter() - t0) * 1000)
+            self.recorder.current_admin_event = None
+        else:
+            raise ValueError(f"Event tidak dikenal: {kind!r} (index {idx})")
+
+    # --------------------------------------------------------------- loop
+    async def _check(self) -> float:
+        from . import tracing
+
+        self.recorder.tick_started = t0 = time.perf_counter()
+        await self.main.check_update()
+        self.stage_ms["check_update"].append((time.perf_counter() - t0) * 1000)
+        root = tracing.TRACES[-1][0] if tracing.TRACES else None
+        if root is not None:
+            self.outcomes[root.attributes.get("outcome", "error")] += 1
+        return float(self.polling.POLL.interval_seconds)
+
+    async def _ingest(self) -> float:
+        self.recorder.tick_started = t0 = time.perf_counter()
+        try:
+            await self.quake_ingest.INGESTER.ingest_once()
+        except Exception as e:
+            self.outcomes[f"ingest_error:{type(e).__name__}"] += 1
+        self.stage_ms["ingest_once"].append((time.perf_counter() - t0) * 1000)
+        return max(self.quake_ingest.POLL_SECONDS, self.polling.breaker("bmkg").retry_after())
+
+    async def run(self) -> Dict[str, Any]:
+        self._setup()
+        # kondisi awal (t <= 0) diterapkan sebelum poll pertama
+        pending = list(enumerate(self.events))
+        while pending and float(pending[0][1].get("t", 0)) <= 0:
+            self._apply(pending[0][1], pending[0][0])
+            pending.pop(0)
+        if not self.upstream.quakes:
+            # BMKG selalu punya gempa terakhir; pakai gempa jauh supaya feed tidak kosong
+            self.upstream.publish_quake({"magnitude": "3.1", "lat": -2.5, "lng": 140.7, "wilayah": "Papua"}, -3600)
+
+        next_check = next_ingest = 0.0
+        wall0 = time.perf_counter()
+        busy = 0.0
+        while True:
+            t_next = min(next_check, next_ingest, float(pending[0][1].get("t", 0)) if pending else float("inf"))
+            if t_next > self.duration:
+                break
+            if self.speed > 0 and t_next > self.clock.offset:
+                await asyncio.sleep((t_next - self.clock.offset) / self.speed)
+            self.clock.offset = t_next
+
+            b0 = time.perf_counter()
+            while pending and float(pending[0][1].get("t", 0)) <= t_next:
+                idx, ev = pending.pop(0)
+                self._apply(ev, idx)
+            if next_check <= t_next:
+                next_check = t_next + await self._check()
+            if next_ingest <= t_next:
+                next_ingest = t_next + await self._ingest()
+            busy += time.perf_counter() - b0
+
+        wall = time.perf_counter() - wall0
+        await self.http_client.aclose()
+        self.storage.shutdown()
+        return self._report(wall, busy)
+
+    # ------------------------------------------------------------- report
+    def _report(self, wall: float, busy: float) -> Dict[str, Any]:
+        pushed: Dict[AlertKey, List[Dict[str, Any]]] = defaultdict(list)
+        for p in self.recorder.pushes:
+            pushed[p["key"]].append(p)
+
+        latency: Dict[str, List[float]] = defaultdict(list)
+        processing: Dict[str, List[float]] = defaultdict(list)
+        for key, appeared in self.expected.items():
+            if pushed.get(key):
+                first = pushed[key][0]
+                latency[key[0]].append(first["offset"] - appeared)
+                processing[key[0]].append(first["processing_ms"])
+
+        fmt = lambda k: f"{k[0]}:{k[1]}" if k else "unknown"  # noqa: E731
+        checks = len(self.stage_ms["check_update"])
+        ingests = len(self.stage_ms["ingest_once"])
+        return {
+            "scenario": self.scenario.get("name"),
+            "speed": self.speed,
+            "virtual_seconds": self.duration,
+            "wall_seconds": round(wall, 3),
+            "alerts": {
+                "expected": len(self.expected),
+                "pushed": len(self.recorder.pushes),
+                "missed": [fmt(k) for k in self.expected if not pushed.get(k)],
+                "duplicates": {fmt(k): len(v) for k, v in pushed.items() if len(v) > 1},
+                "unexpected": [fmt(k) for k in pushed if k not in self.expected],
+            },
+            "detection_to_push_seconds": {k: _percentiles(v) for k, v in latency.items()},
+            "processing_ms": {k: _percentiles(v) for k, v in processing.items()},
+            "throughput": {
+                "check_update_runs": checks,
+                "ingest_runs": ingests,
+                "upstream_requests": dict(self.upstream.requests),
+                "pipeline_busy_seconds": round(busy, 3),
+                "runs_per_busy_second": round((checks + ingests) / busy, 1) if busy else None,
+            },
+            "stage_ms": {k: _percentiles(v) for k, v in self.stage_ms.items()},
+            "check_outcomes": dict(self.outcomes),
+        }
+
+
+def _print(report: Dict[str, Any]) -> None:
+    a = report["alerts"]
+    print(f"Skenario : {report['scenario']}  ({report['virtual_seconds']:.0f} s virtual, "
+          f"{report['wall_seconds']} s wall, speed {report['speed']:g}x)")
+    print(f"Alert    : {a['pushed']} terkirim / {a['expected']} diharapkan, "
+          f"{len(a['missed'])} terlewat, {len(a['duplicates'])} dobel, {len(a['unexpected'])} tak terduga")
+    for name in ("missed", "unexpected"):
+        for k in a[name]:
+            print(f"  {name:<10} {k}")
+    for k, n in a["duplicates"].items():
+        print(f"  duplicate  {k} x{n}")
+    print("Latensi deteksi->push (detik virtual):")
+    for kind, p in report["detection_to_push_seconds"].items():
+        proc = report["processing_ms"].get(kind, {})
+        print(f"  {kind:<16} n={p['count']:<4} p50={p.get('p50')} p95={p.get('p95')} max={p.get('max')}"
+              f"  | proses p50={proc.get('p50')} ms")
+    t = report["throughput"]
+    print(f"Throughput: {t['check_update_runs']} check_update, {t['ingest_runs']} ingest, "
+          f"{t['runs_per_busy_second']} run/detik sibuk, request upstream {t['upstream_requests']}")
+    for stage, p in report["stage_ms"].items():
+        print(f"  {stage:<16} p50={p.get('p50')} ms p95={p.get('p95')} ms")
+    print(f"Outcome check_update: {report['check_outcomes']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("scenario", type=Path)
+    ap.add_argument("--speed", type=float, default=0, help="kelipatan waktu nyata; 0 = secepatnya (default)")
+    ap.add_argument("--json", type=Path, default=None, help="simpan laporan lengkap ke file JSON")
+    ap.add_argument("--seed", type=int, default=1, help="seed jitter circuit breaker")
+    ap.add_argument("--keep", action="store_true", help="jangan hapus direktori data sementara")
+    ap.add_argument("--log-level", default="CRITICAL", help="log pipeline (default diam; outage memang memicu traceback)")
+    args = ap.parse_args()
+
+    os.environ["LOG_LEVEL"] = args.log_level.upper()
+
+    random.seed(args.seed)
+    scenario = json.loads(args.scenario.read_text(encoding="utf-8"))
+    workdir = Path(tempfile.mkdtemp(prefix="sinabung-replay-"))
+    try:
+        report = asyncio.run(Replay(scenario, args.scenario.parent, args.speed, workdir).run())
+    finally:
+        if args.keep:
+            print(f"Data replay disimpan di {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    _print(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    missed = report["alerts"]["missed"] or report["alerts"]["duplicates"]
+    raise SystemExit(1 if missed else 0)
+
+
+if __name__ == "__main__":
+    main()
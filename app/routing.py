@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import geo
+from .hazard import HazardGeometry
+
+logger = logging.getLogger("sinabung.routing")
+
+# -----------------------------------------------------------------------------
+# Routing offline di atas graf jalan dari ekstrak OSM lokal (GeoJSON LineString,
+# mis. hasil `osmium export` / Overpass untuk Kab. Karo dengan tag highway).
+#
+# Pra-komputasi: landmark (ALT = A* + Landmarks + triangle inequality). Jarak
+# dari/ke beberapa landmark memberi batas bawah waktu tempuh yang tetap valid
+# walau edge di dalam radius bahaya dibuang saat query (graf yang lebih kecil
+# hanya bisa membuat rute lebih lama), jadi tidak perlu pra-komputasi ulang
+# setiap radius MAGMA berubah, beda dengan contraction hierarchies.
+# -----------------------------------------------------------------------------
+BASE_DIR = Path(__file__).resolve().parents[1]
+ROADS_FILE = Path(os.environ.get("ROADS_GEOJSON", str(BASE_DIR / "data" / "roads.geojson")))
+LANDMARKS = max(1, int(os.environ.get("ROUTE_LANDMARKS", "8")))
+# A* multi-target ke N posko terdekat (garis lurus) yang masih punya tempat
+CANDIDATES = max(1, int(os.environ.get("ROUTE_CANDIDATES", "8")))
+MAX_SNAP_KM = float(os.environ.get("ROUTE_MAX_SNAP_KM", "3"))
+GRID_DEG = 0.01  # ~1.1 km per sel untuk snap titik ke node terdekat
+
+# km/jam per kelas jalan OSM (dipakai kalau maxspeed tidak ada)
+SPEEDS_KMH: Dict[str, float] = {
+    "motorway": 80, "trunk": 70, "primary": 60, "secondary": 50, "tertiary": 40,
+    "unclassified": 30, "residential": 25, "living_street": 10, "service": 15,
+    "track": 10, "path": 5, "footway": 5, "steps": 3,
+}
+DEFAULT_SPEED_KMH = 25.0
+
+INF = float("inf")
+_NUM_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def _speed(props: Dict[str, Any]) -> float:
+    m = _NUM_RE.search(str(props.get("maxspeed") or ""))
+    if m:
+        return max(5.0, float(m.group(0).replace(",", ".")))
+    return SPEEDS_KMH.get(str(props.get("highway") or ""), DEFAULT_SPEED_KMH)
+
+
+def _lines(geom: Dict[str, Any]) -> Iterable[List[List[float]]]:
+    if geom.get("type") == "LineString":
+        yield geom.get("coordinates") or []
+    elif geom.get("type") == "MultiLineString":
+        yield from geom.get("coordinates") or []
+
+
+class RoadGraph:
+    """Graf berarah; bobot edge = detik tempuh. Adjacency disimpan per node sebagai list (v, detik, km)."""
+
+    def __init__(self) -> None:
+        self.lat = array("d")
+        self.lng = array("d")
+        self.adj: List[List[Tuple[int, float, float]]] = []
+        self.radj: List[List[Tuple[int, float]]] = []
+        self.crater_km = array("d")
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        self.landmarks: List[int] = []
+        self.lm_from: List[array] = []  # d(L, v)
+        self.lm_to: List[array] = []  # d(v, L)
+        self._ids: Dict[Tuple[float, float], int] = {}
+        self._blocked: Optional[Tuple[Any, bytearray]] = None
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @property
+    def edges(self) -> int:
+        return sum(len(a) for a in self.adj)
+
+    # ----------------------------------------------------------------- build
+    def _node(self, lng: float, lat: float) -> int:
+        key = (round(lat, 7), round(lng, 7))
+        nid = self._ids.get(key)
+        if nid is None:
+            nid = self._ids[key] = len(self.lat)
+            self.lat.append(key[0])
+            self.lng.append(key[1])
+            self.adj.append([])
+            self.radj.append([])
+            self.grid.setdefault(self._cell(key[0], key[1]), []).append(nid)
+        return nid
+
+    def _edge(self, u: int, v: int, seconds: float, km: float) -> None:
+        self.adj[u].append((v, seconds, km))
+        self.radj[v].append((u, seconds))
+
+    def add_way(self, coords: List[List[float]], props: Dict[str, Any]) -> None:
+        kmh = _speed(props)
+        oneway = str(props.get("oneway") or "").lower()
+        for (lng1, lat1, *_), (lng2, lat2, *_) in zip(coords, coords[1:]):
+            u, v = self._node(lng1, lat1), self._node(lng2, lat2)
+            if u == v:
+                continue
+            km = geo.haversine_km(self.lat[u], self.lng[u], self.lat[v], self.lng[v])
+            sec = km / kmh * 3600
+            if oneway == "-1":
+                self._edge(v, u, sec, km)
+                continue
+            self._edge(u, v, sec, km)
+            if oneway not in ("yes", "true", "1"):
+                self._edge(v, u, sec, km)
+
+    @classmethod
+    def from_geojson(cls, data: Dict[str, Any]) -> "RoadGraph":
+        g = cls()
+        for feat in data.get("features") or []:
+            props = feat.get("properties") or {}
+            for coords in _lines(feat.get("geometry") or {}):
+                g.add_way(coords, props)
+        g._ids.clear()
+        g.crater_km = array("d", (float(d) for d in geo.haversine_km_batch(g.lat, g.lng)))
+        g._pick_landmarks()
+        return g
+
+    # ------------------------------------------------------------- landmarks
+    def _dijkstra(self, src: int, reverse: bool = False) -> array:
+        dist = array("d", [INF]) * len(self)
+        dist[src] = 0.0
+        heap = [(0.0, src)]
+        adj = self.radj if reverse else self.adj
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in adj[u]:
+                nd = d + e[1]
+                if nd < dist[e[0]]:
+                    dist[e[0]] = nd
+                    heapq.heappush(heap, (nd, e[0]))
+        return dist
+
+    def _pick_landmarks(self) -> None:
+        """Farthest-point: landmark di pinggir graf memberi batas bawah paling ketat."""
+        n = len(self)
+        if not n:
+            return
+        nearest = array("d", [INF]) * n
+        cur = 0
+        for _ in range(min(LANDMARKS, n)):
+            self.landmarks.append(cur)
+            self.lm_from.append(self._dijkstra(cur))
+            self.lm_to.append(self._dijkstra(cur, reverse=True))
+            d = geo.haversine_km_batch(self.lat, self.lng, self.lat[cur], self.lng[cur])
+            for i in range(n):
+                if d[i] < nearest[i]:
+                    nearest[i] = float(d[i])
+            cur = max(range(n), key=nearest.__getitem__)
+            if nearest[cur] == 0:
+                break
+
+    # ------------------------------------------------------------------ snap
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / GRID_DEG)), int(math.floor(lng / GRID_DEG))
+
+    def nearest_node(self, lat: float, lng: float, max_km: float = MAX_SNAP_KM) -> Optional[Tuple[int, float]]:
+        """Node terdekat lewat grid: cek cincin sel yang makin lebar, berhenti setelah satu cincin ekstra."""
+        ci, cj = self._cell(lat, lng)
+        best: Optional[Tuple[int, float]] = None
+        max_ring = int(max_km / (GRID_DEG * 111)) + 1
+        for r in range(max_ring + 1):
+            for i in range(ci - r, ci + r + 1):
+                for j in range(cj - r, cj + r + 1):
+                    if max(abs(i - ci), abs(j - cj)) != r:
+                        continue
+                    for nid in self.grid.get((i, j), ()):
+                        d = geo.haversine_km(lat, lng, self.lat[nid], self.lng[nid])
+                        if best is None or d < best[1]:
+                            best = (nid, d)
+            # node di cincin r+1 bisa lebih dekat dari yang ditemukan di cincin r
+            if best is not None and best[1] <= r * GRID_DEG * 111 * math.cos(math.radians(lat)):
+                break
+        if best is None or best[1] > max_km:
+            return None
+        return best
+
+    # ---------------------------------------------------------------- search
+    def _heuristic(self, targets: List[int]):
+        """min atas target dari batas bawah ALT (maks atas landmark); admissible & konsisten."""
+        terms = []
+        for t in targets:
+            per_lm = [
+                (self.lm_from[k], self.lm_from[k][t], self.lm_to[k], self.lm_to[k][t])
+                for k in range(len(self.landmarks))
+            ]
+            terms.append(per_lm)
+
+        def h(v: int) -> float:
+            best = INF
+            for per_lm in terms:
+                lb = 0.0
+                for f, ft, to, tt in per_lm:
+                    fv, tv = f[v], to[v]
+                    if ft < INF and fv < INF and ft - fv > lb:
+                        lb = ft - fv
+                    if tv < INF and tt < INF and tv - tt > lb:
+                        lb = tv - tt
+                if lb < best:
+                    best = lb
+            return best
+
+        return h
+
+    def blocked(self, hazard: Optional[HazardGeometry]) -> Optional[bytearray]:
+        """Mask node di dalam zona bahaya; dihitung sekali per geometri (laporan)."""
+        if not hazard:
+            return None
+        cached = self._blocked
+        if cached is not None and cached[0] == hazard.key:
+            return cached[1]
+        mask = bytearray(bool(x) for x in hazard.contains_many(self.lat, self.lng))
+        self._blocked = (hazard.key, mask)
+        return mask
+
+    def route(
+        self, src: int, targets: Iterable[int], hazard: Optional[HazardGeometry] = None
+    ) -> Optional[Tuple[int, float, float, List[int]]]:
+        """
+        A* (ALT) dari src ke target terdekat (waktu tempuh). Edge yang masuk ke
+        zona bahaya dilewati, kecuali edge yang menjauh dari kawah (supaya orang
+        yang sudah di dalam zona tetap bisa keluar). Return (target, detik, km, path).
+        """
+        goal = set(targets)
+        if not goal:
+            return None
+        h = self._heuristic(list(goal))
+        crater = self.crater_km
+        blocked = self.blocked(hazard)
+
+        dist: Dict[int, float] = {src: 0.0}
+        km: Dict[int, float] = {src: 0.0}
+        parent: Dict[int, int] = {src: -1}
+        hcache: Dict[int, float] = {}
+        heap = [(h(src), 0.0, src)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u in goal:
+                path = [u]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return u, d, km[u], path
+            cu = crater[u]
+            for v, sec, length in self.adj[u]:
+                if blocked is not None and blocked[v] and crater[v] <= cu:
+                    continue
+                nd = d + sec
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    km[v] = km[u] + length
+                    parent[v] = u
+                    hv = hcache.get(v)
+                    if hv is None:
+                        hv = hcache[v] = h(v)
+                    heapq.heappush(heap, (nd + hv, nd, v))
+        return None
+
+    def coords(self, path: List[int]) -> List[List[float]]:
+        return [[round(self.lng[n], 6), round(self.lat[n], 6)] for n in path]
+
+
+# -----------------------------------------------------------------------------
+# Graf bersama. Request hanya membaca referensi graf terakhir yang selesai
+# dibangun; parse GeoJSON + Dijkstra landmark jalan di thread background dan
+# referensinya ditukar setelah selesai, jadi thread pool tidak pernah menunggu build.
+# -----------------------------------------------------------------------------
+RETRY_AFTER_SECONDS = int(os.environ.get("ROUTE_RETRY_AFTER_SECONDS", "5"))
+
+_lock = threading.Lock()  # satu build sekaligus
+_graph: Optional[RoadGraph] = None
+_graph_mtime: Optional[int] = None  # mtime file yang terakhir dicoba dibangun
+_builder: Optional[threading.Thread] = None
+
+
+class GraphNotReady(RuntimeError):
+    """Graf jalan belum selesai dibangun (atau file jalan tidak ada)."""
+
+
+def _roads_mtime() -> Optional[int]:
+    try:
+        return ROADS_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def rebuild_if_changed() -> bool:
+    """Bangun ulang graf kalau file jalan berubah. Blocking; dipanggil dari thread background."""
+    global _graph, _graph_mtime
+    with _lock:
+        mtime = _roads_mtime()
+        if mtime is None or mtime == _graph_mtime:
+            return False
+        # file rusak tidak dicoba ulang sampai berubah lagi; graf lama tetap dipakai
+        _graph_mtime = mtime
+        try:
+            g = RoadGraph.from_geojson(json.loads(ROADS_FILE.read_text(encoding="utf-8")))
+        except Exception:
+            logger.exception("Failed to build road graph from %s.", ROADS_FILE)
+            return False
+        _graph = g
+        logger.info("Road graph loaded: %s nodes, %s edges, %s landmarks.", len(g), g.edges, len(g.landmarks))
+        return True
+
+
+def _rebuild_in_background() -> None:
+    global _builder
+    if _builder is None or not _builder.is_alive():
+        _builder = threading.Thread(target=rebuild_if_changed, name="road-graph", daemon=True)
+        _builder.start()
+
+
+def get_graph() -> Optional[RoadGraph]:
+    """Graf terakhir yang sudah jadi (None kalau belum ada). File berubah -> build ulang di background."""
+    mtime = _roads_mtime()
+    if mtime is not None and mtime != _graph_mtime:
+        _rebuild_in_background()
+    return _graph
+
+
+def warm_up() -> None:
+    """Bangun graf + landmark di background saat startup (bisa beberapa detik untuk ekstrak besar)."""
+    if _roads_mtime() is None:
+        logger.info("Road graph not found at %s; routing disabled.", ROADS_FILE)
+        return
+    _rebuild_in_background()
+
+
+def nearest_shelter_route(
+    lat: float,
+    lng: float,
+    people: int = 1,
+    hazard: Optional[HazardGeometry] = None,
+    posko_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Rute tercepat ke posko terdekat yang masih muat `people` orang. Raise GraphNotReady
+    (graf belum jadi), LookupError (posko/rute tidak ada) atau ValueError (titik
+    terlalu jauh dari jalan).
+    """
+    from .occupancy import COUNTERS
+    from .posko_store import list_posko
+
+    g = get_graph()
+    if g is None:
+        raise GraphNotReady("Graf jalan sedang disiapkan." if _roads_mtime() else "Graf jalan belum tersedia.")
+    if not len(g):
+        raise LookupError("Graf jalan kosong.")
+
+    start = g.nearest_node(lat, lng)
+    if start is None:
+        raise ValueError(f"Lokasi lebih dari {MAX_SNAP_KM:g} km dari jalan terdekat.")
+
+    free = {row["posko_id"]: row for row in COUNTERS.all()}
+    posko = [
+        p
+        for p in list_posko()
+        if (posko_id is None or p.id == posko_id)
+        and (p.id not in free or free[p.id]["sisa"] is None or free[p.id]["sisa"] >= people)
+        and not (hazard and hazard.contains(p.lat, p.lng))
+    ]
+    if not posko:
+        raise LookupError("Tidak ada posko aman yang masih punya tempat.")
+
+    dists = geo.haversine_km_batch([p.lat for p in posko], [p.lng for p in posko], lat, lng)
+    by_node: Dict[int, List[Any]] = {}
+    for d, p in sorted(zip(dists, posko), key=lambda x: x[0]):
+        snapped = g.nearest_node(p.lat, p.lng)
+        if snapped is not None:
+            by_node.setdefault(snapped[0], []).append(p)
+        if len(by_node) >= CANDIDATES:
+            break
+
+    if not by_node:
+        raise LookupError("Tidak ada posko yang terhubung ke jaringan jalan.")
+    found = g.route(start[0], by_node, hazard)
+    if found is None:
+        raise LookupError("Tidak ada rute ke posko yang tidak melewati zona bahaya.")
+    node, seconds, km, path = found
+    p = by_node[node][0]
+    return {
+        "posko": {**p.__dict__, **({"okupansi": free[p.id]} if p.id in free else {})},
+        "distance_km": round(km, 2),
+        "duration_min": round(seconds / 60, 1),
+        "straight_line_km": round(geo.haversine_km(lat, lng, p.lat, p.lng), 2),
+        "snap_distance_m": round(start[1] * 1000),
+        "hazard_radius_km": hazard.max_radius_km if hazard else None,
+        "geometry": {"type": "LineString", "coordinates": [[lng, lat]] + g.coords(path) + [[p.lng, p.lat]]},
+    }
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from . import hazard, routing
+
+router = APIRouter(tags=["routing"])
+
+
+@router.get("/evacuation/route")
+def evacuation_route(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    orang: int = Query(1, ge=1, le=1000, description="Jumlah orang yang perlu tempat di posko"),
+    posko_id: Optional[str] = Query(None, description="Paksa rute ke posko tertentu"),
+    radius_km: Optional[float] = Query(None, ge=0, le=50, description="Override radius bahaya (default: laporan MAGMA terakhir)"),
+) -> Dict[str, Any]:
+    """
+    Rute jalan tercepat ke posko terdekat yang masih punya tempat, tanpa lewat
+    jalan di dalam zona bahaya. Geometri rute berupa GeoJSON LineString [lng, lat].
+    """
+    try:
+        return routing.nearest_shelter_route(
+            lat, lng, people=orang, hazard=hazard.resolve(radius_km), posko_id=posko_id
+        )
+    except routing.GraphNotReady as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(routing.RETRY_AFTER_SECONDS)}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
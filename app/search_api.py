@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, Query
+
+from .search_index import ensure_built
+
+router = APIRouter(tags=["search"])
+
+_COLLECTIONS = {"posko": "posko", "video": "education"}
+
+
+@router.get("/search")
+def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Optional[Literal["posko", "video"]] = None,
+    limit: int = Query(10, ge=1, le=50),
+) -> Dict[str, Any]:
+    """
+    Cari posko (nama/alamat/keterangan) dan video edukasi (judul/keterangan).
+    Tidak peka huruf besar/aksen; setiap token dicocokkan exact > prefix > trigram (salah ketik),
+    jadi kata yang belum selesai diketik di posisi mana pun tetap cocok.
+    """
+    index = ensure_built()
+    collection = _COLLECTIONS[type] if type else None
+    return {"q": q, "items": index.search(q, collection=collection, limit=limit)}
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import changes
+
+# Bobot per field: cocok di nama/judul lebih penting daripada di keterangan
+FIELDS = {
+    "posko": {"nama": 3.0, "alamat": 2.0, "keterangan": 1.0},
+    "education": {"judul": 3.0, "keterangan": 1.0},
+}
+TYPE_NAMES = {"posko": "posko", "education": "video"}
+
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+MAX_PREFIX_TOKENS = 64
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+
+DocKey = Tuple[str, str]  # (collection, id)
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase + buang aksen/diakritik (é -> e), non-alfanumerik jadi spasi."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _SPLIT_RE.sub(" ", text.lower()).strip()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return normalize(text).split()
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class _Doc:
+    collection: str
+    id: str
+    title: str
+    subtitle: Optional[str]
+    tokens: Dict[str, float]  # token -> bobot field tertinggi
+
+
+class SearchIndex:
+    """
+    Inverted index di memori:
+    - postings: token -> {doc: bobot}
+    - vocab terurut untuk prefix lookup (bisect)
+    - trigram -> token untuk toleransi salah ketik
+    Diupdate per dokumen (upsert/remove), tanpa rebuild penuh.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._docs: Dict[DocKey, _Doc] = {}
+        self._postings: Dict[str, Dict[DocKey, float]] = defaultdict(dict)
+        self._vocab: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ---------------------------------------------------------------- write
+    def _add_token(self, token: str) -> None:
+        i = bisect.bisect_left(self._vocab, token)
+        if i == len(self._vocab) or self._vocab[i] != token:
+            self._vocab.insert(i, token)
+            for g in _trigrams(token):
+                self._trigrams[g].add(token)
+
+    def _drop_token(self, token: str) -> None:
+        self._postings.pop(token, None)
+        i = bisect.bisect_left(self._vocab, token)
+        if i < len(self._vocab) and self._vocab[i] == token:
+            del self._vocab[i]
+        for g in _trigrams(token):
+            bucket = self._trigrams.get(g)
+            if bucket is not None:
+                bucket.discard(token)
+                if not bucket:
+                    del self._trigrams[g]
+
+    def upsert(self, collection: str, item: Dict[str, Any]) -> None:
+        fields = FIELDS[collection]
+        key = (collection, str(item.get("id")))
+        tokens: Dict[str, float] = {}
+        for field, weight in fields.items():
+            for t in tokenize(item.get(field)):
+                if weight > tokens.get(t, 0.0):
+                    tokens[t] = weight
+
+        title_field, *rest = fields
+        doc = _Doc(
+            collection=collection,
+            id=key[1],
+            title=item.get(title_field) or "",
+            subtitle=item.get(rest[0]) if rest else None,
+            tokens=tokens,
+        )
+        with self._lock:
+            self._remove(key)
+            self._docs[key] = doc
+            for t, w in tokens.items():
+                if t not in self._postings:
+                    self._add_token(t)
+                self._postings[t][key] = w
+
+    def _remove(self, key: DocKey) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for t in doc.tokens:
+            posting = self._postings.get(t)
+            if posting is None:
+                continue
+            posting.pop(key, None)
+            if not posting:
+                self._drop_token(t)
+
+    def remove(self, collection: str, item_id: str) -> None:
+        with self._lock:
+            self._remove((collection, str(item_id)))
+
+    def rebuild(self, collection: str, items: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            for key in [k for k in self._docs if k[0] == collection]:
+                self._remove(key)
+            for it in items:
+                self.upsert(collection, it)
+
+    # ----------------------------------------------------------------- read
+    def _expand(self, qt: str) -> Dict[str, float]:
+        """Token vocab yang cocok dengan token query (exact > prefix > trigram) -> faktor skor."""
+        out: Dict[str, float] = {}
+        if qt in self._postings:
+            out[qt] = EXACT
+        i = bisect.bisect_left(self._vocab, qt)
+        end = min(len(self._vocab), i + MAX_PREFIX_TOKENS)
+        while i < end and self._vocab[i].startswith(qt):
+            out.setdefault(self._vocab[i], PREFIX)
+            i += 1
+        if not out and len(qt) >= 3:
+            grams = _trigrams(qt)
+            counts: Dict[str, int] = defaultdict(int)
+            for g in grams:
+                for t in self._trigrams.get(g, ()):
+                    counts[t] += 1
+            for t, c in counts.items():
+                sim = c / len(grams | _trigrams(t))
+                if sim >= MIN_TRIGRAM_SIMILARITY:
+                    out[t] = FUZZY * sim
+        return out
+
+    def search(self, q: str, collection: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        qtokens = tokenize(q)
+        if not qtokens:
+            return []
+        with self._lock:
+            per_token: List[Dict[DocKey, float]] = []
+            for qt in qtokens:
+                scores: Dict[DocKey, float] = {}
+                for t, factor in self._expand(qt).items():
+                    for key, w in self._postings[t].items():
+                        if collection and key[0] != collection:
+                            continue
+                        s = w * factor
+                        if s > scores.get(key, 0.0):
+                            scores[key] = s
+                per_token.append(scores)
+
+            # AND: dokumen harus cocok semua token; kalau kosong, turun ke OR
+            keys = set(per_token[0]).intersection(*per_token[1:]) if per_token else set()
+            if not keys:
+                keys = set().union(*per_token)
+            ranked = sorted(
+                ((sum(s.get(k, 0.0) for s in per_token), k) for k in keys),
+                key=lambda x: (-x[0], self._docs[x[1]].title.lower()),
+            )[:limit]
+            return [
+                {
+                    "type": TYPE_NAMES[k[0]],
+                    "id": k[1],
+                    "title": self._docs[k].title,
+                    "subtitle": self._docs[k].subtitle,
+                    "score": round(score, 3),
+                }
+                for score, k in ranked
+            ]
+
+
+INDEX = SearchIndex()
+_built = False
+_build_lock = threading.Lock()
+
+
+def ensure_built() -> SearchIndex:
+    """Bangun index dari store saat pertama dipakai; setelah itu hanya update inkremental."""
+    global _built
+    if _built:
+        return INDEX
+    with _build_lock:
+        if not _built:
+            from .posko_store import list_posko
+            from .storage import read_json
+
+            INDEX.rebuild("posko", (p.__dict__ for p in list_posko()))
+            INDEX.rebuild("education", read_json("education", default=[]))
+            _built = True
+    return INDEX
+
+
+@changes.subscribe
+def _on_change(collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]]) -> None:
+    if collection not in FIELDS:
+        return
+    if not _built:
+        # kalau index sedang dibangun, tunggu selesai lalu terapkan perubahan ini
+        with _build_lock:
+            if not _built:
+                return
+    if op == "delete" or item is None:
+        INDEX.remove(collection, item_id)
+    else:
+        INDEX.upsert(collection, item)
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .http_client import get_client
+from .storage import DATA_DIR
+
+logger = logging.getLogger("sinabung.shakemap")
+
+try:
+    from PIL import Image
+except Exception:  # Pillow (requirements.txt) tidak terpasang -> hanya ukuran asli yang disajikan
+    Image = None
+    logger.warning("Pillow not installed: shakemap mobile variants disabled, serving originals only.")
+
+BMKG_SHAKEMAP_BASE = "https://data.bmkg.go.id/DataMKG/TEWS/"
+
+CACHE_DIR = Path(os.environ.get("SHAKEMAP_CACHE_DIR", str(DATA_DIR / "shakemap")))
+CACHE_MAX_BYTES = int(float(os.environ.get("SHAKEMAP_CACHE_MAX_MB", "200")) * 1024 * 1024)
+# lebar varian kecil untuk mobile (px), dibuat sekali saat gambar pertama kali diambil
+VARIANT_WIDTHS: List[int] = sorted(
+    int(w) for w in os.environ.get("SHAKEMAP_WIDTHS", "480,960").split(",") if w.strip()
+)
+
+# awal file PNG / JPEG
+_MAGIC = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff")
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]*\.(jpe?g|png)$", re.I)
+
+
+class InvalidImage(Exception):
+    """Upstream mengirim sesuatu yang bukan gambar; tidak disimpan di cache."""
+
+
+def valid_name(name: str) -> bool:
+    return bool(_NAME_RE.match(name)) and ".." not in name
+
+
+def variant_name(name: str, width: Optional[int]) -> str:
+    if not width:
+        return name
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.w{width}{ext}"
+
+
+def pick_width(requested: Optional[int]) -> Optional[int]:
+    """Varian terkecil yang >= lebar diminta; None = ukuran asli."""
+    if not requested or Image is None:
+        return None
+    for w in VARIANT_WIDTHS:
+        if w >= requested:
+            return w
+    return None
+
+
+class ShakemapCache:
+    """
+    Cache disk berbatas ukuran dengan eviksi LRU. Urutan LRU disimpan di memori
+    dan juga lewat mtime file, jadi tetap benar setelah restart.
+    """
+
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.dir = directory
+        self.max_bytes = max_bytes
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        files = sorted((p for p in self.dir.iterdir() if p.is_file()), key=lambda p: p.stat().st_mtime)
+        for p in files:
+            if p.suffix == ".tmp":
+                p.unlink(missing_ok=True)
+                continue
+            size = p.stat().st_size
+            self._lru[p.name] = size
+            self._total += size
+
+    # ------------------------------------------------------------------ LRU
+    def __contains__(self, fname: str) -> bool:
+        return fname in self._lru
+
+    # Semua akses disk (tulis, baca, hapus) dan Pillow jalan di thread, bukan di event
+    # loop. Pembukuan LRU tetap di event loop (satu thread), jadi tidak perlu lock.
+    def _read(self, fname: str) -> bytes:
+        path = self.dir / fname
+        data = path.read_bytes()
+        try:
+            os.utime(path)  # mtime = urutan LRU setelah restart
+        except OSError:
+            pass
+        return data
+
+    def _write(self, files: Dict[str, bytes]) -> None:
+        for fname, data in files.items():
+            path = self.dir / fname
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+
+    def _unlink(self, fnames: List[str]) -> None:
+        for fname in fnames:
+            (self.dir / fname).unlink(missing_ok=True)
+
+    async def _put(self, files: Dict[str, bytes]) -> None:
+        await asyncio.to_thread(self._write, files)
+        for fname, data in files.items():
+            self._total += len(data) - self._lru.pop(fname, 0)
+            self._lru[fname] = len(data)
+        victims = self._evict()
+        if victims:
+            await asyncio.to_thread(self._unlink, victims)
+
+    def _evict(self) -> List[str]:
+        victims: List[str] = []
+        while self._total > self.max_bytes and len(self._lru) > 1:
+            fname, size = self._lru.popitem(last=False)
+            self._total -= size
+            victims.append(fname)
+            logger.info("Shakemap cache evicted %s (%s bytes).", fname, size)
+        return victims
+
+    # ----------------------------------------------------------------- fetch
+    @staticmethod
+    def _check_image(name: str, data: bytes) -> None:
+        """Tolak yang bukan PNG/JPEG utuh (mis. halaman error HTML dengan status 200)."""
+        if not data.startswith(_MAGIC):
+            raise InvalidImage(f"{name}: isi bukan PNG/JPEG")
+        if Image is None:
+            return
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+        except Exception as e:
+            raise InvalidImage(f"{name}: gambar rusak ({type(e).__name__})") from e
+
+    @staticmethod
+    def _make_variants(name: str, data: bytes) -> Dict[str, bytes]:
+        out: Dict[str, bytes] = {}
+        if Image is None:
+            return out
+        with Image.open(io.BytesIO(data)) as img:
+            fmt = img.format or "JPEG"
+            for w in VARIANT_WIDTHS:
+                if img.width <= w:
+                    continue
+                h = round(img.height * w / img.width)
+                small = img.resize((w, h), Image.LANCZOS)
+                if fmt == "JPEG" and small.mode not in ("RGB", "L"):
+                    small = small.convert("RGB")
+                buf = io.BytesIO()
+                small.save(buf, format=fmt, optimize=True, **({"quality": 80} if fmt == "JPEG" else {}))
+                out[variant_name(name, w)] = buf.getvalue()
+        return out
+
+    def _prepare(self, name: str, data: bytes) -> Dict[str, bytes]:
+        """Validasi + varian mobile (di thread). Return {nama file: isi}, termasuk aslinya."""
+        self._check_image(name, data)
+        try:
+            files = self._make_variants(name, data)
+        except Exception:
+            logger.exception("Failed to build shakemap variants for %s.", name)
+            files = {}
+        files[name] = data
+        return files
+
+    async def _fetch(self, name: str) -> Dict[str, bytes]:
+        resp = await get_client().get(BMKG_SHAKEMAP_BASE + name)
+        resp.raise_for_status()
+        ctype = resp.headers.get("content-type", "").split(";")[0].strip().lower()
+        if not ctype.startswith("image/"):
+            raise InvalidImage(f"{name}: Content-Type {ctype or '-'}")
+
+        files = await asyncio.to_thread(self._prepare, name, resp.content)
+        await self._put(files)
+        return files
+
+    async def _fetch_shared(self, name: str) -> Dict[str, bytes]:
+        """Request bersamaan untuk gambar yang sama menunggu satu fetch yang sama."""
+        fut = self._inflight.get(name)
+        if fut is None:
+            fut = asyncio.ensure_future(self._fetch(name))
+            self._inflight[name] = fut
+            fut.add_done_callback(lambda _f: self._inflight.pop(name, None))
+        return await asyncio.shield(fut)
+
+    async def get(self, name: str, width: Optional[int] = None) -> bytes:
+        """
+        Isi shakemap `name` (varian `width` kalau ada). Yang dikembalikan bytes, bukan
+        path: file bisa ter-evict request lain selagi response masih dikirim.
+        """
+        fname = variant_name(name, width)
+        if name in self._lru:
+            if fname not in self._lru:
+                fname = name  # varian tidak dibuat (gambar kecil / tanpa Pillow)
+            self._lru.move_to_end(fname)
+            try:
+                return await asyncio.to_thread(self._read, fname)
+            except FileNotFoundError:
+                pass  # ter-evict selagi dibaca di thread; ambil ulang
+        files = await self._fetch_shared(name)
+        return files.get(fname) or files[name]
+
+
+CACHE = ShakemapCache()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from . import polling
+from .shakemap import CACHE, InvalidImage, pick_width, valid_name
+
+router = APIRouter(tags=["earthquake"])
+
+# nama shakemap BMKG unik per kejadian (timestamp), jadi isinya tidak pernah berubah
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+
+@router.get("/earthquake/shakemap/{name}")
+async def shakemap(name: str, w: Optional[int] = Query(None, ge=1, le=4096)):
+    """
+    Proxy + cache shakemap BMKG. `w` = lebar maksimum yang dibutuhkan klien;
+    dilayani dari varian kecil terdekat (mis. 480/960 px) kalau tersedia.
+    """
+    if not valid_name(name):
+        raise HTTPException(status_code=400, detail="Nama shakemap tidak valid")
+
+    breaker = polling.breaker("bmkg")
+    if name not in CACHE and not breaker.allow():
+        raise HTTPException(
+            status_code=503,
+            detail="BMKG sedang tidak tersedia",
+            headers={"Retry-After": str(int(breaker.retry_after()) + 1)},
+        )
+
+    try:
+        data = await CACHE.get(name, pick_width(w))
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Shakemap tidak ditemukan")
+        if e.response.status_code >= 500:
+            breaker.record_failure(e)
+        raise HTTPException(status_code=502, detail=f"BMKG error {e.response.status_code}")
+    except InvalidImage as e:
+        # mis. halaman error/maintenance HTML dengan status 200: tidak di-cache
+        breaker.record_failure(e)
+        raise HTTPException(status_code=502, detail="BMKG tidak mengirim gambar shakemap")
+    except httpx.HTTPError as e:
+        breaker.record_failure(e)
+        raise HTTPException(status_code=502, detail=f"Gagal akses BMKG: {type(e).__name__}")
+
+    media_type = "image/png" if name.lower().endswith(".png") else "image/jpeg"
+    return Response(data, media_type=media_type, headers=CACHE_HEADERS)
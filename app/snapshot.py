@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from .storage import read_json, write_json
+
+logger = logging.getLogger("sinabung.snapshot")
+
+# Payload terakhir yang sukses (last-known-good) per sumber, mis. "volcano" dan
+# "earthquake". Disimpan atomik ke data/last_good.json dan dimuat saat startup,
+# supaya dashboard langsung punya data walau MAGMA/BMKG belum/tidak bisa diakses.
+SNAPSHOT_KEY = "last_good"
+# age_seconds dibulatkan ke bawah per bucket: body dashboard (dan varian terkompresinya)
+# hanya berubah sekali per bucket, bukan tiap detik.
+AGE_BUCKET_SECONDS = max(1, int(os.environ.get("SNAPSHOT_AGE_BUCKET_SECONDS", "30")))
+
+_snap: Dict[str, Dict[str, Any]] = {}
+
+
+def load() -> None:
+    global _snap
+    data = read_json(SNAPSHOT_KEY, {})
+    _snap = data if isinstance(data, dict) else {}
+    logger.info("Loaded last-known-good snapshot: %s", ", ".join(sorted(_snap)) or "(empty)")
+
+
+def save(kind: str, payload: Dict[str, Any]) -> None:
+    _snap[kind] = {
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "fetched_ts": time.time(),
+        "payload": payload,
+    }
+    try:
+        write_json(SNAPSHOT_KEY, _snap)
+    except Exception:
+        logger.exception("Failed to persist snapshot %s.", kind)
+
+
+def age_seconds(kind: str) -> Optional[float]:
+    entry = _snap.get(kind)
+    if not entry:
+        return None
+    return max(0.0, time.time() - float(entry.get("fetched_ts") or 0))
+
+
+def get(kind: str, stale: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Payload snapshot + fetched_at, flag stale dan age_seconds, atau None.
+    age_seconds dibulatkan ke bawah per AGE_BUCKET_SECONDS supaya body tetap sama
+    di dalam satu bucket dan varian terkompresinya bisa dipakai ulang.
+    """
+    entry = _snap.get(kind)
+    if not entry:
+        return None
+    out = dict(entry.get("payload") or {})
+    out["fetched_at"] = entry.get("fetched_at")
+    out["stale"] = stale
+    age = int(age_seconds(kind) or 0)
+    out["age_seconds"] = age - age % AGE_BUCKET_SECONDS
+    return out
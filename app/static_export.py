@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from . import changes, precompressed
+from .storage import DATA_DIR
+
+logger = logging.getLogger("sinabung.export")
+
+# -----------------------------------------------------------------------------
+# Ekspor data publik ke file JSON statis (+ .gz/.br) setiap ada tulis admin,
+# supaya nginx/CDN bisa melayani semua read publik tanpa Python. Route Python
+# tetap ada sebagai fallback.
+#
+# Layout di EXPORT_DIR:
+#   evacuation-posts.json(.gz|.br)            versi terkini (diganti atomik)
+#   evacuation-posts.<etag>.json(.gz|.br)     versi immutable (KEEP_VERSIONS terakhir)
+#   manifest.json                             versi terkini per file
+# Contoh nginx:
+#   location = /evacuation/posts {
+#       gzip_static on; brotli_static on;
+#       try_files /evacuation-posts.json @python;
+#   }
+# -----------------------------------------------------------------------------
+ENABLED = os.environ.get("STATIC_EXPORT", "1").strip() != "0"
+EXPORT_DIR = Path(os.environ.get("STATIC_EXPORT_DIR", str(DATA_DIR / "public")))
+KEEP_VERSIONS = max(1, int(os.environ.get("STATIC_EXPORT_KEEP", "5")))
+
+
+def _load_posko() -> Any:
+    from .posko_store import list_posko
+
+    return [p.__dict__ for p in list_posko()]
+
+
+def _load_education() -> Any:
+    from .storage import read_json
+
+    return read_json("education", default=[])
+
+
+def _load_emergency() -> Any:
+    from .emergency_api import _load_state
+
+    return _load_state()
+
+
+# collection (lihat changes.py) -> (nama file, loader)
+EXPORTS: Dict[str, tuple[str, Callable[[], Any]]] = {
+    "posko": ("evacuation-posts", _load_posko),
+    "education": ("education-videos", _load_education),
+    "emergency": ("emergency-status", _load_emergency),
+}
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _prune(name: str, keep: set[str]) -> None:
+    versions = sorted(
+        (p for p in EXPORT_DIR.glob(f"{name}.*.json") if p.name not in keep),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for p in versions[KEEP_VERSIONS - 1 :]:
+        for suffix in ("", ".gz", ".br"):
+            Path(str(p) + suffix).unlink(missing_ok=True)
+
+
+def export(collection: str) -> Optional[Dict[str, Any]]:
+    """Tulis ulang file statis untuk satu koleksi. Return entry manifest."""
+    name, loader = EXPORTS[collection]
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+    v = precompressed.build(
+        None,
+        precompressed.encode_json(loader()),
+        gzip_level=precompressed.GZIP_LEVEL_MAX,
+        brotli_quality=precompressed.BROTLI_QUALITY_MAX,
+    )
+    tag = v.etag.strip('"')
+    versioned = f"{name}.{tag}.json"
+
+    variants = {"": v.identity, ".gz": v.gzip, ".br": v.br}
+    # versi immutable dulu, baru nama "terkini" diganti -> pembaca tidak pernah lihat file setengah jadi
+    for suffix, data in variants.items():
+        if data is None:
+            continue
+        target = EXPORT_DIR / (versioned + suffix)
+        if not target.exists():
+            _atomic_write(target, data)
+    for suffix, data in variants.items():
+        current = EXPORT_DIR / f"{name}.json{suffix}"
+        if data is None:
+            current.unlink(missing_ok=True)  # jangan sampai .br lama tersaji untuk data baru
+            continue
+        _atomic_write(current, data)
+
+    entry = {
+        "file": f"{name}.json",
+        "versioned": versioned,
+        "etag": v.etag,
+        "bytes": len(v.identity),
+        "encodings": [e for e, d in (("gzip", v.gzip), ("br", v.br)) if d is not None],
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _prune(name, {versioned})
+    return entry
+
+
+class _Exporter:
+    """Satu thread worker; tulis beruntun untuk koleksi yang sama digabung (yang terakhir menang)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # export() tidak boleh jalan paralel (nama file tmp sama)
+        self._pending: set[str] = set()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.manifest: Dict[str, Any] = {}
+
+    def submit(self, collection: str) -> None:
+        with self._lock:
+            self._pending.add(collection)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="static-export", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.run_pending()
+
+    def run_pending(self) -> None:
+        with self._run_lock:
+            self._run_pending()
+
+    def _run_pending(self) -> None:
+        with self._lock:
+            todo, self._pending = self._pending, set()
+        if not todo:
+            return
+        for collection in todo:
+            try:
+                self.manifest[EXPORTS[collection][0]] = export(collection)
+            except Exception:
+                logger.exception("Static export failed for %s.", collection)
+        try:
+            _atomic_write(
+                EXPORT_DIR / "manifest.json",
+                json.dumps(self.manifest, ensure_ascii=False, indent=2).encode("utf-8"),
+            )
+        except Exception:
+            logger.exception("Failed to write static export manifest.")
+
+
+EXPORTER = _Exporter()
+
+
+def export_all() -> None:
+    """Ekspor semua koleksi sinkron (startup)."""
+    if not ENABLED:
+        return
+    with EXPORTER._lock:
+        EXPORTER._pending.update(EXPORTS)
+    EXPORTER.run_pending()
+    logger.info("Static export written to %s.", EXPORT_DIR)
+
+
+@changes.subscribe
+def _on_change(collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]]) -> None:
+    if ENABLED and collection in EXPORTS:
+        EXPORTER.submit(collection)
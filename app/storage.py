@@ -1,13 +1,41 @@
 from __future__ import annotations
 
+import atexit
 import json
+import logging
+import os
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger("sinabung.storage")
 
 BASE_DIR = Path(__file__).resolve().parents[1]  # -> backend/
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# Write-behind: write_json langsung mengubah cache di memori, lalu thread flusher
+# menulis semua nama yang "dirty" ke disk sekali per interval (burst edit -> 1 tulis).
+# durable=True melewati antrian: tulis + fsync sinkron sebelum return.
+#
+# Cache menyimpan teks JSON (immutable): serialisasi terjadi di write_json, jadi data
+# yang tidak bisa di-serialize langsung error di pemanggil, dan read_json cukup
+# json.loads di luar lock (selalu dapat salinan baru). Cache dicek ulang ke mtime file,
+# jadi perubahan dari worker lain terbaca setelah di-flush. Dengan write-behind, dua
+# worker yang menulis nama yang sama bisa saling menimpa (last writer wins): jalankan
+# satu worker, atau STORAGE_WRITE_BEHIND=0 kalau harus multi-worker.
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("STORAGE_FLUSH_SECONDS", "1.0"))
+WRITE_BEHIND = os.environ.get("STORAGE_WRITE_BEHIND", "1").strip() != "0"
+
+_lock = threading.Lock()        # melindungi _cache/_mtimes/_dirty/_versions
+_flush_lock = threading.Lock()  # urutan tulis ke disk (flush vs durable write)
+_cache: Dict[str, str] = {}     # name -> teks JSON
+_mtimes: Dict[str, Optional[int]] = {}  # name -> mtime_ns file saat cache sinkron dengan disk
+_dirty: Set[str] = set()
+_versions: Dict[str, int] = {}
+_flusher: Optional[threading.Thread] = None
+_stop = threading.Event()
+
 
 def _path(name: str) -> Path:
     if not name.endswith(".json"):
@@ -15,18 +43,132 @@ def _path(name: str) -> Path:
     return DATA_DIR / name
 
 
+def _mtime(p: Path) -> Optional[int]:
+    try:
+        return p.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def _write_file(name: str, text: str, fsync: bool = False) -> Optional[int]:
+    p = _path(name)
+    tmp = p.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    tmp.replace(p)
+    return _mtime(p)
+
+
 def read_json(name: str, default: Any) -> Any:
     p = _path(name)
-    if not p.exists():
+    mtime = _mtime(p)
+    with _lock:
+        text = _cache.get(name)
+        if text is not None and not (name in _dirty or _mtimes.get(name) == mtime):
+            text = None  # file diubah proses lain sejak terakhir dibaca/ditulis
+    if text is not None:
+        return json.loads(text)
+
+    if mtime is None:
         return default
     try:
-        return json.loads(p.read_text(encoding="utf-8"))
+        text = p.read_text(encoding="utf-8")
+        data = json.loads(text)
     except Exception:
         return default
 
+    with _lock:
+        # jangan timpa tulisan yang masuk selagi kita baca disk
+        if name not in _dirty:
+            if name in _cache and _cache[name] != text:
+                _versions[name] = _versions.get(name, 0) + 1
+            _cache[name] = text
+            _mtimes[name] = mtime
+        elif _cache[name] != text:
+            return json.loads(_cache[name])
+    return data
 
-def write_json(name: str, data: Any) -> None:
-    p = _path(name)
-    tmp = p.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(p)
+
+def write_json(name: str, data: Any, durable: bool = False) -> None:
+    # serialisasi di sini (bukan di flusher) supaya TypeError sampai ke pemanggil
+    text = _dumps(data)
+
+    if durable or not WRITE_BEHIND:
+        with _flush_lock:
+            with _lock:
+                _cache[name] = text
+                _versions[name] = _versions.get(name, 0) + 1
+                _dirty.discard(name)
+            mtime = _write_file(name, text, fsync=durable)
+            with _lock:
+                _mtimes[name] = mtime
+        return
+
+    with _lock:
+        _cache[name] = text
+        _versions[name] = _versions.get(name, 0) + 1
+        _dirty.add(name)
+    _ensure_flusher()
+
+
+def version(name: str) -> int:
+    """Naik setiap write_json(name) atau file berubah dari luar; kunci cache turunan."""
+    mtime = _mtime(_path(name))
+    with _lock:
+        # cek mtime yang sama dengan read_json: cache turunan yang tidak pernah memanggil
+        # read_json (hit precompressed) tetap melihat perubahan dari worker lain/editor
+        if name in _mtimes and name not in _dirty and _mtimes[name] != mtime:
+            _cache.pop(name, None)
+            _mtimes.pop(name, None)
+            _versions[name] = _versions.get(name, 0) + 1
+        return _versions.get(name, 0)
+
+
+def flush() -> None:
+    """Tulis semua perubahan yang masih tertunda ke disk (dipanggil juga saat shutdown)."""
+    with _flush_lock:
+        with _lock:
+            pending = {name: _cache[name] for name in _dirty}
+            _dirty.clear()
+        for name, text in pending.items():
+            try:
+                mtime = _write_file(name, text)
+            except Exception:
+                logger.exception("Failed to flush %s; will retry.", name)
+                with _lock:
+                    _dirty.add(name)
+            else:
+                with _lock:
+                    _mtimes[name] = mtime
+
+
+def _flush_loop() -> None:
+    while not _stop.wait(FLUSH_INTERVAL_SECONDS):
+        flush()
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _stop.clear()
+        _flusher = threading.Thread(target=_flush_loop, name="storage-flusher", daemon=True)
+        _flusher.start()
+
+
+def shutdown() -> None:
+    _stop.set()
+    flush()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from . import sync_log
+from .admin_auth import require_admin
+
+router = APIRouter(tags=["sync"])
+
+
+@router.get("/sync")
+def sync(
+    since: int = Query(0, ge=0, description="seq terakhir yang sudah dimiliki klien (0 = belum punya apa-apa)"),
+    limit: int = Query(1000, ge=1, le=5000),
+    snapshot_after: Optional[int] = Query(None, ge=0, description="cursor snapshot dari response sebelumnya"),
+) -> Dict[str, Any]:
+    """
+    Delta sync posko/edukasi/status darurat untuk klien offline-first.
+    Simpan `seq` (dan `snapshot_after` kalau tidak null) dari response lalu kirim lagi
+    sebagai `since` / `snapshot_after`; ulangi selama `more=true`.
+    `op=delete` adalah tombstone. Kalau `reset=true`, buang data lokal dan pakai isi
+    response ini beserta halaman-halaman berikutnya.
+    """
+    return sync_log.changes_since(since, limit=limit, snapshot_after=snapshot_after)
+
+
+@router.post("/admin/sync/compact", dependencies=[Depends(require_admin)])
+def admin_sync_compact() -> Dict[str, Any]:
+    return {"ok": True, **sync_log.compact(), "seq": sync_log.latest_seq()}
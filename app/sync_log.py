@@ -0,0 +1,208 @@
+# app/sync_log.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import changes
+
+logger = logging.getLogger("sinabung.sync")
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+SYNC_DB = Path(os.environ.get("SYNC_DB", str(BASE_DIR / "data" / "sync.db")))
+
+# Tombstone (delete) disimpan selama ini; klien yang terakhir sync sebelum
+# tombstone tertua yang sudah dibuang harus full resync (reset=true).
+TOMBSTONE_TTL_DAYS = float(os.environ.get("SYNC_TOMBSTONE_TTL_DAYS", "30"))
+COMPACT_EVERY = int(os.environ.get("SYNC_COMPACT_EVERY", "500"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    item_id    TEXT NOT NULL,
+    op         TEXT NOT NULL,
+    item       TEXT,
+    ts         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_item ON changes(collection, item_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_appends = 0
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        SYNC_DB.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(str(SYNC_DB), check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+def _meta(conn: sqlite3.Connection, key: str, default: int = 0) -> int:
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return int(row["value"]) if row else default
+
+
+def _set_meta(conn: sqlite3.Connection, key: str, value: int) -> None:
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def append(collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]]) -> int:
+    global _appends
+    with _lock:
+        conn = _db()
+        cur = conn.execute(
+            "INSERT INTO changes (collection, item_id, op, item, ts) VALUES (?, ?, ?, ?, ?)",
+            (
+                collection,
+                str(item_id),
+                op,
+                json.dumps(item, ensure_ascii=False) if item is not None else None,
+                time.time(),
+            ),
+        )
+        conn.commit()
+        _appends += 1
+        seq = cur.lastrowid
+    if COMPACT_EVERY and _appends % COMPACT_EVERY == 0:
+        compact()
+    return seq
+
+
+def compact() -> Dict[str, int]:
+    """
+    - Hapus perubahan yang sudah ditimpa perubahan lebih baru untuk item yang sama
+      (klien di seq berapa pun tetap dapat versi terakhir item, jadi aman).
+    - Buang tombstone lebih tua dari TOMBSTONE_TTL_DAYS dan naikkan 'floor'.
+    """
+    cutoff = time.time() - TOMBSTONE_TTL_DAYS * 86400
+    with _lock:
+        conn = _db()
+        superseded = conn.execute(
+            "DELETE FROM changes WHERE seq NOT IN "
+            "(SELECT MAX(seq) FROM changes GROUP BY collection, item_id)"
+        ).rowcount
+        row = conn.execute(
+            "SELECT MAX(seq) AS s FROM changes WHERE op = 'delete' AND ts < ?", (cutoff,)
+        ).fetchone()
+        expired = 0
+        if row["s"] is not None:
+            expired = conn.execute("DELETE FROM changes WHERE op = 'delete' AND seq <= ?", (row["s"],)).rowcount
+            _set_meta(conn, "floor", max(_meta(conn, "floor"), int(row["s"])))
+        conn.commit()
+    if superseded or expired:
+        logger.info("Sync log compacted: %s superseded, %s expired tombstones.", superseded, expired)
+    return {"superseded": superseded, "expired_tombstones": expired}
+
+
+def latest_seq() -> int:
+    with _lock:
+        row = _db().execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+    return int(row["seq"]) if row else 0
+
+
+def changes_since(since: int, limit: int = 1000, snapshot_after: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Delta sejak `since`. Klien yang belum punya data (since=0) atau terlalu lama offline
+    (since < floor) dapat snapshot penuh, dipaging dengan cursor sendiri (`snapshot_after`)
+    sementara `seq` tetap di head saat snapshot dimulai. Setelah snapshot selesai klien
+    lanjut delta dari seq itu, jadi perubahan selama paging tidak hilang.
+    """
+    with _lock:
+        conn = _db()
+        floor = _meta(conn, "floor")
+        head_row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        head = int(head_row["seq"]) if head_row else 0
+        reset = since < floor
+        if reset or since == 0:
+            # mulai snapshot baru; reset hanya ditandai di halaman pertama
+            since, snapshot_after = max(head, floor), 0
+        if snapshot_after is not None:
+            # snapshot penuh: hanya versi terakhir tiap item yang masih ada
+            rows = conn.execute(
+                "SELECT seq, collection, item_id, op, item FROM changes WHERE seq > ? AND op != 'delete' "
+                "AND seq IN (SELECT MAX(seq) FROM changes GROUP BY collection, item_id) ORDER BY seq LIMIT ?",
+                (snapshot_after, limit + 1),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT seq, collection, item_id, op, item FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (since, limit + 1),
+            ).fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items: List[Dict[str, Any]] = [
+        {
+            "seq": r["seq"],
+            "collection": r["collection"],
+            "op": r["op"],
+            "id": r["item_id"],
+            "item": json.loads(r["item"]) if r["item"] is not None else None,
+        }
+        for r in rows
+    ]
+    if snapshot_after is not None:
+        # seq tidak pernah dibandingkan dengan cursor snapshot; selesai -> delta dari head awal
+        seq = since
+        next_snapshot = rows[-1]["seq"] if more else None
+        more = more or head > since
+    else:
+        # kalau tidak ada lagi, klien bisa langsung lompat ke head
+        seq = rows[-1]["seq"] if more else max(since, head)
+        next_snapshot = None
+    return {
+        "since": since,
+        "seq": seq,
+        "snapshot_after": next_snapshot,
+        "more": more,
+        "reset": reset,
+        "changes": items,
+        "server_time": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def ensure_seeded() -> None:
+    """Log kosong (pertama kali dipakai): isi dengan state saat ini sebagai upsert."""
+    with _lock:
+        conn = _db()
+        if conn.execute("SELECT 1 FROM changes LIMIT 1").fetchone() or _meta(conn, "seeded"):
+            return
+
+    from .emergency_api import STATE_KEY, _load_state
+    from .posko_store import list_posko
+    from .storage import read_json
+
+    for p in list_posko():
+        append("posko", "upsert", p.id, p.__dict__)
+    for v in read_json("education", default=[]):
+        append("education", "upsert", v.get("id"), v)
+    append("emergency", "upsert", STATE_KEY, _load_state())
+
+    with _lock:
+        conn = _db()
+        _set_meta(conn, "seeded", 1)
+        conn.commit()
+    logger.info("Sync log seeded up to seq %s.", latest_seq())
+
+
+@changes.subscribe
+def _on_change(collection: str, op: str, item_id: str, item: Optional[Dict[str, Any]]) -> None:
+    append(collection, op, item_id, item)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+# -----------------------------------------------------------------------------
+# Tracing ringan per stage (tanpa dependency OpenTelemetry). Trace yang sudah
+# selesai disimpan di ring buffer dan bisa diekspor sebagai OTLP/JSON.
+# -----------------------------------------------------------------------------
+BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", "200"))
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "sinabung-backend")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    error: Optional[str] = None
+    _t0: int = 0
+
+    def set(self, key: str, value: Any) -> "Span":
+        self.attributes[key] = value
+        return self
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _Noop:
+    """Dipakai kalau span dibuat di luar trace (mis. dashboard): semua set diabaikan."""
+
+    def set(self, key: str, value: Any) -> "_Noop":
+        return self
+
+
+NOOP = _Noop()
+
+TRACES: Deque[List[Span]] = deque(maxlen=BUFFER_SIZE)
+
+_spans: ContextVar[Optional[List[Span]]] = ContextVar("trace_spans", default=None)
+_current: ContextVar[Optional[Span]] = ContextVar("trace_current", default=None)
+
+
+def _start(name: str, trace_id: str, parent: Optional[Span], attrs: Dict[str, Any]) -> Span:
+    return Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attrs),
+        _t0=time.perf_counter_ns(),
+    )
+
+
+def _finish(sp: Span, exc: Optional[BaseException]) -> None:
+    sp.end_ns = sp.start_ns + (time.perf_counter_ns() - sp._t0)
+    if exc is not None:
+        sp.status = "error"
+        sp.error = f"{type(exc).__name__}: {exc}"
+
+
+@contextmanager
+def trace(name: str, **attrs: Any) -> Iterator[Span]:
+    """Root span. Semua span() di dalamnya (termasuk lintas await) jadi anaknya."""
+    root = _start(name, secrets.token_hex(16), None, attrs)
+    spans = [root]
+    tok_spans, tok_cur = _spans.set(spans), _current.set(root)
+    exc: Optional[BaseException] = None
+    try:
+        yield root
+    except BaseException as e:
+        exc = e
+        raise
+    finally:
+        _finish(root, exc)
+        _spans.reset(tok_spans)
+        _current.reset(tok_cur)
+        TRACES.append(spans)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Any]:
+    spans, parent = _spans.get(), _current.get()
+    if spans is None or parent is None:
+        yield NOOP
+        return
+    sp = _start(name, parent.trace_id, parent, attrs)
+    spans.append(sp)
+    tok = _current.set(sp)
+    exc: Optional[BaseException] = None
+    try:
+        yield sp
+    except BaseException as e:
+        exc = e
+        raise
+    finally:
+        _finish(sp, exc)
+        _current.reset(tok)
+
+
+def httpx_hook() -> Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]]:
+    """
+    Callback untuk `extensions={"trace": ...}` di httpx. Mencatat fase koneksi
+    (connect_tcp termasuk DNS, start_tls, kirim header, tunggu response) sebagai
+    span anak dari span aktif. None kalau tidak sedang di dalam trace.
+    """
+    spans, parent = _spans.get(), _current.get()
+    if spans is None or parent is None:
+        return None
+    started: Dict[str, Span] = {}
+
+    async def hook(event_name: str, info: Dict[str, Any]) -> None:
+        base, _, phase = event_name.rpartition(".")
+        if phase == "started":
+            sp = _start(base, parent.trace_id, parent, {})
+            started[base] = sp
+            spans.append(sp)
+        elif phase in ("complete", "failed") and base in started:
+            sp = started.pop(base)
+            _finish(sp, info.get("exception") if phase == "failed" else None)
+
+    return hook
+
+
+def http_extensions() -> Dict[str, Any]:
+    hook = httpx_hook()
+    return {"trace": hook} if hook is not None else {}
+
+
+# -----------------------------------------------------------------------------
+# Export
+# -----------------------------------------------------------------------------
+def recent(limit: int = 50, name: Optional[str] = None) -> List[Dict[str, Any]]:
+    out = []
+    for spans in reversed(TRACES):
+        root = spans[0]
+        if name and root.name != name:
+            continue
+        out.append(
+            {
+                "trace_id": root.trace_id,
+                "name": root.name,
+                "start_ns": root.start_ns,
+                "duration_ms": round(root.duration_ms, 3),
+                "status": root.status,
+                "attributes": root.attributes,
+                "spans": [s.to_dict() for s in spans[1:]],
+            }
+        )
+        if len(out) >= limit:
+            break
+    return out
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+        "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+def to_otlp(limit: int = BUFFER_SIZE) -> Dict[str, Any]:
+    """ExportTraceServiceRequest (OTLP/JSON) untuk dikirim ke collector /v1/traces."""
+    traces = list(TRACES)[-limit:]
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "app.tracing"},
+                        "spans": [_otlp_span(s) for spans in traces for s in spans],
+                    }
+                ],
+            }
+        ]
+    }
@@ -0,0 +1,128 @@
+"""
+Benchmark: kompres per request vs varian terkompresi yang dibangun sekali per versi.
+
+    python -m bench.bench_precompressed [--posko 2000] [--videos 300] [--requests 2000]
+
+Untuk tiap payload publik (posko, video edukasi, dashboard) dicetak:
+- ukuran body identity / gzip / brotli
+- CPU per request kalau gzip dilakukan tiap request (seperti GZipMiddleware)
+- CPU per request dengan precompressed.get_or_build (cache hit)
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import random
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+
+from app import precompressed
+
+
+def _posko(n: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(1)
+    desa = ["Kabanjahe", "Berastagi", "Simpang Empat", "Tiganderket", "Payung", "Naman Teran", "Merdeka"]
+    return [
+        {
+            "id": uuid.UUID(int=rnd.getrandbits(128)).hex[:10],
+            "nama": f"Posko {rnd.choice(desa)} {i}",
+            "alamat": f"Jl. Kiras Bangun No. {i}, Desa {rnd.choice(desa)}, Kab. Karo",
+            "lat": round(3.0 + rnd.random() * 0.4, 5),
+            "lng": round(98.3 + rnd.random() * 0.4, 5),
+            "kapasitas": rnd.randint(20, 800),
+            "telepon": f"08{rnd.randint(10**9, 10**10 - 1)}",
+            "keterangan": rnd.choice([None, "Dekat puskesmas", "Ada dapur umum", "Gedung sekolah"]),
+            "created_at": "2026-01-02T14:05:34.650937+00:00",
+            "updated_at": "2026-01-02T14:05:34.650937+00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def _videos(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": uuid.uuid4().hex[:10],
+            "judul": f"Langkah evakuasi erupsi #{i}",
+            "url": f"https://www.youtube.com/watch?v=video{i:05d}",
+            "keterangan": "Panduan singkat menghadapi hujan abu dan awan panas guguran.",
+            "created_at": "2026-01-02T14:05:34.650937+00:00",
+            "updated_at": "2026-01-02T14:05:34.650937+00:00",
+        }
+        for i in range(n)
+    ]
+
+
+def _dashboard() -> Dict[str, Any]:
+    return {
+        "volcano": {
+            "name": "Sinabung",
+            "source": "MAGMA/PVMBG",
+            "level": "Level II (Waspada)",
+            "report_id": "305337",
+            "title": "Laporan Aktivitas Gunung Sinabung periode 00:00-06:00 WIB",
+            "rekomendasi": [
+                "Masyarakat dan wisatawan tidak melakukan aktivitas dalam radius 3 km dari puncak,",
+                "serta radius sektoral 5 km untuk sektor selatan-tenggara dan 4 km sektor timur-utara.",
+            ]
+            * 3,
+            "radius_info": ["Radius 3 km", "Radius 5 km (sektoral) (area: selatan-tenggara)"],
+        },
+        "earthquake": {
+            "source": "BMKG",
+            "magnitude": "4.2",
+            "wilayah": "Pusat gempa berada di darat 12 km BaratDaya Karo",
+            "nearby": [{"date_time": f"2026-01-0{i % 9 + 1}T01:00:00+00:00", "magnitude": "3.1"} for i in range(20)],
+        },
+    }
+
+
+def _time_per_call(fn: Callable[[], Any], n: int) -> float:
+    t0 = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - t0) / n
+
+
+def run(payloads: Dict[str, Any], requests: int) -> None:
+    header = f"{'payload':<20}{'identity':>10}{'gzip':>10}{'br':>10}{'gzip/req us':>14}{'cached/req us':>15}{'saved':>8}"
+    print(header)
+    print("-" * len(header))
+    for key, data in payloads.items():
+        v = precompressed.get_or_build(key, 1, lambda: data)
+
+        # baseline: serialisasi + gzip di setiap request (level 9 = default GZipMiddleware)
+        per_req = _time_per_call(
+            lambda: gzip.compress(precompressed.encode_json(data), compresslevel=9), max(1, requests // 10)
+        )
+        cached = _time_per_call(lambda: precompressed.get_or_build(key, 1, lambda: data), requests)
+
+        best = v.br or v.gzip or v.identity
+        print(
+            f"{key:<20}{len(v.identity):>10}{len(v.gzip or b''):>10}{len(v.br or b''):>10}"
+            f"{per_req * 1e6:>14.1f}{cached * 1e6:>15.2f}{1 - len(best) / len(v.identity):>8.0%}"
+        )
+    if precompressed.brotli is None:
+        print("\n(brotli tidak terpasang; kolom br kosong)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--posko", type=int, default=2000)
+    ap.add_argument("--videos", type=int, default=300)
+    ap.add_argument("--requests", type=int, default=2000)
+    args = ap.parse_args()
+
+    run(
+        {
+            "evacuation/posts": _posko(args.posko),
+            "education/videos": _videos(args.videos),
+            "sinabung/dashboard": _dashboard(),
+        },
+        args.requests,
+    )
+
+
+if __name__ == "__main__":
+    main()
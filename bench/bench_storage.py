@@ -0,0 +1,363 @@
+"""
+Benchmark: skala penyimpanan posko & video edukasi (JSON store sekarang vs SQLite).
+
+    python -m bench.bench_storage [--sizes 1000,10000,100000,1000000] [--backends json,sqlite]
+                                  [--ops 20] [--budget 10] [--out bench/results]
+
+Untuk tiap ukuran dataset sintetis (jumlah posko = jumlah video = N) dan tiap backend diukur:
+- latensi per operasi (p50/p95/max, ms) dan throughput (op/detik)
+- puncak alokasi memori satu operasi (tracemalloc, dijalankan terpisah dari pengukuran waktu)
+- ukuran di disk per koleksi (SQLite: per tabel lewat dbstat; tanpa dbstat ukuran satu
+  file dilaporkan di kedua koleksi dengan file_scope=combined)
+
+Operasi (nama sama untuk kedua backend supaya bisa dibandingkan):
+- list_posko / create_posko / delete_posko: posko_store (posko.json) vs tabel posko
+- read_videos: storage.read_json("education") cache dingin vs SELECT semua baris
+- read_videos_cached: storage.read_json dengan cache hangat (khusus json)
+- write_videos: ubah satu video -> storage.write_json seluruh list (write-behind,
+  biaya di jalur request) vs UPDATE satu baris
+- flush_videos: storage.flush (tulis ke disk di thread flusher, khusus json)
+
+Hasil ditulis ke <out>/storage-<timestamp>.json dan .csv. Semua file data dibuat di
+direktori sementara; data/ milik app tidak disentuh. Tiap operasi diulang sampai --ops
+kali atau --budget detik habis (minimal sekali), jadi ukuran 1M tetap selesai.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import json
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app import posko_store, storage
+from bench.bench_precompressed import _posko, _videos
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+POSKO_FIELDS = ["id", "nama", "alamat", "lat", "lng", "kapasitas", "telepon", "keterangan", "created_at", "updated_at"]
+VIDEO_FIELDS = ["id", "judul", "url", "keterangan", "created_at", "updated_at"]
+
+
+def _new_posko_args(i: int) -> Dict[str, Any]:
+    return {
+        "nama": f"Posko Baru {i}",
+        "alamat": "Jl. Jamin Ginting, Kabanjahe",
+        "lat": 3.1,
+        "lng": 98.5,
+        "kapasitas": 150,
+        "telepon": "081234567890",
+        "keterangan": None,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Backend
+# -----------------------------------------------------------------------------
+class JsonBackend:
+    """Store yang dipakai app sekarang: posko_store (posko.json) + storage (education.json)."""
+
+    name = "json"
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        posko_store.POSKO_FILE = root / "posko.json"
+        storage.DATA_DIR = root
+        # flusher background jangan ikut menulis di tengah pengukuran; flush diukur sendiri
+        storage.FLUSH_INTERVAL_SECONDS = 3600.0
+        self._i = 0
+
+    def load(self, posko: List[Dict[str, Any]], videos: List[Dict[str, Any]]) -> None:
+        posko_store._save_all(posko)
+        storage.write_json("education", videos, durable=True)
+        storage._cache.clear()
+
+    def files(self) -> Dict[str, int]:
+        return {
+            "posko": posko_store.POSKO_FILE.stat().st_size,
+            "videos": storage._path("education").stat().st_size,
+        }
+
+    def ops(self) -> Dict[str, Callable[[], Any]]:
+        created: List[str] = []
+
+        def create() -> None:
+            self._i += 1
+            created.append(posko_store.create_posko(**_new_posko_args(self._i)).id)
+
+        def delete() -> None:
+            # hapus posko hasil create supaya ukuran dataset tetap N
+            posko_store.delete_posko(created.pop() if created else "tidak-ada")
+
+        def read_cold() -> None:
+            storage._cache.pop("education", None)
+            storage.read_json("education", default=[])
+
+        def write() -> None:
+            items = storage.read_json("education", default=[])
+            items[0]["judul"] = f"Judul diubah {time.perf_counter_ns()}"
+            storage.write_json("education", items)
+
+        def flush() -> None:
+            with storage._lock:
+                storage._dirty.add("education")
+            storage.flush()
+
+        return {
+            "list_posko": posko_store.list_posko,
+            "create_posko": create,
+            "delete_posko": delete,
+            "read_videos": read_cold,
+            "read_videos_cached": lambda: storage.read_json("education", default=[]),
+            "write_videos": write,
+            "flush_videos": flush,
+        }
+
+    def close(self) -> None:
+        storage.flush()
+        storage._cache.clear()
+
+
+class SqliteBackend:
+    """Alternatif: satu file SQLite (WAL), satu baris per posko/video."""
+
+    name = "sqlite"
+
+    def __init__(self, root: Path) -> None:
+        self.path = root / "store.db"
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE posko (id TEXT PRIMARY KEY, nama TEXT, alamat TEXT, lat REAL, lng REAL, kapasitas INTEGER,"
+            " telepon TEXT, keterangan TEXT, created_at TEXT, updated_at TEXT)"
+        )
+        self.conn.execute(
+            "CREATE TABLE videos (id TEXT PRIMARY KEY, judul TEXT, url TEXT, keterangan TEXT, created_at TEXT, updated_at TEXT)"
+        )
+        self._i = 0
+
+    def load(self, posko: List[Dict[str, Any]], videos: List[Dict[str, Any]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO posko VALUES ({','.join('?' * len(POSKO_FIELDS))})",
+                ([p[f] for f in POSKO_FIELDS] for p in posko),
+            )
+            self.conn.executemany(
+                f"INSERT INTO videos VALUES ({','.join('?' * len(VIDEO_FIELDS))})",
+                ([v[f] for f in VIDEO_FIELDS] for v in videos),
+            )
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def files(self) -> Dict[str, int]:
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        try:
+            # ukuran per tabel (termasuk index-nya) dari virtual table dbstat
+            cur = self.conn.execute(
+                "SELECT m.tbl_name, SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name"
+                " GROUP BY m.tbl_name"
+            )
+            sizes = dict(cur.fetchall())
+            return {"posko": sizes.get("posko", 0), "videos": sizes.get("videos", 0)}
+        except sqlite3.OperationalError:
+            # SQLite tanpa dbstat: hanya ukuran satu file untuk dua tabel
+            size = self.path.stat().st_size
+            return {"posko": size, "videos": size, "combined": True}
+
+    def ops(self) -> Dict[str, Callable[[], Any]]:
+        created: List[str] = []
+
+        def list_posko() -> List[posko_store.Posko]:
+            cur = self.conn.execute(f"SELECT {','.join(POSKO_FIELDS)} FROM posko")
+            return [posko_store.Posko(*row) for row in cur]
+
+        def create() -> None:
+            self._i += 1
+            now = datetime.now(timezone.utc).isoformat()
+            p = posko_store.Posko(id=str(uuid.uuid4()), created_at=now, updated_at=now, **_new_posko_args(self._i))
+            with self.conn:
+                self.conn.execute(
+                    f"INSERT INTO posko VALUES ({','.join('?' * len(POSKO_FIELDS))})", [asdict(p)[f] for f in POSKO_FIELDS]
+                )
+            created.append(p.id)
+
+        def delete() -> None:
+            with self.conn:
+                self.conn.execute("DELETE FROM posko WHERE id = ?", (created.pop() if created else "tidak-ada",))
+
+        def read() -> List[Dict[str, Any]]:
+            cur = self.conn.execute(f"SELECT {','.join(VIDEO_FIELDS)} FROM videos")
+            return [dict(zip(VIDEO_FIELDS, row)) for row in cur]
+
+        def write() -> None:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE videos SET judul = ? WHERE rowid = 1", (f"Judul diubah {time.perf_counter_ns()}",)
+                )
+
+        return {
+            "list_posko": list_posko,
+            "create_posko": create,
+            "delete_posko": delete,
+            "read_videos": read,
+            "write_videos": write,
+        }
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+BACKENDS = {"json": JsonBackend, "sqlite": SqliteBackend}
+
+
+# -----------------------------------------------------------------------------
+# Pengukuran
+# -----------------------------------------------------------------------------
+def _measure(fn: Callable[[], Any], ops: int, budget: float) -> List[float]:
+    samples: List[float] = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < ops and (not samples or time.perf_counter() < deadline):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _peak_bytes(fn: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _pct(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def run_case(backend_name: str, size: int, ops: int, budget: float, memory: bool) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix=f"bench-storage-{backend_name}-") as tmp:
+        backend = BACKENDS[backend_name](Path(tmp))
+        t0 = time.perf_counter()
+        backend.load(_posko(size), _videos(size))
+        gc.collect()
+        load_s = time.perf_counter() - t0
+        files = backend.files()
+        try:
+            op_fns = backend.ops()
+            # create dulu lalu delete: delete menghapus posko yang baru dibuat
+            order = ["list_posko", "create_posko", "delete_posko"] + [k for k in op_fns if "videos" in k]
+            for op in order:
+                fn = op_fns[op]
+                samples = _measure(fn, ops, budget)
+                peak = None
+                if memory:
+                    if op == "delete_posko":
+                        op_fns["create_posko"]()  # sediakan satu posko untuk dihapus
+                    peak = _peak_bytes(fn)
+                    if op == "create_posko":
+                        op_fns["delete_posko"]()
+                rows.append(
+                    {
+                        "backend": backend_name,
+                        "rows": size,
+                        "op": op,
+                        "n": len(samples),
+                        "p50_ms": round(statistics.median(samples) * 1000, 3),
+                        "p95_ms": round(_pct(samples, 0.95) * 1000, 3),
+                        "max_ms": round(max(samples) * 1000, 3),
+                        "ops_per_s": round(len(samples) / sum(samples), 2) if sum(samples) else None,
+                        "peak_mem_mb": round(peak / 2**20, 2) if peak is not None else None,
+                        "file_bytes": files["posko" if op.endswith("posko") else "videos"],
+                        "file_scope": "combined" if files.get("combined") else "collection",
+                        "load_s": round(load_s, 2),
+                    }
+                )
+                _print_row(rows[-1])
+        finally:
+            backend.close()
+    return rows
+
+
+def _print_header() -> None:
+    header = (
+        f"{'backend':<8}{'rows':>9}  {'op':<20}{'n':>4}{'p50 ms':>11}{'p95 ms':>11}{'op/s':>11}"
+        f"{'peak MB':>10}{'file MB':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+
+
+def _print_row(r: Dict[str, Any]) -> None:
+    peak = "-" if r["peak_mem_mb"] is None else f"{r['peak_mem_mb']:.1f}"
+    print(
+        f"{r['backend']:<8}{r['rows']:>9}  {r['op']:<20}{r['n']:>4}{r['p50_ms']:>11.3f}{r['p95_ms']:>11.3f}"
+        f"{r['ops_per_s'] or 0:>11.1f}{peak:>10}{r['file_bytes'] / 2**20:>10.1f}",
+        flush=True,
+    )
+
+
+def write_results(rows: List[Dict[str, Any]], out_dir: Path, meta: Dict[str, Any]) -> Optional[Path]:
+    if not rows:
+        return None
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = out_dir / f"storage-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+    stem.with_suffix(".json").write_text(json.dumps({"meta": meta, "results": rows}, indent=2), encoding="utf-8")
+    with open(stem.with_suffix(".csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+    return stem
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="daftar ukuran dataset, pisah koma")
+    ap.add_argument("--backends", default="json,sqlite", help=f"pilihan: {','.join(BACKENDS)}")
+    ap.add_argument("--ops", type=int, default=20, help="ulangan maksimum per operasi")
+    ap.add_argument("--budget", type=float, default=10.0, help="batas detik per operasi (minimal 1 ulangan)")
+    ap.add_argument("--no-memory", action="store_true", help="lewati pengukuran tracemalloc (lebih cepat)")
+    ap.add_argument("--out", type=Path, default=RESULTS_DIR)
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        ap.error(f"backend tidak dikenal: {', '.join(sorted(unknown))}")
+
+    _print_header()
+    rows: List[Dict[str, Any]] = []
+    for size in sizes:
+        for name in backends:
+            rows.extend(run_case(name, size, args.ops, args.budget, not args.no_memory))
+
+    meta = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "sizes": sizes,
+        "backends": backends,
+        "ops": args.ops,
+        "budget_s": args.budget,
+        "sqlite_version": sqlite3.sqlite_version,
+    }
+    stem = write_results(rows, args.out, meta)
+    if stem is not None:
+        print(f"\nHasil: {stem}.json, {stem}.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# jalankan dari mana saja: `python -m pytest` atau `pytest tests/`
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app import admission
+
+
+@pytest.fixture
+def mw(monkeypatch):
+    monkeypatch.setitem(admission.RATES, admission.CRITICAL, (1.0, 2.0))
+    monkeypatch.setattr(admission, "SHARED_IP_FACTOR", 3.0)
+    return admission.AdmissionMiddleware(app=None)
+
+
+def _scope(ip="10.0.0.1", device=None, fwd=None):
+    headers = []
+    if device:
+        headers.append((b"x-device-id", device.encode()))
+    if fwd:
+        headers.append((b"x-forwarded-for", fwd.encode()))
+    return {"type": "http", "path": "/evacuation/posts", "client": (ip, 1234), "headers": headers}
+
+
+def test_classify():
+    assert admission.classify("/emergency/status") == admission.CRITICAL
+    assert admission.classify("/sinabung/dashboard") == admission.LOW
+    assert admission.classify("/admin/posts") == admission.NORMAL
+    # check-in lapangan punya kelas sendiri (tidak pernah dibuang)
+    assert admission.classify("/admin/occupancy/p1/checkin") == admission.FIELD
+
+
+def test_key_is_peer_ip_not_forwarded_header(mw, monkeypatch):
+    monkeypatch.setattr(admission, "TRUST_PROXY", False)
+    assert mw._client_key(_scope(fwd="1.2.3.4")) == ("10.0.0.1", None)
+    monkeypatch.setattr(admission, "TRUST_PROXY", True)
+    assert mw._client_key(_scope(fwd="1.2.3.4, 10.0.0.9")) == ("1.2.3.4", None)
+
+
+def test_ip_bucket_limits_after_burst(mw):
+    cls = admission.CRITICAL
+    assert [mw._take(_scope(), cls) == 0 for _ in range(3)] == [True, True, False]
+    # IP lain punya bucket sendiri
+    assert mw._take(_scope(ip="10.0.0.2"), cls) == 0
+
+
+def test_rotating_device_id_is_capped_by_shared_ip_bucket(mw):
+    cls = admission.CRITICAL
+    admitted = sum(mw._take(_scope(device=f"dev-{i}"), cls) == 0 for i in range(50))
+    assert admitted == 6  # burst 2 x faktor 3
+
+
+def test_eviction_drops_least_recent_only(mw, monkeypatch):
+    monkeypatch.setattr(admission, "MAX_CLIENTS", 3)
+    b = admission._Buckets()
+    cls = admission.CRITICAL
+    b.take("b", cls, 0.0)
+    b.take("c", cls, 0.0)
+    assert b.take("a", cls, 0.0) == 0 and b.take("a", cls, 0.0) == 0
+    assert b.take("a", cls, 0.0) > 0  # a kehabisan token
+
+    b.take("d", cls, 0.0)  # penuh -> buang "b" (paling lama tidak aktif), bukan semua
+    assert len(b) == 3
+    assert b.take("a", cls, 0.0) > 0  # batas a tidak ter-reset
+
+
+def test_rejected_by_shared_bucket_keeps_device_quota(mw):
+    cls = admission.CRITICAL
+    b = mw.buckets
+    b.take("10.0.0.1|shared", cls, 0.0, 1.0)
+    b.take("10.0.0.1|shared", cls, 0.0, 1.0)  # bucket bersama habis
+    clients = [("10.0.0.1|dev:a", 1.0), ("10.0.0.1|shared", 1.0)]
+    assert b.take_all(clients, cls, 0.0) > 0
+    assert b._b[("10.0.0.1|dev:a", cls)][0] == 2.0  # burst device utuh
+
+
+def _call(mw, path, headers=()):
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(msg):
+        sent.append(msg)
+
+    mw.app = app
+    asyncio.run(mw({"type": "http", "path": path, "client": ("10.0.0.1", 1), "headers": list(headers)}, None, send))
+    return sent[0]["status"]
+
+
+def test_route_planner_is_not_critical_and_capped(mw):
+    assert admission.classify("/evacuation/route") == admission.NORMAL
+    assert admission.classify("/evacuation/posts") == admission.CRITICAL
+
+    prefix, cap = admission.PATH_CONCURRENCY[0]
+    assert prefix == "/evacuation/route" and cap > 0
+    assert _call(mw, "/evacuation/route") == 200
+    assert mw.path_inflight[prefix] == 0
+
+    mw.path_inflight[prefix] = cap  # semua slot rute sedang dipakai
+    assert _call(mw, "/evacuation/route") == 429
+    assert _call(mw, "/evacuation/posts") == 200
+
+
+def test_many_clients_behind_one_ip_reach_emergency_status():
+    # default tanpa patch RATES: ribuan HP di balik satu CGNAT saat alarm
+    mw = admission.AdmissionMiddleware(app=None)
+    statuses = [_call(mw, "/emergency/status") for _ in range(500)]
+    statuses += [_call(mw, "/emergency/status", [(b"x-device-id", f"hp-{i}".encode())]) for i in range(500)]
+    assert set(statuses) == {200}
@@ -0,0 +1,51 @@
+import pytest
+
+from app import allocation
+
+np = pytest.importorskip("numpy")
+
+
+def _check(D, demand, cap):
+    cap0 = cap.copy()
+    flows, left, cost_greedy, cost = allocation._solve(D, demand.copy(), cap)
+    nv, npk = D.shape
+    assigned = np.zeros(nv, dtype=np.int64)
+    used = np.zeros(npk, dtype=np.int64)
+    for (r, c), m in flows.items():
+        assert m >= 0
+        assigned[r] += m
+        used[c] += m
+    # kapasitas tidak pernah terlampaui, dan sisa kapasitas konsisten dengan flows
+    assert (used <= cap0).all()
+    assert (cap == cap0 - used).all() and (cap >= 0).all()
+    # orang tidak hilang dan tidak bertambah
+    assert (left >= 0).all()
+    assert (assigned + left == demand).all()
+    # yang tersisa hanya kalau kapasitas memang habis
+    assert left.sum() == max(0, demand.sum() - cap0.sum())
+    assert cost <= cost_greedy + 1e-9
+    return flows, left
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("shape", [(30, 8), (50, 40)])
+def test_solve_invariants(seed, shape):
+    rng = np.random.default_rng(seed)
+    nv, npk = shape
+    D = rng.uniform(0.5, 30.0, size=shape)
+    demand = rng.integers(0, 300, size=nv)
+    cap = rng.integers(0, 400, size=npk)
+    _check(D, demand, cap)
+
+
+def test_solve_small_k_falls_back_to_all_posko(monkeypatch):
+    # K posko terdekat penuh -> desa tetap dapat posko yang lebih jauh
+    monkeypatch.setattr(allocation, "NEAREST_K", 1)
+    D = np.array([[1.0, 5.0, 9.0], [1.0, 2.0, 9.0]])
+    flows, left = _check(D, np.array([10, 10]), np.array([5, 5, 100]))
+    assert left.tolist() == [0, 0]
+
+
+def test_solve_empty():
+    flows, left, _, cost = allocation._solve(np.zeros((0, 3)), np.zeros(0, dtype=np.int64), np.array([1, 2, 3]))
+    assert not flows and cost == 0.0
@@ -0,0 +1,118 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app import devices, geo
+
+LAT0, LNG0 = geo.SINABUNG_LAT, geo.SINABUNG_LNG
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    reg = devices.DeviceRegistry(tmp_path / "devices.db")
+    monkeypatch.setattr(devices, "REGISTRY", reg)
+    yield reg
+    if reg._conn is not None:
+        reg._conn.close()
+
+
+@pytest.fixture(params=["numpy", "python"])
+def impl(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(devices, "np", None)
+    elif devices.np is None:
+        pytest.skip("numpy tidak terpasang")
+    return request.param
+
+
+def test_within_radius_edge(registry, impl):
+    # koordinat disimpan 2 desimal; pakai titik yang sudah bulat supaya jaraknya pasti
+    lat, lng = round(LAT0 + 0.09, 2), round(LNG0, 2)
+    registry.register("north", lat, lng)
+    d = geo.haversine_km(round(LAT0, 2), lng, lat, lng)
+    assert registry.within(round(LAT0, 2), lng, d + 0.01) == ["north"]
+    assert registry.within(round(LAT0, 2), lng, d - 0.01) == []
+
+
+def test_within_excludes_bbox_corner(registry, impl):
+    registry.register("corner", 0.07, 0.07)  # di dalam bbox 10 km, tapi ~11 km dari pusat
+    registry.register("east", 0.0, 0.08)  # ~8.9 km
+    assert registry.within(0.0, 0.0, 10.0) == ["east"]
+
+
+def test_within_scales_longitude_by_latitude(registry, impl):
+    # di lintang 60°, 0.18° bujur ~ 10 km; bbox tanpa cos(lat) (0.09°) akan membuangnya
+    registry.register("far-east", 60.0, 0.18)
+    d = geo.haversine_km(60.0, 0.0, 60.0, 0.18)
+    assert registry.within(60.0, 0.0, d + 0.1) == ["far-east"]
+    assert registry.within(60.0, 0.0, d - 0.1) == []
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    def send_multicast(tokens, title, body, data=None, **kwargs):
+        calls.append(list(tokens))
+        if tokens[0] == "boom-0":
+            raise RuntimeError("FCM tidak bisa dihubungi")
+        # send_multicast asli hanya mengembalikan token yang pasti mati sebagai invalid
+        dead = [t for t in tokens if t.startswith("dead")]
+        return len(tokens) - len(dead), len(dead), dead
+
+    monkeypatch.setitem(sys.modules, "app.notifier", SimpleNamespace(send_multicast=send_multicast))
+    monkeypatch.setattr(devices, "FANOUTS", devices.deque(maxlen=50))
+    return calls
+
+
+def test_fanout_batches_and_prunes(registry, sent):
+    tokens = [f"tok-{i}" for i in range(1200)] + ["dead-1", "dead-2", "dead-3"]
+    for t in ("tok-1", "dead-1", "dead-2", "dead-3"):
+        registry.register(t, LAT0, LNG0)
+
+    report = devices.fanout(tokens, "Awas", "Isi")
+
+    assert sorted(len(c) for c in sent) == [203, 500, 500]
+    assert [b["size"] for b in report["batches"]] == [500, 500, 203]
+    assert report["batches"][2] == {"batch": 2, "size": 203, "success": 200, "failure": 3, "invalid": 3}
+    assert (report["success"], report["failure"], report["pruned"]) == (1200, 3, 3)
+    assert registry.within(LAT0, LNG0, 1) == ["tok-1"]
+    assert devices.FANOUTS[0] is report
+
+
+def test_fanout_failed_batch_is_recorded_not_pruned(registry, sent):
+    registry.register("boom-0", LAT0, LNG0)
+    tokens = ["boom-0"] + [f"dead-{i}" for i in range(499)] + ["tok-x"]
+    report = devices.fanout(tokens, "Awas", "Isi")
+
+    first, second = report["batches"]
+    assert first["size"] == 500 and "RuntimeError" in first["error"]
+    assert second == {"batch": 1, "size": 1, "success": 1, "failure": 0, "invalid": 0}
+    assert report["failure"] == 500 and report["pruned"] == 0
+    assert len(registry) == 1
+
+
+@pytest.mark.parametrize(
+    "fallback, targeted, expected",
+    [
+        (True, None, True),
+        (True, 0, True),  # 0 perangkat di radius: app lama tetap dapat lewat topic
+        (True, 12, True),
+        (False, None, True),  # geofence mati / registry kosong
+        (False, 0, False),
+        (False, 12, False),
+    ],
+)
+def test_send_topic_too(monkeypatch, fallback, targeted, expected):
+    monkeypatch.setattr(devices, "TOPIC_FALLBACK", fallback)
+    assert devices.send_topic_too(targeted) is expected
+
+
+def test_geofence_send_disabled_or_empty_returns_none(registry, monkeypatch):
+    monkeypatch.setattr(devices, "GEOFENCE_ENABLED", False)
+    assert devices.geofence_send(LAT0, LNG0, 10, "t", "b") is None
+    monkeypatch.setattr(devices, "GEOFENCE_ENABLED", True)
+    assert devices.geofence_send(LAT0, LNG0, 10, "t", "b") is None  # registry kosong
+    registry.register("far", LAT0 + 1, LNG0)
+    assert devices.geofence_send(LAT0, LNG0, 10, "t", "b") == 0
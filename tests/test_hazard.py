@@ -0,0 +1,63 @@
+from app import hazard
+from app.hazard import Circle, Wedge, _destination
+
+# kalimat rekomendasi seperti yang ditulis di laporan MAGMA
+MAGMA = [
+    "Masyarakat dan wisatawan agar tidak melakukan aktivitas di desa-desa yang sudah direlokasi, "
+    "serta lokasi di dalam radius radial 3 km dari puncak Gunung Sinabung, serta radius sektoral "
+    "5 km untuk sektor selatan-timur, dan 4 km untuk sektor timur-utara.",
+    "Masyarakat tidak melakukan aktivitas dalam radius 2 km dari puncak.",
+]
+
+
+def _at(geom, bearing, km):
+    lat, lng = _destination(geom.lat, geom.lng, bearing, km)
+    return geom.contains(lat, lng)
+
+
+def test_parse_magma_sectors():
+    g = hazard.parse(MAGMA)
+    circles = [z for z in g.zones if isinstance(z, Circle)]
+    wedges = {z.sector: z for z in g.zones if isinstance(z, Wedge)}
+    # lingkaran terbesar 3 km; "5 km" sektoral tidak ikut jadi lingkaran
+    assert [c.radius_km for c in circles] == [3.0]
+    assert set(wedges) == {"selatan-timur", "timur-utara"}
+    assert wedges["selatan-timur"].radius_km == 5.0
+    assert g.max_radius_km == 5.0
+
+
+def test_contains_follows_wedges():
+    g = hazard.parse(MAGMA)
+    assert _at(g, 300, 2.5)  # dalam lingkaran 3 km, arah mana pun
+    assert _at(g, 135, 4.5)  # tenggara, dalam sektor selatan-timur 5 km
+    assert not _at(g, 135, 5.5)
+    assert not _at(g, 270, 4.5)  # barat: di luar lingkaran dan di luar sektor
+    assert _at(g, 45, 3.5)  # timur laut, sektor timur-utara 4 km
+    assert not _at(g, 45, 4.5)
+
+
+def test_dalam_radius_with_sector_is_wedge():
+    g = hazard.parse(["Tidak beraktivitas dalam radius 7 km sektor barat daya."])
+    assert len(g.zones) == 1
+    (z,) = g.zones
+    assert isinstance(z, Wedge) and z.sector == "baratdaya" and z.radius_km == 7.0
+    assert _at(g, 225, 6)
+    assert not _at(g, 45, 6)
+
+
+def test_dalam_radius_plain_is_circle():
+    g = hazard.parse(["Masyarakat tidak melakukan aktivitas dalam radius 7 km dari puncak."])
+    assert g.zones == (Circle(7.0),)
+    assert g.radius_info == ("Radius 7 km",)
+
+
+def test_radius_info_legacy_strings():
+    g = hazard.parse(["radius sektoral 6,5 km sektoral utara-timur"])
+    assert g.radius_info == ("Radius 6.5 km (sektoral) (area: utara-timur)",)
+
+
+def test_parse_without_radius_is_empty():
+    g = hazard.parse(["Masyarakat agar tetap tenang."])
+    assert not g
+    assert g.max_radius_km is None
+    assert g.radius_info == ()
@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from app import history_store, magma
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_DB", tmp_path / "history.db")
+    monkeypatch.setattr(history_store, "_conn", None)
+    yield history_store
+    if history_store._conn is not None:
+        history_store._conn.close()
+
+
+def _report(report_id, reported_at, level):
+    return {"report_id": report_id, "reported_at": reported_at, "level": level, "title": "t", "rekomendasi": []}
+
+
+def test_report_bucketed_by_event_time_not_fetch_time(store):
+    # diambil hari ini (mis. setelah restart), tapi laporannya periode 2024-06-14
+    assert store.record_report(_report("r1", "2024-06-14T23:00:00+00:00", "Level II (Waspada)"))
+    assert not store.record_report(_report("r1", "2024-06-14T23:00:00+00:00", "Level II (Waspada)"))
+
+    (row,) = store.iter_range("reports")
+    assert row["reported_at"] == "2024-06-14T23:00:00+00:00"
+    assert row["fetched_at"][:10] != "2024-06-14"
+    assert [d["day"] for d in store.daily_aggregates()] == ["2024-06-14"]
+
+
+def test_daily_aggregates_latest_level_per_day(store):
+    store.record_report(_report("a", "2024-06-14T01:00:00+00:00", "Level II (Waspada)"))
+    store.record_report(_report("b", "2024-06-14T13:00:00+00:00", "Level III (Siaga)"))
+    store.record_report(_report("c", "2024-06-14T07:00:00+00:00", "Level IV (Awas)"))
+    store.record_report(_report("d", "2024-06-15T01:00:00+00:00", "Level II (Waspada)"))
+    store.record_quakes(
+        [
+            {"date_time": "2024-06-14T05:00:00+00:00", "magnitude": "3.1"},
+            {"date_time": "2024-06-14T06:00:00+00:00", "magnitude": "4,2"},
+        ]
+    )
+
+    days = store.daily_aggregates()
+    assert days == [
+        {"day": "2024-06-14", "quakes": 2, "magnitude_max": 4.2, "reports": 3, "level": "Level III (Siaga)"},
+        {"day": "2024-06-15", "quakes": 0, "magnitude_max": None, "reports": 1, "level": "Level II (Waspada)"},
+    ]
+    t0 = history_store.parse_time("2024-06-15")
+    assert [d["day"] for d in store.daily_aggregates(start=t0)] == ["2024-06-15"]
+
+
+def test_report_without_time_uses_fetch_time(store):
+    store.record_report(_report("x", None, "Level II (Waspada)"))
+    store.record_report(_report("y", "bukan tanggal", "Level II (Waspada)"))
+    rows = list(store.iter_range("reports"))
+    assert [r["reported_at"] for r in rows] == [None, None]
+    assert len(store.daily_aggregates()) == 1
+
+
+def test_old_db_gets_reported_at_column(store):
+    conn = sqlite3.connect(str(store.HISTORY_DB))
+    conn.execute(
+        "CREATE TABLE magma_reports (report_id TEXT PRIMARY KEY, ts REAL NOT NULL, fetched_at TEXT NOT NULL,"
+        " level TEXT, title TEXT, report_url TEXT, rekomendasi TEXT)"
+    )
+    conn.execute("INSERT INTO magma_reports VALUES ('old', 0, '1970-01-01T00:00:00+00:00', 'L', 't', 'u', '[]')")
+    conn.commit()
+    conn.close()
+
+    store.record_report(_report("new", "2024-06-14T01:00:00+00:00", "L"))
+    assert [r["report_id"] for r in store.iter_range("reports")] == ["old", "new"]
+
+
+@pytest.mark.parametrize(
+    "title, expected",
+    [
+        ("Laporan Aktivitas Gunung Sinabung periode 2024-06-14T06:00:00+00:00 (replay)", "2024-06-14T06:00:00+00:00"),
+        ("Gunung Api Sinabung, periode 2024-06-14 06:00", "2024-06-14T06:00:00+07:00"),
+        ("Sinabung, 14 Juni 2024, periode 00:00-06:00 WIB", "2024-06-14T06:00:00+07:00"),
+        ("Laporan Sinabung periode 18:00-24:00 WIB tanggal 3 Desember 2023", "2023-12-04T00:00:00+07:00"),
+        ("Laporan Sinabung tanggal 3 Desember 2023", "2023-12-03T12:00:00+07:00"),
+        ("Laporan Sinabung 2024-06-14", "2024-06-14T12:00:00+07:00"),
+        ("Laporan Sinabung periode pengamatan", None),
+        (None, None),
+    ],
+)
+def test_parse_reported_at(title, expected):
+    assert magma.parse_reported_at(title) == expected
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+
+from firebase_admin import exceptions, messaging  # noqa: E402
+
+from app import notifier  # noqa: E402
+
+
+def _resp(results):
+    responses = [SimpleNamespace(success=e is None, exception=e) for e in results]
+    ok = sum(r.success for r in responses)
+    return SimpleNamespace(success_count=ok, failure_count=len(responses) - ok, responses=responses)
+
+
+@pytest.fixture
+def send(monkeypatch):
+    monkeypatch.setattr(notifier, "init_firebase", lambda: None)
+
+    def run(results):
+        monkeypatch.setattr(messaging, "send_each_for_multicast", lambda msg: _resp(results))
+        tokens = [f"t{i}" for i in range(len(results))]
+        return notifier.send_multicast(tokens, "judul", "isi")
+
+    return run
+
+
+def test_prunes_only_dead_tokens(send):
+    ok, failed, invalid = send(
+        [
+            None,
+            messaging.UnregisteredError("unregistered"),
+            messaging.SenderIdMismatchError("mismatch"),
+            exceptions.UnavailableError("coba lagi"),
+            exceptions.InternalError("server"),
+            messaging.QuotaExceededError("kuota"),
+        ]
+    )
+    assert (ok, failed) == (1, 5)
+    assert invalid == ["t1", "t2"]
+
+
+def test_invalid_argument_pruned_only_if_payload_worked(send):
+    # ada token lain yang sukses -> payload benar, token-nya yang rusak
+    assert send([None, exceptions.InvalidArgumentError("bad token")])[2] == ["t1"]
+    # semua gagal -> bisa jadi payload yang salah; jangan buang token
+    assert send([exceptions.InvalidArgumentError("payload"), exceptions.InvalidArgumentError("payload")])[2] == []
+    assert send([exceptions.InvalidArgumentError("payload"), messaging.UnregisteredError("x")])[2] == ["t1"]
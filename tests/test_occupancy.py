@@ -0,0 +1,42 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import occupancy, posko_store
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    calls = []
+
+    def list_posko():
+        calls.append(1)
+        time.sleep(0.05)  # beri kesempatan thread lain masuk ke load bersamaan
+        return [SimpleNamespace(id="p1", nama="Posko 1", kapasitas=3)]
+
+    monkeypatch.setattr(posko_store, "list_posko", list_posko)
+    monkeypatch.setattr(occupancy, "read_json", lambda name, default=None: {"p1": 2})
+    monkeypatch.setattr(occupancy, "write_json", lambda name, data: None)
+    c = occupancy.OccupancyCounters()
+    yield c, calls
+    c._stop.set()
+
+
+def test_ensure_loaded_once_under_concurrency(counters):
+    c, calls = counters
+    threads = [threading.Thread(target=c.ensure_loaded) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert c.totals() == {"posko": 1, "terisi": 2, "kapasitas": 3, "sisa": 1}
+
+
+def test_apply_never_negative(counters):
+    c, _ = counters
+    assert c.apply("p1", -10)["terisi"] == 0
+    assert c.apply("p1", 5)["penuh"] is True
+    assert c.totals()["sisa"] == 0
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import bmkg, geo, history_store, polling, quake_ingest, snapshot
+
+
+@pytest.fixture
+def feed(tmp_path, monkeypatch):
+    monkeypatch.setattr(history_store, "HISTORY_DB", tmp_path / "history.db")
+    monkeypatch.setattr(history_store, "_conn", None)
+    monkeypatch.setattr(snapshot, "save", lambda *a, **kw: None)
+    monkeypatch.setattr(quake_ingest, "send_to_topic", None)
+    monkeypatch.setattr(polling.breaker("bmkg"), "allow", lambda: True)
+    quakes = []
+
+    async def latest(url):
+        return dict(quakes[0])
+
+    async def recent(url):
+        return [dict(q) for q in quakes]
+
+    monkeypatch.setattr(bmkg, "fetch_latest_quake", latest)
+    monkeypatch.setattr(bmkg, "fetch_quake_list", recent)
+    yield quakes
+    if history_store._conn is not None:
+        history_store._conn.close()
+
+
+def _quake(minutes_ago, date_time=None):
+    t = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    return {
+        "date_time": date_time or t.isoformat(timespec="seconds"),
+        "magnitude": "5.1",
+        "lat": geo.SINABUNG_LAT + 0.1,
+        "lng": geo.SINABUNG_LNG,
+        "wilayah": "Karo",
+    }
+
+
+def _run(ingester):
+    return asyncio.run(ingester.ingest_once())
+
+
+def test_restart_does_not_realert(feed):
+    feed.append(_quake(5))
+    first = quake_ingest.QuakeIngester()
+    assert _run(first) == 1
+    assert len(first.alerts) == 1
+
+    # proses baru (seen kosong), gempa yang sama masih di feed
+    restarted = quake_ingest.QuakeIngester()
+    _run(restarted)
+    assert len(restarted.alerts) == 0
+    assert len(restarted.nearby) == 1  # tetap tampil di dashboard
+
+    feed.insert(0, _quake(1))
+    _run(restarted)
+    assert len(restarted.alerts) == 1
+
+
+def test_unknown_or_old_age_is_not_alerted(feed):
+    feed.extend([_quake(0, date_time="kemarin sore"), _quake(quake_ingest.ALERT_MAX_AGE_MINUTES + 5)])
+    ingester = quake_ingest.QuakeIngester()
+    _run(ingester)
+    assert len(ingester.alerts) == 0
+
+
+def test_history_failure_still_alerts(feed, monkeypatch):
+    def broken(quakes):
+        raise OSError("disk penuh")
+
+    monkeypatch.setattr(history_store, "insert_quakes", broken)
+    feed.append(_quake(2))
+    ingester = quake_ingest.QuakeIngester()
+    _run(ingester)
+    assert len(ingester.alerts) == 1
@@ -0,0 +1,189 @@
+import heapq
+import json
+import os
+import random
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import geo, hazard, occupancy, posko_store, routing, routing_api
+from app.posko_store import Posko
+
+LAT0, LNG0 = geo.SINABUNG_LAT, geo.SINABUNG_LNG
+STEP = 0.01  # ~1.1 km
+N = 6  # grid (2N+1) x (2N+1) berpusat di kawah
+
+
+def _pt(i, j):
+    return [round(LNG0 + j * STEP, 7), round(LAT0 + i * STEP, 7)]
+
+
+def _roads(seed=1):
+    rng = random.Random(seed)
+    feats = []
+    for i in range(-N, N + 1):
+        for j in range(-N, N + 1):
+            for di, dj in ((0, 1), (1, 0)):
+                if abs(i + di) <= N and abs(j + dj) <= N:
+                    feats.append(
+                        {
+                            "type": "Feature",
+                            "properties": {"highway": "residential", "maxspeed": str(rng.randint(10, 80))},
+                            "geometry": {"type": "LineString", "coordinates": [_pt(i, j), _pt(i + di, j + dj)]},
+                        }
+                    )
+    return {"type": "FeatureCollection", "features": feats}
+
+
+class _Counters:
+    def __init__(self):
+        self.rows = {}
+
+    def all(self):
+        return list(self.rows.values())
+
+
+POSKO = [
+    Posko("east", "Posko Timur", "", LAT0, LNG0 + 5 * STEP, 100),
+    Posko("north", "Posko Utara", "", LAT0 + 5 * STEP, LNG0, 100),
+    Posko("south", "Posko Selatan", "", LAT0 - 6 * STEP, LNG0 - 6 * STEP, 100),
+]
+
+
+@pytest.fixture
+def graph(tmp_path, monkeypatch):
+    path = tmp_path / "roads.geojson"
+    path.write_text(json.dumps(_roads()), encoding="utf-8")
+    monkeypatch.setattr(routing, "ROADS_FILE", path)
+    monkeypatch.setattr(routing, "_graph", None)
+    monkeypatch.setattr(routing, "_graph_mtime", None)
+    monkeypatch.setattr(routing, "_builder", None)
+    assert routing.rebuild_if_changed()
+    return routing.get_graph()
+
+
+@pytest.fixture
+def counters(graph, monkeypatch):
+    c = _Counters()
+    monkeypatch.setattr(occupancy, "COUNTERS", c)
+    monkeypatch.setattr(posko_store, "list_posko", lambda: list(POSKO))
+    return c
+
+
+def _node(g, i, j):
+    lng, lat = _pt(i, j)
+    return g.nearest_node(lat, lng)[0]
+
+
+def _dijkstra(g, src, targets, blocked):
+    """Dijkstra polos dengan aturan zona yang sama dengan RoadGraph.route."""
+    dist = {src: 0.0}
+    heap = [(0.0, src)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if u in targets:
+            return d
+        for v, sec, _ in g.adj[u]:
+            if blocked is not None and blocked[v] and g.crater_km[v] <= g.crater_km[u]:
+                continue
+            if d + sec < dist.get(v, float("inf")):
+                dist[v] = d + sec
+                heapq.heappush(heap, (d + sec, v))
+    return None
+
+
+HAZARDS = [
+    None,
+    hazard.HazardGeometry.circle(2.5),
+    hazard.parse(["radius 1 km dari puncak, serta 5 km untuk sektor timur-tenggara"]),
+]
+
+
+@pytest.mark.parametrize("hz", HAZARDS)
+def test_alt_equals_dijkstra(graph, hz):
+    rng = random.Random(7)
+    nodes = range(len(graph))
+    blocked = graph.blocked(hz)
+    for _ in range(40):
+        src = rng.choice(nodes)
+        targets = set(rng.sample(nodes, 3))
+        found = graph.route(src, targets, hz)
+        expected = _dijkstra(graph, src, targets, blocked)
+        if expected is None:
+            assert found is None
+        else:
+            assert found is not None and found[1] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("hz", HAZARDS[1:])
+def test_route_never_enters_zone_unless_moving_away(graph, hz):
+    blocked = graph.blocked(hz)
+    assert any(blocked)
+    # dari barat ke timur (lewat/di sekitar kawah), dan dari titik di dalam zona ke luar
+    for src, dst in (((0, -N), (0, N)), ((0, 1), (0, N)), ((-N, 0), (N, 0))):
+        found = graph.route(_node(graph, *src), [_node(graph, *dst)], hz)
+        assert found is not None
+        path = found[3]
+        for u, v in zip(path, path[1:]):
+            if blocked[v]:
+                assert graph.crater_km[v] > graph.crater_km[u]
+
+
+def test_full_posko_is_skipped(counters):
+    lat, lng = LAT0, LNG0 + 6 * STEP
+    first = routing.nearest_shelter_route(lat, lng)["posko"]["id"]
+    assert first == "east"
+    counters.rows["east"] = {"posko_id": "east", "sisa": 0}
+    assert routing.nearest_shelter_route(lat, lng)["posko"]["id"] != "east"
+    # masih ada 3 tempat: cukup untuk 3 orang, tidak untuk 4
+    counters.rows["east"] = {"posko_id": "east", "sisa": 3}
+    assert routing.nearest_shelter_route(lat, lng, people=3)["posko"]["id"] == "east"
+    assert routing.nearest_shelter_route(lat, lng, people=4)["posko"]["id"] != "east"
+
+
+def test_posko_inside_hazard_is_skipped(counters):
+    r = routing.nearest_shelter_route(LAT0, LNG0 + 6 * STEP, hazard=hazard.HazardGeometry.circle(6))
+    assert r["posko"]["id"] == "south"
+
+
+@pytest.fixture
+def client(counters):
+    app = FastAPI()
+    app.include_router(routing_api.router)
+    return TestClient(app)
+
+
+def test_api_posko_id_and_errors(client):
+    base = {"lat": LAT0, "lng": LNG0 + 6 * STEP, "radius_km": 2}
+    r = client.get("/evacuation/route", params={**base, "posko_id": "north"})
+    assert r.status_code == 200 and r.json()["posko"]["id"] == "north"
+    assert r.json()["geometry"]["type"] == "LineString"
+
+    assert client.get("/evacuation/route", params={**base, "posko_id": "nope"}).status_code == 404
+    far = {"lat": LAT0 + 1, "lng": LNG0, "radius_km": 2}
+    assert client.get("/evacuation/route", params=far).status_code == 422
+
+
+def test_api_503_until_graph_is_built(client, monkeypatch):
+    monkeypatch.setattr(routing, "_graph", None)
+    monkeypatch.setattr(routing, "_graph_mtime", None)
+    with routing._lock:  # build sedang berjalan: request tidak ikut menunggu
+        r = client.get("/evacuation/route", params={"lat": LAT0, "lng": LNG0, "radius_km": 2})
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == str(routing.RETRY_AFTER_SECONDS)
+    routing._builder.join(timeout=30)
+    assert routing.get_graph() is not None
+
+
+def test_file_change_keeps_serving_old_graph(graph):
+    path = routing.ROADS_FILE
+    path.write_text(json.dumps(_roads(seed=2)), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    with routing._lock:
+        assert routing.get_graph() is graph  # tidak menunggu build baru
+    routing._builder.join(timeout=30)
+    assert routing.get_graph() is not graph
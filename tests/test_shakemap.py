@@ -0,0 +1,85 @@
+import asyncio
+import struct
+import zlib
+
+import httpx
+import pytest
+
+from app import http_client, shakemap
+
+
+def _png(w=2, h=2):
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    raw = b"".join(b"\x00" + b"\xff\x00\x00" * w for _ in range(h))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+PNG = _png()
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    served = {}
+    hits = []
+
+    def handler(request):
+        name = request.url.path.rsplit("/", 1)[-1]
+        hits.append(name)
+        body, ctype = served[name]
+        return httpx.Response(200, content=body, headers={"content-type": ctype})
+
+    http_client.set_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    cache = shakemap.ShakemapCache(tmp_path / "shakemap", max_bytes=10_000)
+    yield cache, served, hits
+    http_client.set_client(None)
+
+
+def test_html_error_page_is_not_cached(upstream):
+    cache, served, _ = upstream
+    served["a.png"] = (b"<html>maintenance</html>", "text/html")
+    served["b.png"] = (b"<html>maintenance</html>", "image/png")  # Content-Type bohong
+
+    for name in ("a.png", "b.png"):
+        with pytest.raises(shakemap.InvalidImage):
+            asyncio.run(cache.get(name))
+        assert name not in cache
+        assert not (cache.dir / name).exists()
+
+
+def test_image_cached_and_fetched_once(upstream):
+    cache, served, hits = upstream
+    served["c.png"] = (PNG, "image/png")
+
+    async def many():
+        return await asyncio.gather(*(cache.get("c.png") for _ in range(5)))
+
+    assert asyncio.run(many()) == [PNG] * 5
+    assert asyncio.run(cache.get("c.png")) == PNG
+    assert hits == ["c.png"]
+    assert (cache.dir / "c.png").read_bytes() == PNG
+
+
+def test_refetch_when_file_disappears(upstream):
+    cache, served, hits = upstream
+    served["d.png"] = (PNG, "image/png")
+    asyncio.run(cache.get("d.png"))
+    (cache.dir / "d.png").unlink()  # ter-evict di tengah baca
+    assert asyncio.run(cache.get("d.png")) == PNG
+    assert hits == ["d.png", "d.png"]
+
+
+def test_eviction_keeps_total_under_limit(upstream):
+    cache, served, _ = upstream
+    cache.max_bytes = len(PNG) * 2
+    for n in "efg":
+        served[f"{n}.png"] = (PNG, "image/png")
+        asyncio.run(cache.get(f"{n}.png"))
+    assert "e.png" not in cache and not (cache.dir / "e.png").exists()
+    assert "f.png" in cache and "g.png" in cache
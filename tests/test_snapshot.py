@@ -0,0 +1,25 @@
+import pytest
+
+from app import snapshot
+
+
+@pytest.fixture
+def snap(monkeypatch):
+    monkeypatch.setattr(snapshot, "_snap", {})
+    monkeypatch.setattr(snapshot, "write_json", lambda *a, **kw: None)
+    return snapshot
+
+
+def test_age_seconds_present_and_bucketed(snap, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(snapshot.time, "time", lambda: now[0])
+    snap.save("volcano", {"level": "Level II (Waspada)"})
+
+    assert snap.get("volcano")["age_seconds"] == 0
+    now[0] += 29
+    assert snap.get("volcano")["age_seconds"] == 0
+    now[0] += 2
+    fresh = snap.get("volcano")
+    stale = snap.get("volcano", stale=True)
+    assert fresh["age_seconds"] == stale["age_seconds"] == 30
+    assert not fresh["stale"] and stale["stale"]
@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from app import precompressed, storage
+
+
+class NotJson:
+    pass
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(storage, "FLUSH_INTERVAL_SECONDS", 3600.0)
+    monkeypatch.setattr(storage, "_cache", {})
+    monkeypatch.setattr(storage, "_mtimes", {})
+    monkeypatch.setattr(storage, "_dirty", set())
+    monkeypatch.setattr(storage, "_versions", {})
+    yield storage
+
+
+def test_unserializable_write_fails_at_caller(store):
+    store.write_json("videos", [{"id": "a"}])
+    store.flush()
+
+    with pytest.raises(TypeError):
+        store.write_json("videos", [{"id": "b", "url": NotJson()}])
+
+    assert store.read_json("videos", default=[]) == [{"id": "a"}]
+    assert not store._dirty
+    store.flush()
+    assert json.loads((store.DATA_DIR / "videos.json").read_text(encoding="utf-8")) == [{"id": "a"}]
+
+
+def test_write_behind_reads_from_cache_then_flushes(store):
+    store.write_json("videos", [{"id": "a"}])
+    assert not (store.DATA_DIR / "videos.json").exists()
+
+    items = store.read_json("videos", default=[])
+    items.append({"id": "mutated"})  # salinan; cache tidak ikut berubah
+    assert store.read_json("videos", default=[]) == [{"id": "a"}]
+
+    store.flush()
+    assert json.loads((store.DATA_DIR / "videos.json").read_text(encoding="utf-8")) == [{"id": "a"}]
+
+
+def test_external_change_invalidates_cache(store):
+    store.write_json("videos", [{"id": "a"}], durable=True)
+    v = store.version("videos")
+    p = store.DATA_DIR / "videos.json"
+
+    # worker lain menulis file yang sama
+    p.write_text(json.dumps([{"id": "b"}]), encoding="utf-8")
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert store.read_json("videos", default=[]) == [{"id": "b"}]
+    assert store.version("videos") == v + 1
+
+
+def test_version_sees_external_edit_without_read(store, monkeypatch):
+    monkeypatch.setattr(precompressed, "_cache", {})
+    p = store.DATA_DIR / "videos.json"
+    store.write_json("videos", [{"id": "a"}], durable=True)
+
+    def body():
+        v = precompressed.get_or_build("videos", store.version("videos"), lambda: store.read_json("videos", []))
+        return json.loads(v.identity)
+
+    assert body() == [{"id": "a"}]
+    assert body() == [{"id": "a"}]  # hit cache, tanpa read_json
+
+    p.write_text(json.dumps([{"id": "edited"}]), encoding="utf-8")
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert body() == [{"id": "edited"}]
+
+
+def test_missing_file_returns_default(store):
+    assert store.read_json("nothing", default={"x": 1}) == {"x": 1}
@@ -0,0 +1,74 @@
+import pytest
+
+from app import sync_log
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync_log, "SYNC_DB", tmp_path / "sync.db")
+    monkeypatch.setattr(sync_log, "_conn", None)
+    monkeypatch.setattr(sync_log, "COMPACT_EVERY", 0)
+    yield sync_log
+    if sync_log._conn is not None:
+        sync_log._conn.close()
+
+
+def _sync(log, since, limit, snapshot_after=None, max_pages=50):
+    """Ikuti protokol klien sampai more=false; return (halaman, seq akhir)."""
+    pages = []
+    for _ in range(max_pages):
+        res = log.changes_since(since, limit=limit, snapshot_after=snapshot_after)
+        pages.append(res)
+        since, snapshot_after = res["seq"], res["snapshot_after"]
+        if not res["more"]:
+            return pages, since
+    pytest.fail("sync tidak selesai (loop paging)")
+
+
+def _seed_expired_tombstone(log, monkeypatch):
+    for i in range(5):
+        log.append("posko", "upsert", f"p{i}", {"id": f"p{i}"})
+    log.append("posko", "upsert", "p5", {"id": "p5"})
+    log.append("posko", "delete", "p5", None)
+    monkeypatch.setattr(log, "TOMBSTONE_TTL_DAYS", 0)
+    log.compact()
+
+
+def test_reset_snapshot_pages_to_completion(log, monkeypatch):
+    _seed_expired_tombstone(log, monkeypatch)
+
+    pages, seq = _sync(log, since=0, limit=2)
+
+    assert [c["id"] for p in pages for c in p["changes"]] == ["p0", "p1", "p2", "p3", "p4"]
+    assert [p["reset"] for p in pages] == [True, False, False]
+    assert seq == 7
+    # setelah snapshot, klien tidak di-reset lagi
+    again = log.changes_since(seq)
+    assert not again["reset"] and not again["more"] and again["changes"] == []
+
+
+def test_changes_during_snapshot_arrive_as_delta(log, monkeypatch):
+    _seed_expired_tombstone(log, monkeypatch)
+
+    first = log.changes_since(0, limit=2)
+    log.append("posko", "delete", "p0", None)  # p0 sudah terkirim di halaman pertama
+    rest, seq = _sync(log, first["seq"], limit=2, snapshot_after=first["snapshot_after"])
+
+    ops = [(c["op"], c["id"]) for p in rest for c in p["changes"]]
+    assert ("delete", "p0") in ops
+    assert seq == log.latest_seq()
+
+
+def test_delta_paging_without_reset(log):
+    for i in range(5):
+        log.append("posko", "upsert", f"p{i}", {"id": f"p{i}"})
+    log.append("posko", "delete", "p1", None)
+
+    pages, seq = _sync(log, since=3, limit=2)
+
+    assert [(c["op"], c["id"]) for p in pages for c in p["changes"]] == [
+        ("upsert", "p3"),
+        ("upsert", "p4"),
+        ("delete", "p1"),
+    ]
+    assert seq == 6 and not any(p["reset"] for p in pages)